@@ -1,30 +1,26 @@
 # LevelPrice.py (UPDATED - แก้ไข snake_case)
 import json
+import logging
+import math
+import threading
 from pathlib import Path
 import numpy as np
 import pandas as pd
 from datetime import datetime
-from scipy.special import erf
 
-# ============== WEIGHTS (รวมกัน = 100) ==============\
-W_ACCUM6M = 20.72
-W_FREQ    = 28.5
-W_TENURE  = 16.84
-W_GENBUS  = 33.94
-WEIGHT_SUM = 100.0
+import pricing_model
+
+log = logging.getLogger(__name__)
+
+# ============== WEIGHTS (รวมกัน = 100) / Gen Bus / ช่วงคะแนน → Tier ==============
+# อยู่ใน pricing_model (pricing_model.json "level" — แก้แล้วมีผลทันที ไม่ต้อง restart)
+WEIGHT_SUM = pricing_model.LEVEL_WEIGHT_SUM
 
 # ============== MAP คะแนนเป็น Tier ===================
 def map_score_to_price_band(score: float) -> str:
     if pd.isna(score):
         return "Unknown"
-    s = float(score)
-    if 0 <= s < 40:
-        return "R2->R1"
-    elif 40 <= s < 70:
-        return "R1->W2"
-    elif 70 <= s <= 100:
-        return "W2->W1"
-    return "Unknown"
+    return pricing_model.current().score_to_tier([float(score)])[0]
 
 # ============== Helpers ===================
 def _pick_col(df: pd.DataFrame, candidates: list[str], default=None):
@@ -39,6 +35,15 @@ def _pick_col(df: pd.DataFrame, candidates: list[str], default=None):
             return low_cols[key]
     return default
 
+def erf(x):
+    """erf ทีละตัวด้วย math.erf (แทน scipy.special.erf — ไม่ต้อง import scipy ~200ms ตอน start)
+    รับ Series → คืน Series index เดิม (NaN คงเป็น NaN ให้ fillna ต่อได้)"""
+    values = np.asarray(x, dtype=float)
+    out = np.fromiter(map(math.erf, values.ravel()), dtype=float, count=values.size).reshape(values.shape)
+    if isinstance(x, pd.Series):
+        return pd.Series(out, index=x.index)
+    return out
+
 def _z_to_score_fixed(z, mean, sd):
     if mean is None or sd is None or sd == 0:
         return 0.0  # ถ้าไม่มีค่าสถิติ
@@ -58,16 +63,60 @@ def _z_to_score_fixed(z, mean, sd):
     return score
 
 # ============== โหลดไฟล์สถิติ (mean/sd) ===================
+JSON_PATH = Path(__file__).parent / "mean_sd.json"
 STATS = {}
-try:
-    JSON_PATH = Path(__file__).parent / "mean_sd.json"
-    with open(JSON_PATH, "r") as f:
-        # (ไฟล์ json เดิมเป็น list ที่มี 1 dict)
-        STATS = json.load(f)[0] 
-except FileNotFoundError:
-    print(f"❌ ไม่พบไฟล์ {JSON_PATH} - LevelPrice จะคำนวณ Z-Score ไม่ได้")
-except Exception as e:
-    print(f"❌ เกิดข้อผิดพลาดในการอ่าน mean_sd.json: {e}")
+STATS_MTIME = -1   # mtime ของ mean_sd.json ที่โหลดอยู่ (None = ไม่มีไฟล์, -1 = ยังไม่เคยโหลด)
+# STATS / STATS_MTIME สลับคู่กันใต้ lock หลัง parse สำเร็จเท่านั้น → STATS_MTIME ชี้เนื้อหาใน STATS เสมอ
+# (ไฟล์เสีย / เขียนค้างครึ่งไฟล์ → ใช้ชุดเดิมต่อ และไม่ลองอ่าน mtime นั้นซ้ำ)
+_stats_lock = threading.Lock()
+_failed_mtime = None   # mtime ของไฟล์ที่ parse ไม่ผ่านล่าสุด (None = ไม่มี)
+
+def _stats_mtime():
+    try:
+        return JSON_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def _is_current(mtime) -> bool:
+    return mtime == STATS_MTIME or (_failed_mtime is not None and mtime == _failed_mtime)
+
+def load_stats(force: bool = False) -> dict:
+    """โหลด mean/sd ใหม่เมื่อไฟล์ mean_sd.json เปลี่ยน (เช็คจาก mtime)"""
+    global STATS, STATS_MTIME, _failed_mtime
+    mtime = _stats_mtime()
+    if not force and _is_current(mtime):
+        return STATS
+
+    with _stats_lock:
+        if not force and _is_current(mtime):
+            return STATS
+        try:
+            with open(JSON_PATH, "r") as f:
+                # (ไฟล์ json เดิมเป็น list ที่มี 1 dict)
+                stats = json.load(f)[0]
+            if not isinstance(stats, dict):
+                raise ValueError(f"ต้องเป็น dict (ได้ {type(stats).__name__})")
+        except FileNotFoundError:
+            stats = {}
+            log.error("ไม่พบไฟล์ %s - LevelPrice จะคำนวณ Z-Score ไม่ได้", JSON_PATH)
+        except Exception as e:
+            _failed_mtime = mtime
+            log.error("เกิดข้อผิดพลาดในการอ่าน mean_sd.json: %s (ใช้ค่าชุดเดิมต่อ)", e)
+            return STATS
+
+        STATS, STATS_MTIME = stats, mtime
+        _failed_mtime = None
+        if stats:
+            # ไฟล์จาก mean_sd.py มี version / built_at (ไฟล์เก่าไม่มี → None)
+            log.info("loaded mean_sd.json", extra={"version": stats.get("version"), "built_at": stats.get("built_at")})
+        return stats
+
+def stats_version():
+    """mtime ของ mean_sd.json ที่ใช้อยู่ (โหลดใหม่ก่อนถ้าไฟล์เปลี่ยน) — ใช้เป็นส่วนหนึ่งของ key ของ cache"""
+    load_stats()
+    return STATS_MTIME
+
+# ไม่โหลดตอน import แล้ว — LevelPrice() เรียก load_stats() เองครั้งแรกที่ใช้ (และโหลดใหม่เมื่อไฟล์เปลี่ยน)
 
 
 # ============== ตัวเลือกคอลัมน์ (CANDIDATES) ===================
@@ -77,12 +126,11 @@ CAND_ACCUM6M = ["accum_6m"]      # เรามั่นใจว่า router 
 CAND_FREQ    = ["frequency"]     # เรามั่นใจว่า router ส่ง 'frequency' มา
 CAND_GENBUS  = ["gen_bus"]       # เรามั่นใจว่า router ส่ง 'gen_bus' มา
 
-# Mapping Gen Bus
-GENBUS_MAP = {"W": 0.15, "R": 0.27, "P": 0.21}
-
 # ============== ฟังก์ชันหลัก ===================
-def LevelPrice(df: pd.DataFrame) -> pd.DataFrame:
-    
+def LevelPrice(df: pd.DataFrame, model: pricing_model.PricingModel | None = None) -> pd.DataFrame:
+    model = model or pricing_model.current()
+    stats = load_stats()
+
     # --- 1. หาชื่อคอลัมน์ที่จะใช้ ---
     col_tenure  = _pick_col(df, CAND_TENURE)
     col_accum6m = _pick_col(df, CAND_ACCUM6M)
@@ -102,8 +150,8 @@ def LevelPrice(df: pd.DataFrame) -> pd.DataFrame:
     # (❗️ FIX: อ้างอิง key ใหม่ "tenure_mean", "tenure_sd")
     df["_TenureScore_Z"] = _z_to_score_fixed(
         tenure,
-        STATS.get("tenure_mean"),
-        STATS.get("tenure_sd")
+        stats.get("tenure_mean"),
+        stats.get("tenure_sd")
     )
 
     # ---------------- Accum6m ----------------
@@ -116,8 +164,8 @@ def LevelPrice(df: pd.DataFrame) -> pd.DataFrame:
     
     df["_Accum6mScore_Z"] = _z_to_score_fixed(
         df["_Accum6m_ln"],
-        STATS.get("accum_6m_ln_mean"), # ลองหา key (ln) ก่อน
-        STATS.get("accum_6m_ln_sd")
+        stats.get("accum_6m_ln_mean"), # ลองหา key (ln) ก่อน
+        stats.get("accum_6m_ln_sd")
     )
 
     # ---------------- Frequency ----------------
@@ -129,8 +177,8 @@ def LevelPrice(df: pd.DataFrame) -> pd.DataFrame:
 
     df["_FrequencyScore_Z"] = _z_to_score_fixed(
         freq,
-        STATS.get("frequency_mean"),
-        STATS.get("frequency_sd")
+        stats.get("frequency_mean"),
+        stats.get("frequency_sd")
     )
 
     # ---------------- Gen Bus (map เป็น 0.x) ----------------
@@ -138,20 +186,21 @@ def LevelPrice(df: pd.DataFrame) -> pd.DataFrame:
         df["_GenBusRaw"] = (
             df[col_genbus].astype(str).str.strip().str.upper()
         )
-        # Map ค่า (W=0.5, R=0.2, P=0.0) และ map 0-1 ไป 0-100
-        df["_GenBusScore_Z"] = df["_GenBusRaw"].map(GENBUS_MAP).fillna(0.0) * 100
+        # Map ค่า (level.gen_bus_map) และ map 0-1 ไป 0-100
+        df["_GenBusScore_Z"] = df["_GenBusRaw"].map(model.gen_bus_map).fillna(0.0) * 100
     else:
         df["_GenBusScore_Z"] = 0.0 # ถ้าไม่มีข้อมูล GenBus ให้เป็น 0
 
     # --- 3. รวมคะแนน (Weighted Average) ---
     df["_Score_Z"] = (
-        df["_Accum6mScore_Z"].fillna(0) * W_ACCUM6M +
-        df["_FrequencyScore_Z"].fillna(0) * W_FREQ +
-        df["_TenureScore_Z"].fillna(0) * W_TENURE +
-        df["_GenBusScore_Z"].fillna(0) * W_GENBUS
+        df["_Accum6mScore_Z"].fillna(0) * model.w_accum6m +
+        df["_FrequencyScore_Z"].fillna(0) * model.w_freq +
+        df["_TenureScore_Z"].fillna(0) * model.w_tenure +
+        df["_GenBusScore_Z"].fillna(0) * model.w_genbus
     ) / WEIGHT_SUM
     
     # --- 4. Map คะแนนรวมเป็น Tier ---
-    df["_Tier_Z"] = df["_Score_Z"].apply(map_score_to_price_band)
+    # (ช่วงคะแนนที่ compile ไว้ใน model — ทั้งคอลัมน์ทีเดียว แทน apply ทีละแถว)
+    df["_Tier_Z"] = model.score_to_tier(df["_Score_Z"].to_numpy())
 
     return df
\ No newline at end of file
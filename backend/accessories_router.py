@@ -1,9 +1,10 @@
 # accessories_router.py — เวอร์ชัน SQLite + API ใหม่ + JSON เดิม
-from fastapi import APIRouter, HTTPException, Query
-import pandas as pd
-from db_sqlite import get_conn
+from fastapi import APIRouter, Depends, Response
+from item_paging import ItemPage, item_page
+from response_cache import cached_route
+from sku_family import data_version, FamilySpec, SkuField, get_family
 
-router = APIRouter(prefix="/accessories", tags=["accessories"])
+router = APIRouter(prefix="/accessories", tags=["accessories"], route_class=cached_route(data_version))
 
 ITEMS_TABLE = "Items_Test"
 BRAND_TABLE = "Accessories_Brand"
@@ -14,75 +15,40 @@ CHAR_TABLE = "Character"
 
 
 # -------------------------------------------------------
-# โหลด Mapping จาก SQLite
+# SKU accessories: EBBBGGSSCCX… (เทียบ filter ตรง ๆ ไม่ zfill)
+# color / character ไม่บังคับ: SKU สั้นกว่านั้น → ""
 # -------------------------------------------------------
-def load_mapping(table_name: str):
-    conn = get_conn()
-    df = pd.read_sql_query(f'SELECT * FROM "{table_name}"', conn)
-    conn.close()
-
-    mapping = {}
-    for _, row in df.iterrows():
-        code = str(row["Code"]).strip()
-        name = str(row["Name"]).strip()
-        mapping[code] = name
-    return mapping
-
-def filter_accessories(df, brand=None, group=None, subGroup=None, color=None, character=None):
-    q = df.copy()
-
-    if brand:
-        q = q[q["brand"] == str(brand)]          # 3 digits
-    if group:
-        q = q[q["group"] == str(group)]          # 2 digits
-    if subGroup:
-        q = q[q["subGroup"] == str(subGroup)]    # 2 digits
-    if color:
-        q = q[q["color"] == str(color)]          # 2 digits
-    if character:
-        q = q[q["character"] == str(character)]  # 1 char
-
-    return q
-
-# -------------------------------------------------------
-# โหลดข้อมูลสินค้าจาก Items_Test (เฉพาะ Accessories)
-# -------------------------------------------------------
-def load_accessories_items():
-    conn = get_conn()
-    df = pd.read_sql_query(f'SELECT * FROM "{ITEMS_TABLE}"', conn)
-    conn.close()
-
-    # clean column names
-    df.columns = [c.strip() for c in df.columns]
-
-    # Accessories = SKU เริ่มต้นด้วย "E"
-    df = df[df["No."].astype(str).str.startswith("E")].copy()
-
-    return df
-
-
-# -------------------------------------------------------
-# parser SKU accessories: EBBGGSSCCX…
-# -------------------------------------------------------
-def parse_accessories_sku(sku: str):
-    sku = sku.strip()
-    if len(sku) < 8:
-        return None
-
-    brand = sku[1:4]          # 3 digits
-    group = sku[4:6]          # 2 digits
-    subGroup = sku[6:8]       # 2 digits
-    color = sku[8:10] if len(sku) >= 10 else ""
-    char_code = sku[10] if len(sku) >= 11 else ""
-
-    return {
-        "brand": brand,
-        "group": group,
-        "subGroup": subGroup,
-        "color": color,
-        "character": char_code,
-    }
-
+ACCESSORIES = FamilySpec(
+    name="accessories",
+    prefix="E",
+    min_len=8,
+    sku_style="strip",
+    fields=(
+        SkuField("brand", 1, 4, BRAND_TABLE, "brands"),             # 3 digits
+        SkuField("group", 4, 6, GROUP_TABLE, "groups"),             # 2 digits
+        SkuField("subGroup", 6, 8, SUBGROUP_TABLE, "subGroups"),    # 2 digits
+        SkuField("color", 8, 10, COLOR_TABLE, "colors", optional=True),          # 2 digits
+        SkuField("character", 10, 11, CHAR_TABLE, "characters", optional=True),  # 1 char
+    ),
+    item=(
+        ("itemCode", "col:No."),
+        ("name", "col:Description"),
+        ("brand", "field:brand"),
+        ("brandName", "label:brand"),
+        ("group", "field:group"),
+        ("groupName", "label:group"),
+        ("subGroup", "field:subGroup"),
+        ("subGroupName", "label:subGroup"),
+        ("color", "field:color"),
+        ("colorName", "label:color"),
+        ("character", "field:character"),
+        ("characterName", "label:character"),
+    ),
+)
+
+
+def _filters(brand, group, subGroup, color, character):
+    return {"brand": brand, "group": group, "subGroup": subGroup, "color": color, "character": character}
 
 
 # -------------------------------------------------------
@@ -90,50 +56,15 @@ def parse_accessories_sku(sku: str):
 # -------------------------------------------------------
 @router.get("/items")
 def get_accessories_items(
+    response: Response,
     brand: str = None,
     group: str = None,
     subGroup: str = None,
     color: str = None,
-    character: str = None
+    character: str = None,
+    page: ItemPage = Depends(item_page)
 ):
-    df = load_accessories_items()
-
-    parsed = df["No."].astype(str).apply(parse_accessories_sku)
-    parsed_df = pd.json_normalize(parsed)
-    df = pd.concat([df.reset_index(drop=True), parsed_df], axis=1)
-
-    df = filter_accessories(df, brand, group, subGroup, color, character)
-
-    brand_map = load_mapping(BRAND_TABLE)
-    group_map = load_mapping(GROUP_TABLE)
-    sub_map = load_mapping(SUBGROUP_TABLE)
-    color_map = load_mapping(COLOR_TABLE)
-    char_map = load_mapping(CHAR_TABLE)
-
-    results = []
-    for _, row in df.iterrows():
-        results.append({
-            "itemCode": row["No."],
-            "name": row["Description"],
-
-            "brand": row["brand"],
-            "brandName": brand_map.get(row["brand"], ""),
-
-            "group": row["group"],
-            "groupName": group_map.get(row["group"], ""),
-
-            "subGroup": row["subGroup"],
-            "subGroupName": sub_map.get(row["subGroup"], ""),
-
-            "color": row["color"],
-            "colorName": color_map.get(row["color"], ""),
-
-            "character": row["character"],
-            "characterName": char_map.get(row["character"], "")
-        })
-
-    return results
-
+    return get_family(ACCESSORIES).items_for(_filters(brand, group, subGroup, color, character), page, response)
 
 
 # -------------------------------------------------------
@@ -145,36 +76,10 @@ def accessories_master(
     group: str = None,
     subGroup: str = None,
     color: str = None,
-    character: str = None
+    character: str = None,
+    counts: bool = False
 ):
-    df = load_accessories_items()
-
-    # parse SKU ก่อน
-    parsed = df["No."].astype(str).apply(parse_accessories_sku)
-    parsed_df = pd.json_normalize(parsed)
-    df = pd.concat([df.reset_index(drop=True), parsed_df], axis=1)
-
-    df = filter_accessories(df, brand, group, subGroup, color, character)
-
-    brand_map = load_mapping(BRAND_TABLE)
-    group_map = load_mapping(GROUP_TABLE)
-    sub_map = load_mapping(SUBGROUP_TABLE)
-    color_map = load_mapping(COLOR_TABLE)
-    char_map = load_mapping(CHAR_TABLE)
-
-    brands = sorted({x for x in df["brand"].dropna()})
-    groups = sorted({x for x in df["group"].dropna()})
-    subGroups = sorted({x for x in df["subGroup"].dropna()})
-    colors = sorted({x for x in df["color"].dropna()})
-    characters = sorted({x for x in df["character"].dropna()})
-
-    return {
-        "brands": [{"code": b, "name": brand_map.get(b, b)} for b in brands],
-        "groups": [{"code": g, "name": group_map.get(g, g)} for g in groups],
-        "subGroups": [{"code": s, "name": sub_map.get(s, s)} for s in subGroups],
-        "colors": [{"code": c, "name": color_map.get(c, c)} for c in colors],
-        "characters": [{"code": c, "name": char_map.get(c, c)} for c in characters],
-    }
+    return get_family(ACCESSORIES).master(_filters(brand, group, subGroup, color, character), counts)
 
 
 # -------------------------------------------------------
@@ -186,13 +91,14 @@ def accessories_options(
     group: str = None,
     subGroup: str = None,
     color: str = None,
-    character: str = None
+    character: str = None,
+    counts: bool = False
 ):
     return accessories_master(
         brand=brand,
         group=group,
         subGroup=subGroup,
         color=color,
-        character=character
+        character=character,
+        counts=counts
     )
-
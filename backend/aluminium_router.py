@@ -1,10 +1,11 @@
 # aluminium_router.py — SQLite Version (FE-safe)
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Depends, Query, Response
 from typing import Optional
-import pandas as pd
-from db_sqlite import get_conn
+from item_paging import ItemPage, item_page
+from response_cache import cached_route
+from sku_family import data_version, FamilySpec, SkuField, get_family
 
-router = APIRouter(prefix="/aluminium", tags=["aluminium"])
+router = APIRouter(prefix="/aluminium", tags=["aluminium"], route_class=cached_route(data_version))
 
 # ============================
 # SQLite TABLE NAMES
@@ -18,110 +19,35 @@ THICKNESS_TABLE = "Aluminium_Thickness"
 
 
 # ============================
-# LOAD MAPPING TABLE (Brand/Group/…)
+# ALUMINIUM SKU
+# รูปแบบที่ถูกต้อง: A + 2 + 2 + 3 + 2 + 2 = 12 chars (อย่างน้อย)
 # ============================
-def load_mapping(table_name: str):
-    conn = get_conn()
-    df = pd.read_sql_query(f'SELECT * FROM "{table_name}"', conn)
-    conn.close()
-
-    df.columns = [c.strip() for c in df.columns]
-
-    mapping = {}
-    for _, row in df.iterrows():
-        code = str(row["Code"]).strip()
-        name = str(row["Name"]).strip()
-        mapping[code] = name
-
-    return mapping
-
-
-# ============================
-# PARSE ALUMINIUM SKU
-# ============================
-def parse_aluminium_sku(sku: str):
-    s = (sku or "").strip().upper()
-
-    # รูปแบบที่ถูกต้อง: A + 2 + 2 + 3 + 2 + 2 = 12 chars (อย่างน้อย)
-    if not s.startswith("A") or len(s) < 12:
-        return {
-            "sku": s,
-            "brand": None,
-            "group": None,
-            "subGroup": None,
-            "color": None,
-            "thickness": None,
-        }
-
-    try:
-        brand = s[1:3]
-        group = s[3:5]
-        sub_group = s[5:8]
-        color = s[8:10]
-        thickness = s[10:12]
-    except:
-        brand = group = sub_group = color = thickness = None
-
-    return {
-        "sku": s,
-        "brand": brand,
-        "group": group,
-        "subGroup": sub_group,
-        "color": color,
-        "thickness": thickness,
-    }
-
-
-# ============================
-# LOAD ALUMINIUM ITEMS
-# ============================
-def load_aluminium_items():
-    conn = get_conn()
-    df = pd.read_sql_query(f'SELECT * FROM "{ITEMS_TABLE}"', conn)
-    conn.close()
-
-    df.columns = [c.strip() for c in df.columns]
-
-    # เฉพาะ SKU ขึ้นต้นด้วย A
-    df = df[df["No."].astype(str).str.upper().str.startswith("A")].copy()
-
-    if df.empty:
-        return pd.DataFrame()
-
-    df["SKU"] = df["No."].astype(str).str.upper().str.strip()
-
-    parsed = df["SKU"].apply(parse_aluminium_sku)
-    parsed_df = pd.json_normalize(parsed)
-
-    out = pd.concat([df.reset_index(drop=True), parsed_df.reset_index(drop=True)], axis=1)
-
-    # On-hand qty
-    if "Inventory" in out.columns:
-        out["onhand_qty"] = pd.to_numeric(out["Inventory"], errors="coerce").fillna(0).astype(int)
-    else:
-        out["onhand_qty"] = 0
-
-    return out
-
-
-# ============================
-# FILTER ALUMINIUM
-# ============================
-def filter_aluminium(df, brand, group, subGroup, color, thickness):
-    q = df.copy()
-
-    if brand:
-        q = q[q["brand"] == str(brand).zfill(2)]
-    if group:
-        q = q[q["group"] == str(group).zfill(2)]
-    if subGroup:
-        q = q[q["subGroup"] == str(subGroup).zfill(3)]
-    if color:
-        q = q[q["color"] == str(color).zfill(2)]
-    if thickness:
-        q = q[q["thickness"] == str(thickness).zfill(2)]
-
-    return q
+ALUMINIUM = FamilySpec(
+    name="aluminium",
+    prefix="A",
+    min_len=12,
+    fields=(
+        SkuField("brand", 1, 3, BRAND_TABLE, "brands", pad=2),
+        SkuField("group", 3, 5, GROUP_TABLE, "groups", pad=2),
+        SkuField("subGroup", 5, 8, SUBGROUP_TABLE, "subGroups", pad=3),
+        SkuField("color", 8, 10, COLOR_TABLE, "colors", pad=2),
+        SkuField("thickness", 10, 12, THICKNESS_TABLE, "thickness", pad=2),
+    ),
+    item=(
+        ("sku", "sku"),
+        ("name", "col:Description"),
+        ("brand", "field:brand"),
+        ("brandName", "label:brand"),
+        ("group", "field:group"),
+        ("groupName", "label:group"),
+        ("subGroup", "field:subGroup"),
+        ("subGroupName", "label:subGroup"),
+        ("color", "field:color"),
+        ("colorName", "label:color"),
+        ("thickness", "field:thickness"),
+        ("inventory", "onhand"),
+    ),
+)
 
 
 # ============================
@@ -135,10 +61,11 @@ def aluminium_master(
     subGroup: Optional[str] = Query(None),
     color: Optional[str] = Query(None),
     thickness: Optional[str] = Query(None),
+    counts: bool = False,
 ):
-    df = load_aluminium_items()
+    family = get_family(ALUMINIUM)
 
-    if df.empty:
+    if not family.size:
         return {
             "source": "sqlite",
             "filters": {},
@@ -149,78 +76,30 @@ def aluminium_master(
             "thickness": [],
         }
 
-    q = filter_aluminium(df, brand, group, subGroup, color, thickness)
-
-    brand_map = load_mapping(BRAND_TABLE)
-    group_map = load_mapping(GROUP_TABLE)
-    subgroup_map = load_mapping(SUBGROUP_TABLE)
-    color_map = load_mapping(COLOR_TABLE)
-    thickness_map = load_mapping(THICKNESS_TABLE)
-
-    brands = sorted({x for x in q["brand"].dropna()})
-    groups = sorted({x for x in q["group"].dropna()})
-    subGroups = sorted({x for x in q["subGroup"].dropna()})
-    colors = sorted({x for x in q["color"].dropna()})
-    thicknesses = sorted({x for x in q["thickness"].dropna()})
-
-    return {
-        "source": "sqlite",
-        "filters": {
-            "brand": brand,
-            "group": group,
-            "subGroup": subGroup,
-            "color": color,
-            "thickness": thickness,
-        },
-        "brands": [{"code": b, "name": brand_map.get(b, b)} for b in brands],
-        "groups": [{"code": g, "name": group_map.get(g, g)} for g in groups],
-        "subGroups": [{"code": s, "name": subgroup_map.get(s, s)} for s in subGroups],
-        "colors": [{"code": c, "name": color_map.get(c, c)} for c in colors],
-        "thickness": [{"code": t, "name": thickness_map.get(t, t)} for t in thicknesses],
+    filters = {
+        "brand": brand,
+        "group": group,
+        "subGroup": subGroup,
+        "color": color,
+        "thickness": thickness,
     }
+    return {"source": "sqlite", "filters": filters, **family.master(filters, counts)}
+
 
 @router.get("/items")
 def aluminium_items(
+    response: Response,
     brand: Optional[str] = None,
     group: Optional[str] = None,
     subGroup: Optional[str] = None,
     color: Optional[str] = None,
     thickness: Optional[str] = None,
+    page: ItemPage = Depends(item_page),
 ):
-    df = load_aluminium_items()
-    if df.empty:
-        return []
-
-    # apply filters
-    df = filter_aluminium(df, brand, group, subGroup, color, thickness)
-
-    # load mapping tables
-    brand_map = load_mapping(BRAND_TABLE)
-    group_map = load_mapping(GROUP_TABLE)
-    subgroup_map = load_mapping(SUBGROUP_TABLE)
-    color_map = load_mapping(COLOR_TABLE)
-
-    items = []
-    for _, row in df.iterrows():
-        items.append({
-            "sku": row["SKU"],
-            "name": row.get("Description", ""),
-
-            "brand": row.get("brand"),
-            "brandName": brand_map.get(row.get("brand"), ""),
-
-            "group": row.get("group"),
-            "groupName": group_map.get(row.get("group"), ""),
-
-            "subGroup": row.get("subGroup"),
-            "subGroupName": subgroup_map.get(row.get("subGroup"), ""),
-
-            "color": row.get("color"),
-            "colorName": color_map.get(row.get("color"), ""),
-
-            "thickness": row.get("thickness"),
-            "inventory": row.get("onhand_qty", 0)
-        })
-
-    return items
-
+    return get_family(ALUMINIUM).items_for({
+        "brand": brand,
+        "group": group,
+        "subGroup": subGroup,
+        "color": color,
+        "thickness": thickness,
+    }, page, response)
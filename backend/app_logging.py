@@ -0,0 +1,180 @@
+# app_logging.py — logging แบบมีระดับ + JSON ต่อบรรทัด + request id (แทน print ใน hot path)
+#
+# - setup() : ผูก root logger กับ QueueHandler → thread เบื้องหลังเป็นคน format / เขียน stdout
+#   request thread แค่ใส่ record ลงคิว (คิวเต็ม → ทิ้ง record และนับไว้ ไม่บล็อก request)
+#   ⚠️ format ทำทีหลังใน thread อื่น → ห้ามแก้ object ที่ส่งเป็น args / extra หลังเรียก log
+# - RequestIdMiddleware : ใช้ X-Request-ID ที่ส่งมา (หรือสร้างใหม่) → ติดทุก record + ส่งกลับใน header
+# - sample_rows(n) : index ของแถวที่สุ่มมา log (debug ต่อแถวของตะกร้า) ตาม LOG_SAMPLE_RATE
+#   ผู้เรียกต้องเช็ค logger.isEnabledFor(logging.DEBUG) ก่อน → ปิด debug = ไม่มีงาน format เลย
+#
+# env: LOG_LEVEL (INFO), LOG_FORMAT (json | text), LOG_SAMPLE_RATE (0.01), LOG_QUEUE_SIZE (10000)
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import threading
+import uuid
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+REQUEST_ID_HEADER = "X-Request-ID"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+request_id: contextvars.ContextVar = contextvars.ContextVar("request_id", default="-")
+
+# attribute มาตรฐานของ LogRecord — ที่เหลือคือ field จาก extra={...}
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+class _RequestIdFilter(logging.Filter):
+    # ทำใน thread ที่เรียก log (contextvar ไม่ตามไป thread ของ listener)
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # ไม่ format ตรงนี้ (QueueHandler เดิม format ใน thread ที่เรียก) → listener ทำเอง
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        doc = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                doc[key] = value
+        if record.exc_info:
+            doc["exc"] = self.formatException(record.exc_info)
+        return json.dumps(doc, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record):
+        record.request_id = getattr(record, "request_id", "-")
+        line = super().format(record)
+        fields = {k: v for k, v in record.__dict__.items() if k not in _STANDARD_ATTRS and not k.startswith("_")}
+        if fields:
+            line += " " + json.dumps(fields, ensure_ascii=False, default=str)
+        return line
+
+
+class _State:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.handler: _DroppingQueueHandler | None = None
+        self.listener: logging.handlers.QueueListener | None = None
+
+
+_state = _State()
+
+
+def setup():
+    """ผูก root logger กับคิว + เริ่ม thread เขียน log (เรียกซ้ำได้)"""
+    with _state.lock:
+        if _state.listener is not None:
+            return
+        q = queue.Queue(LOG_QUEUE_SIZE)
+        out = logging.StreamHandler()
+        out.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+
+        handler = _DroppingQueueHandler(q)
+        handler.addFilter(_RequestIdFilter())
+        root = logging.getLogger()
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+
+        _state.handler = handler
+        _state.listener = logging.handlers.QueueListener(q, out, respect_handler_level=True)
+        _state.listener.start()
+
+
+def shutdown():
+    """เขียน record ที่ค้างในคิวให้หมดแล้วหยุด thread (ตอน shutdown)"""
+    with _state.lock:
+        if _state.listener is None:
+            return
+        _state.listener.stop()
+        logging.getLogger().removeHandler(_state.handler)
+        _state.listener = None
+
+
+def stats() -> dict:
+    handler = _state.handler
+    return {
+        "level": logging.getLevelName(logging.getLogger().level),
+        "format": LOG_FORMAT,
+        "sample_rate": LOG_SAMPLE_RATE,
+        "queued": handler.queue.qsize() if handler is not None else 0,
+        "dropped": handler.dropped if handler is not None else 0,
+    }
+
+
+def sample_rows(n: int, rate: float | None = None) -> list:
+    """index ของแถว (0..n-1) ที่สุ่มได้ตาม rate — ใช้กับ debug ต่อแถว"""
+    rate = LOG_SAMPLE_RATE if rate is None else rate
+    if rate >= 1:
+        return list(range(n))
+    if rate <= 0:
+        return []
+    return [i for i in range(n) if random.random() < rate]
+
+
+def _new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class RequestIdMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rid = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                rid = value.decode("latin-1")
+                break
+        if not rid or not _VALID_REQUEST_ID.match(rid):
+            rid = _new_request_id()
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", rid.encode("latin-1"))]
+            await send(message)
+
+        token = request_id.set(rid)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id.reset(token)
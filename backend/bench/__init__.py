@@ -0,0 +1,16 @@
+# bench — benchmark ของ hot path (pricing / catalog picker / quotation) บนฐานข้อมูลสังเคราะห์
+#
+#   cd backend
+#   python -m bench run --scales 1,10,100 --out bench-report.json
+#   python -m bench run --scales 1,10 --baseline bench-baseline.json     # เทียบกับผลที่เก็บไว้
+#   python -m bench compare bench-report.json bench-baseline.json
+#   python -m bench load --users 20 --duration 60                         # load test ผ่าน uvicorn จริง
+#
+# - dataset.py : สร้าง SQLite ชั่วคราวจาก schema + ตาราง mapping ของ DB จริง แล้วขยาย
+#                Items_Test / Customer / Quote_* เป็น N เท่า (สุ่มแบบกำหนด seed → ได้ชุดเดิมทุกครั้ง)
+# - cases.py   : วัดเวลาแต่ละ case ใน process แยกต่อ scale (DB_FILE / EXCEL_FILE ชี้ไฟล์ชั่วคราว)
+# - report.py  : สรุปผล (ms) + เทียบ baseline
+# - load.py    : จำลอง session หน้าร้าน (login → ค้นลูกค้า → /master → pricing → บันทึกใบเสนอราคา)
+#                หลาย user พร้อมกัน รายงาน p50 / p95 / p99 และ error ต่อ endpoint
+#
+# ไม่ต้องต่อ internet ไม่แตะ data/Quetung.db / QuoteTemplate.xlsx ของจริง
@@ -0,0 +1,125 @@
+# python -m bench run | compare (ดูตัวอย่างใน bench/__init__.py)
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from bench import load, report
+from bench.dataset import DEFAULT_SOURCE, build_dataset
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+EXCEL_TEMPLATE = BACKEND_DIR / "data" / "QuoteTemplate.xlsx"
+
+
+def _run_scale(workdir: Path, scale: int, args) -> tuple:
+    db = workdir / f"bench_{scale}x.db"
+    excel = workdir / f"bench_{scale}x.xlsx"
+    out = workdir / f"bench_{scale}x.json"
+
+    print(f"[bench] building {scale}x dataset …", file=sys.stderr)
+    dataset = build_dataset(db, scale, seed=args.seed, source=Path(args.source))
+    if EXCEL_TEMPLATE.exists():
+        shutil.copy(EXCEL_TEMPLATE, excel)
+
+    env = dict(os.environ, DB_FILE=str(db), EXCEL_FILE=str(excel), LOG_LEVEL="WARNING", STARTUP_WARMUP="sync")
+    print(f"[bench] running {scale}x cases …", file=sys.stderr)
+    subprocess.run(
+        [sys.executable, "-m", "bench.cases", "--scale", str(scale), "--repeat", str(args.repeat),
+         "--seed", str(args.seed), "--out", str(out)],
+        cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.DEVNULL,
+    )
+    with open(out, encoding="utf-8") as f:
+        return dataset, json.load(f)
+
+
+def cmd_run(args) -> int:
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    result = report.new_report({"scales": scales, "repeat": args.repeat, "seed": args.seed})
+
+    workdir = Path(tempfile.mkdtemp(prefix="smartpricing-bench-"))
+    try:
+        for scale in scales:
+            dataset, measured = _run_scale(workdir, scale, args)
+            report.add_scale(result, scale, dataset, measured)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            print(f"[bench] kept {workdir}", file=sys.stderr)
+
+    report.save(result, args.out)
+    print(report.format_report(result))
+    print(f"\nreport → {args.out}")
+
+    if args.baseline:
+        rows = report.compare(result, report.load(args.baseline), args.threshold)
+        print()
+        print(report.format_comparison(rows, args.threshold))
+        if any(r[-1] for r in rows):
+            return 1
+    return 0
+
+
+def cmd_compare(args) -> int:
+    rows = report.compare(report.load(args.current), report.load(args.baseline), args.threshold)
+    print(report.format_comparison(rows, args.threshold))
+    return 1 if any(r[-1] for r in rows) else 0
+
+
+def cmd_load(args) -> int:
+    result = load.run_load(args)
+    report.save(result, args.out)
+    print(load.format_load(result))
+    print(f"\nreport → {args.out}")
+    return 1 if result["errors"] else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="สร้าง dataset + วัดเวลา")
+    run.add_argument("--scales", default="1,10,100", help="เช่น 1,10,100")
+    run.add_argument("--repeat", type=int, default=20, help="จำนวนรอบที่วัดต่อ case (ไม่นับ warm-up)")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--source", default=str(DEFAULT_SOURCE), help="DB ต้นแบบ (schema + ตาราง mapping)")
+    run.add_argument("--out", default="bench-report.json")
+    run.add_argument("--baseline", help="report เดิมที่จะเทียบ (ช้าลงเกิน threshold → exit 1)")
+    run.add_argument("--threshold", type=float, default=report.DEFAULT_THRESHOLD)
+    run.add_argument("--keep", action="store_true", help="ไม่ลบ DB ชั่วคราวหลังจบ")
+    run.set_defaults(func=cmd_run)
+
+    cmp_ = sub.add_parser("compare", help="เทียบ report สองไฟล์")
+    cmp_.add_argument("current")
+    cmp_.add_argument("baseline")
+    cmp_.add_argument("--threshold", type=float, default=report.DEFAULT_THRESHOLD)
+    cmp_.set_defaults(func=cmd_compare)
+
+    ld = sub.add_parser("load", help="จำลองพนักงานหน้าร้านหลายคนยิง uvicorn พร้อมกัน")
+    ld.add_argument("--users", type=int, default=10, help="จำนวนผู้ใช้พร้อมกัน")
+    ld.add_argument("--duration", type=float, default=60.0, help="วินาที")
+    ld.add_argument("--sessions", type=int, default=0, help="จำนวน session ต่อผู้ใช้ (0 = วนจนหมดเวลา)")
+    ld.add_argument("--think", type=float, default=0.5, help="think time เฉลี่ยระหว่างขั้น (วินาที)")
+    ld.add_argument("--keystroke", type=float, default=0.15, help="เวลาเฉลี่ยระหว่างตัวอักษรตอนค้นลูกค้า")
+    ld.add_argument("--ramp", type=float, default=5.0, help="ทยอยเริ่มผู้ใช้ภายในกี่วินาที")
+    ld.add_argument("--timeout", type=float, default=30.0, help="timeout ต่อ request")
+    ld.add_argument("--seed", type=int, default=0)
+    ld.add_argument("--url", help="ยิง server ที่รันอยู่แล้ว (ไม่ spawn uvicorn เอง)")
+    ld.add_argument("--source", default=str(DEFAULT_SOURCE), help="DB ต้นแบบที่จะ copy เป็นไฟล์ชั่วคราว")
+    ld.add_argument("--scale", type=int, default=1, help=">1 = ใช้ dataset สังเคราะห์ N เท่า (bench.dataset)")
+    ld.add_argument("--server-workers", type=int, default=1, help="uvicorn --workers")
+    ld.add_argument("--server-log-level", default="WARNING", help="LOG_LEVEL ของ server")
+    ld.add_argument("--out", default="load-report.json")
+    ld.add_argument("--keep", action="store_true", help="ไม่ลบ DB / log ของ server หลังจบ")
+    ld.set_defaults(func=cmd_load)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+# bench/cases.py — วัดเวลาทุก case บน DB สังเคราะห์ 1 ไฟล์ (รันเป็น process แยกต่อ scale)
+#
+#   DB_FILE=/tmp/x.db EXCEL_FILE=/tmp/x.xlsx python -m bench.cases --scale 10 --out /tmp/x.json
+#
+# module ของแอปอ่าน DB_FILE ตอน import → import ใน run() หลัง parent ตั้ง env ให้แล้วเท่านั้น
+# GET ที่ผ่าน response cache: ล้าง cache ก่อนทุกรอบ (ไม่นับเวลา) → วัดงานจริงของ endpoint
+# /api/pricing/calculate วัดทั้ง 2 แบบ: ล้าง quote_cache ก่อนทุกรอบ (คำนวณทุกบรรทัด) และตะกร้าเดิมซ้ำ (hit ทั้งหมด)
+# Excel outbox หยุดหลัง startup → ไม่มี thread เขียนไฟล์แย่ง CPU ระหว่างวัด
+# parent ตั้ง STARTUP_WARMUP=sync → cache โหลดครบก่อนวัด (ไม่มี warm-up เบื้องหลังแย่ง CPU)
+import argparse
+import json
+import random
+import time
+
+CART_SIZES = (10, 100, 1000)
+HTTP_CART_SIZES = (10, 100)
+QUOTE_LINES = 20
+WARMUP = 2
+
+
+def _timed(fn, repeat: int, setup=None) -> list:
+    samples = []
+    for i in range(WARMUP + repeat):
+        args = setup() if setup is not None else ()
+        t0 = time.perf_counter()
+        fn(*args)
+        elapsed = time.perf_counter() - t0
+        if i >= WARMUP:
+            samples.append(elapsed)
+    return samples
+
+
+def _expect_ok(response):
+    if response.status_code != 200:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+    return response
+
+
+def run(scale: int, repeat: int, seed: int) -> dict:
+    import logging
+    import pandas as pd
+    from fastapi.testclient import TestClient
+
+    import catalog
+    import customer_tier
+    import excel_outbox
+    import LevelPrice
+    import main
+    import pricing_router
+    import quote_cache
+    import response_cache
+    from db_sqlite import read_conn
+    from items import load_items_sqlite
+    from price import Price
+    from accessories_router import ACCESSORIES
+    from aluminium_router import ALUMINIUM
+    from cline_router import CLINE
+    from glass_router import GLASS
+    from gypsum_router import GYPSUM
+    from sealant_router import SEALANT
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    rng = random.Random(f"{seed}:{scale}:cases")
+    cases, errors = {}, {}
+
+    def case(name, fn, setup=None):
+        try:
+            cases[name] = _timed(fn, repeat, setup)
+        except Exception as e:       # case เดียวพังไม่ล้มทั้งชุด
+            errors[name] = f"{type(e).__name__}: {e}"
+
+    t0 = time.perf_counter()
+    client = TestClient(main.app)
+    client.__enter__()               # startup hooks (tier ลูกค้า, lookup, index ใบเสนอราคา)
+    startup = time.perf_counter() - t0
+    excel_outbox.stop()
+
+    try:
+        # ---------- catalog ----------
+        case("load_items_sqlite/cold", load_items_sqlite, setup=lambda: catalog.bump_version() or ())
+        case("load_items_sqlite/warm", load_items_sqlite)
+
+        # ---------- LevelPrice (ลูกค้าทั้งตาราง แบบ customer_tier) ----------
+        with read_conn() as conn:
+            customers = pd.read_sql_query('SELECT * FROM "Customer"', conn)
+        customers = customers[list(customer_tier.RENAME_MAP)].rename(columns=customer_tier.RENAME_MAP)
+        for col in customers.columns:
+            customers[col] = customers[col].where(customers[col].notna(), "").astype(str).str.strip()
+        case("LevelPrice/customers", LevelPrice.LevelPrice, setup=lambda: (customers.copy(),))
+
+        # ---------- Price ----------
+        df_items = load_items_sqlite()
+        skus = df_items["sku"].astype(str).tolist()
+        codes = customers["code"].tolist()
+        customer_data = {
+            "code": codes[0], "gen_bus": "R", "accum_6m": "50000", "frequency": "20",
+            "customer_date": "2019-01-01", "sales_a": "1000",
+        }
+
+        def cart(n):
+            return [{"sku": s, "qty": rng.randrange(1, 30), "name": "bench"} for s in rng.sample(skus, min(n, len(skus)))]
+
+        for n in CART_SIZES:
+            req = pricing_router.PricingRequest(customerData=customer_data, deliveryType="DELIVERY", cart=cart(n))
+            frame = pricing_router._attach_tiers(pricing_router._build_cart_frame([req], df_items), [codes[0]])
+            case(f"Price/cart_{n}", Price, setup=lambda frame=frame: (frame,))
+
+        for n in HTTP_CART_SIZES:
+            body = {"customerData": customer_data, "deliveryType": "DELIVERY", "cart": cart(n)}
+            case(f"POST /api/pricing/calculate cart_{n}",
+                 lambda body=body: _expect_ok(client.post("/api/pricing/calculate", json=body)),
+                 setup=lambda: quote_cache.clear() or ())
+            case(f"POST /api/pricing/calculate cart_{n}/cached",
+                 lambda body=body: _expect_ok(client.post("/api/pricing/calculate", json=body)))
+
+        # ---------- family routers ----------
+        for prefix, spec in (("aluminium", ALUMINIUM), ("gypsum", GYPSUM), ("sealant", SEALANT),
+                             ("cline", CLINE), ("accessories", ACCESSORIES), ("glass", GLASS)):
+            family_skus = [s for s in skus if s[:1].upper() == spec.prefix]
+            first = spec.fields[0]
+            brand = family_skus[0][first.start:first.end] if family_skus else ""
+            if prefix == "glass":
+                templates = ["/api/glass/list", "/api/glass/list?brand={brand}"]
+            else:
+                templates = [f"/api/{prefix}/master", f"/api/{prefix}/master?brand={{brand}}",
+                             f"/api/{prefix}/options", f"/api/{prefix}/items?brand={{brand}}"]
+            for template in templates:
+                path = template.format(brand=brand)
+                case(f"GET {template}", lambda path=path: _expect_ok(client.get(path)),
+                     setup=lambda: response_cache.clear() or ())
+
+        # ---------- quotation ----------
+        quote = {
+            "employee": {"id": "BENCH", "name": "bench", "branchId": "00TR"},
+            "customer": {"code": codes[0], "name": "bench", "phone": ""},
+            "deliveryType": "PICKUP",
+            "cart": [{"sku": s, "qty": 2, "price": 100.0, "name": "bench"} for s in rng.sample(skus, QUOTE_LINES)],
+            "totals": {"exVat": 4000, "grandTotal": 4280},
+        }
+        case(f"POST /api/quotation lines_{QUOTE_LINES}", lambda: _expect_ok(client.post("/api/quotation", json=quote)))
+        for path in ("/api/quotation?limit=50&summary=true", "/api/quotation?limit=50", "/api/quotation"):
+            case(f"GET {path}", lambda path=path: _expect_ok(client.get(path)))
+    finally:
+        client.__exit__(None, None, None)
+
+    return {"scale": scale, "startup_s": startup, "cases": cases, "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, required=True)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    result = run(args.scale, args.repeat, args.seed)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
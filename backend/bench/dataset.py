@@ -0,0 +1,150 @@
+# bench/dataset.py — สร้างฐานข้อมูลสังเคราะห์ขนาด N เท่าของ DB ต้นแบบ
+#
+# - copy ทั้งไฟล์ต้นแบบ (schema + ตาราง mapping + Employees) ด้วย sqlite backup
+# - Items_Test : แถวเดิม + สำเนา (scale - 1) ชุด — SKU คง 12 ตัวแรก (brand/group/... ยัง map ชื่อได้)
+#                เปลี่ยน 6 ตัวท้ายไม่ให้ซ้ำ, ราคาทุกคอลัมน์คูณตัวคูณเดียวกัน (ลำดับ R2 > R1 > W2 > W1 ไม่เปลี่ยน)
+# - Customer   : แถวเดิม + สำเนา รหัสใหม่ ยอดซื้อ / ความถี่ / ยอดแยกหมวด สุ่มคูณ
+# - Quote_*    : ใบเสนอราคาสังเคราะห์ QUOTES_PER_SCALE × scale ใบ (ให้ list_quotations มีของให้อ่าน)
+import random
+import sqlite3
+from pathlib import Path
+
+DEFAULT_SOURCE = Path(__file__).resolve().parent.parent / "data" / "Quetung.db"
+
+ITEM_PRICE_COLUMNS = ("RE", "W1", "W2", "R1", "R2")
+CUSTOMER_SCALE_COLUMNS = ("Accum6m", "G", "A", "S", "Y", "C", "E")
+QUOTES_PER_SCALE = 50
+LINES_PER_QUOTE = 10
+
+
+def _columns(conn, table: str) -> list:
+    return [r[1] for r in conn.execute(f'PRAGMA table_info("{table}")')]
+
+
+def _insert(conn, table: str, columns: list, rows: list):
+    cols = ", ".join(f'"{c}"' for c in columns)
+    marks = ", ".join("?" * len(columns))
+    conn.executemany(f'INSERT INTO "{table}" ({cols}) VALUES ({marks})', rows)
+
+
+def _scale_number(value, factor: float):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return round(value * factor, 2)
+    return value
+
+
+def _grow_items(conn, rng: random.Random, scale: int) -> int:
+    columns = _columns(conn, "Items_Test")
+    sku_ix = columns.index("No.")
+    price_ix = [columns.index(c) for c in ITEM_PRICE_COLUMNS if c in columns]
+    inv_ix = columns.index("Inventory") if "Inventory" in columns else None
+    base = conn.execute('SELECT * FROM "Items_Test" ORDER BY rowid').fetchall()
+
+    used = {str(r[sku_ix]) for r in base}
+    rows = []
+    for _ in range(scale - 1):
+        for r in base:
+            row = list(r)
+            head = str(row[sku_ix])[:12]
+            while True:
+                sku = head + f"{rng.randrange(10 ** 6):06d}"
+                if sku not in used:
+                    break
+            used.add(sku)
+            row[sku_ix] = sku
+            factor = rng.uniform(0.8, 1.2)
+            for i in price_ix:
+                row[i] = _scale_number(row[i], factor)
+            if inv_ix is not None:
+                row[inv_ix] = float(rng.randrange(0, 5000))
+            rows.append(row)
+    _insert(conn, "Items_Test", columns, rows)
+    return len(base) + len(rows)
+
+
+def _grow_customers(conn, rng: random.Random, scale: int) -> int:
+    columns = _columns(conn, "Customer")
+    code_ix = columns.index("Customer")
+    name_ix = columns.index("Name")
+    tel_ix = columns.index("Tel") if "Tel" in columns else None
+    freq_ix = columns.index("Frequency") if "Frequency" in columns else None
+    scale_ix = [columns.index(c) for c in CUSTOMER_SCALE_COLUMNS if c in columns]
+    base = conn.execute('SELECT * FROM "Customer" ORDER BY rowid').fetchall()
+
+    rows = []
+    for k in range(1, scale):
+        for n, r in enumerate(base):
+            row = list(r)
+            row[code_ix] = f"BX{k:03d}{n:06d}"
+            row[name_ix] = f"{row[name_ix]} #{k}"
+            if tel_ix is not None:
+                row[tel_ix] = f"0{rng.randrange(60, 100)}-{rng.randrange(1000):03d}-{rng.randrange(10000):04d}"
+            factor = rng.uniform(0.3, 3.0)
+            for i in scale_ix:
+                row[i] = _scale_number(row[i], factor)
+            if freq_ix is not None and isinstance(row[freq_ix], (int, float)):
+                row[freq_ix] = float(max(0, round(row[freq_ix] * rng.uniform(0.5, 1.5))))
+            rows.append(row)
+    _insert(conn, "Customer", columns, rows)
+    return len(base) + len(rows)
+
+
+def _add_quotes(conn, rng: random.Random, scale: int) -> int:
+    skus = [r[0] for r in conn.execute('SELECT "No." FROM "Items_Test" ORDER BY rowid LIMIT 5000')]
+    customers = conn.execute('SELECT "Customer", "Name", "Tel" FROM "Customer" ORDER BY rowid LIMIT 5000').fetchall()
+    header_cols = _columns(conn, "Quote_Header")
+    line_cols = _columns(conn, "Quote_Line")
+
+    headers, lines = [], []
+    for i in range(QUOTES_PER_SCALE * scale):
+        quote_no = f"BENCH-{i:07d}"
+        code, name, tel = rng.choice(customers)
+        day = f"2025-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}T{rng.randrange(24):02d}:{rng.randrange(60):02d}:00"
+        subtotal = 0.0
+        for sku in rng.sample(skus, LINES_PER_QUOTE):
+            qty = float(rng.randrange(1, 50))
+            price = round(rng.uniform(10, 2000), 2)
+            subtotal += qty * price
+            line = {
+                "QuoteID": quote_no, "ItemCode": sku, "ItemName": "bench", "Category": sku[:1],
+                "Unit": "", "Quantity": qty, "UnitPrice": price, "TotalPrice": round(qty * price, 2),
+                "IsGlassCut": "N", "CutInfoJson": '""', "Remark": "",
+            }
+            lines.append([line.get(c) for c in line_cols])
+        header = {
+            "QuoteNo": quote_no, "Status": rng.choice(("draft", "complete", "cancelled")),
+            "CustomerCode": code, "SalesID": "BENCH", "SalesName": "bench", "CreateDate": day,
+            "ExpireDate": "", "ApproveDate": day, "BranchCode": rng.choice(("00TR", "01TJ")),
+            "PaymentTerm": "", "CreditTerm": "", "ShippingMethod": "PICKUP", "ShippingCost": 0,
+            "DiscountAmount": 0, "SubtotalAmount": round(subtotal, 2), "TotalAmount": round(subtotal * 1.07, 2),
+            "NeedsTax": "N", "BillTaxName": "", "Remark": "", "LastUpdate": day,
+            "CustomerName": name, "Tel": tel, "ShippingCustomerPay": 0,
+        }
+        headers.append([header.get(c) for c in header_cols])
+    _insert(conn, "Quote_Header", header_cols, headers)
+    _insert(conn, "Quote_Line", line_cols, lines)
+    return len(headers)
+
+
+def build_dataset(path: Path, scale: int, seed: int = 0, source: Path = DEFAULT_SOURCE) -> dict:
+    """สร้าง DB สังเคราะห์ที่ path (ทับไฟล์เดิม) คืนจำนวนแถวของแต่ละตาราง"""
+    path = Path(path)
+    for p in (path, path.with_name(path.name + "-wal"), path.with_name(path.name + "-shm")):
+        p.unlink(missing_ok=True)
+
+    src = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+    dst = sqlite3.connect(path)
+    try:
+        src.backup(dst)
+        rng = random.Random(f"{seed}:{scale}")
+        with dst:
+            counts = {
+                "items": _grow_items(dst, rng, scale),
+                "customers": _grow_customers(dst, rng, scale),
+                "bench_quotes": _add_quotes(dst, rng, scale),
+            }
+        dst.execute("ANALYZE")
+    finally:
+        src.close()
+        dst.close()
+    return counts
@@ -0,0 +1,447 @@
+# bench/load.py — load test แบบจำลองพนักงานหน้าร้านหลายคนพร้อมกัน (ยิง uvicorn จริงผ่าน HTTP)
+#
+#   python -m bench load --users 20 --duration 60 --think 0.5
+#   python -m bench load --url http://127.0.0.1:4000 ...     # ใช้ server ที่รันอยู่แล้ว (ไม่ spawn เอง)
+#
+# 1 session = ลำดับเดียวกับหน้าจอ CreateQuote:
+#   login → โหลดรายการใบเสนอราคา (dashboard) → ค้นลูกค้าทีละตัวอักษร
+#   → เลือกสินค้าผ่าน /master แบบ cascade (+ /items หรือ /glass/list) → /api/pricing/calculate ทุกครั้งที่ตะกร้าเปลี่ยน
+#   → บันทึกใบเสนอราคา
+# ผู้ใช้แต่ละคน = 1 thread + 1 keep-alive connection (เหมือน browser) หน่วงระหว่างขั้นด้วย think time
+#
+# ไม่ส่ง --url → copy Quetung.db (หรือสร้าง dataset N เท่าด้วย --scale) ไปไฟล์ชั่วคราว แล้วรัน uvicorn ชี้ไฟล์นั้น
+import gzip
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+from pathlib import Path
+
+from bench.dataset import build_dataset
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+EXCEL_TEMPLATE = BACKEND_DIR / "data" / "QuoteTemplate.xlsx"
+
+# (path ของ family, query param → key ของ /master ตามลำดับ cascade)
+FAMILIES = {
+    "aluminium": ("brand", "group", "subGroup", "color", "thickness"),
+    "gypsum": ("brand", "group", "subGroup", "color", "thickness"),
+    "sealant": ("brand", "group", "subGroup", "color"),
+    "cline": ("brand", "group", "subGroup", "color", "thickness"),
+    "accessories": ("brand", "group", "subGroup", "color", "character"),
+}
+MASTER_KEYS = {
+    "brand": "brands", "group": "groups", "subGroup": "subGroups",
+    "color": "colors", "thickness": "thickness", "character": "characters",
+}
+SERVER_START_TIMEOUT = 120.0
+
+
+# ============================
+# สถิติ
+# ============================
+def percentile(sorted_values: list, p: float):
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = defaultdict(list)        # endpoint → [วินาที]
+        self.status = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)          # endpoint → exception / 5xx
+        self.error_samples = {}
+        self.sessions = []                      # เวลาทั้ง session (วินาที)
+        self.failed_sessions = 0
+
+    def add(self, endpoint: str, seconds: float, status, error: str | None = None):
+        with self.lock:
+            self.latency[endpoint].append(seconds)
+            self.status[endpoint][str(status)] += 1
+            if error is not None:
+                self.errors[endpoint] += 1
+                self.error_samples.setdefault(endpoint, error)
+
+    def session_done(self, seconds: float, ok: bool):
+        with self.lock:
+            if ok:
+                self.sessions.append(seconds)
+            else:
+                self.failed_sessions += 1
+
+    def summary(self, wall: float) -> dict:
+        with self.lock:
+            endpoints = {}
+            total = 0
+            for name in sorted(self.latency):
+                ms = sorted(s * 1000 for s in self.latency[name])
+                total += len(ms)
+                endpoints[name] = {
+                    "count": len(ms),
+                    "errors": self.errors[name],
+                    "status": dict(self.status[name]),
+                    "p50_ms": round(percentile(ms, 50), 3),
+                    "p95_ms": round(percentile(ms, 95), 3),
+                    "p99_ms": round(percentile(ms, 99), 3),
+                    "max_ms": round(ms[-1], 3),
+                    "mean_ms": round(sum(ms) / len(ms), 3),
+                }
+            sessions = sorted(self.sessions)
+            return {
+                "wall_s": round(wall, 3),
+                "requests": total,
+                "rps": round(total / wall, 2) if wall else None,
+                "errors": sum(self.errors.values()),
+                "sessions": len(sessions),
+                "failed_sessions": self.failed_sessions,
+                "session_p50_s": round(percentile(sessions, 50), 3) if sessions else None,
+                "session_p95_s": round(percentile(sessions, 95), 3) if sessions else None,
+                "endpoints": endpoints,
+                "error_samples": dict(self.error_samples),
+            }
+
+
+# ============================
+# HTTP client (keep-alive ต่อ user)
+# ============================
+class _SessionError(Exception):
+    pass
+
+
+class Client:
+    def __init__(self, base_url: str, recorder: Recorder, timeout: float):
+        url = urllib.parse.urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.recorder = recorder
+        self.timeout = timeout
+        self.conn = None
+
+    def _connection(self):
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return self.conn
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def request(self, method: str, endpoint: str, path: str, body=None, ok=(200,)):
+        """endpoint = ชื่อที่ใช้รวมสถิติ (path template) คืน JSON หรือ None ถ้า status อยู่นอก ok"""
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Accept-Encoding": "gzip", "Accept": "application/json"}
+        if data is not None:
+            headers["Content-Type"] = "application/json"
+
+        t0 = time.perf_counter()
+        try:
+            conn = self._connection()
+            conn.request(method, path, body=data, headers=headers)
+            resp = conn.getresponse()
+            raw = resp.read()
+        except (OSError, http.client.HTTPException) as e:
+            self.recorder.add(endpoint, time.perf_counter() - t0, "exception", f"{type(e).__name__}: {e}")
+            self.close()
+            raise _SessionError(endpoint) from e
+        elapsed = time.perf_counter() - t0
+
+        status = resp.status
+        error = f"HTTP {status}: {raw[:200]!r}" if status >= 500 else None
+        self.recorder.add(endpoint, elapsed, status, error)
+        if status >= 500:
+            raise _SessionError(endpoint)
+        if status not in ok:
+            return None
+        if resp.getheader("Content-Encoding") == "gzip":
+            raw = gzip.decompress(raw)
+        return json.loads(raw) if raw else None
+
+
+# ============================
+# session ของพนักงานหน้าร้าน
+# ============================
+class SessionData:
+    """ข้อมูลสุ่มของ session (อ่านจาก DB ชั่วคราวครั้งเดียว)"""
+
+    def __init__(self, db_path: Path):
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            self.employees = [r[0] for r in conn.execute('SELECT "No." FROM "Employees" WHERE "No." IS NOT NULL')]
+            self.customers = conn.execute(
+                'SELECT "Customer", "Name" FROM "Customer" WHERE "Customer" IS NOT NULL ORDER BY rowid LIMIT 5000'
+            ).fetchall()
+        finally:
+            conn.close()
+
+
+class SalesSession:
+    def __init__(self, client: Client, data: SessionData, rng: random.Random, think: float, keystroke: float,
+                 stop: threading.Event):
+        self.client = client
+        self.data = data
+        self.rng = rng
+        self.think = think
+        self.keystroke = keystroke
+        self.stop = stop
+
+    def _pause(self, mean: float):
+        if mean > 0:
+            self.stop.wait(self.rng.uniform(0.5, 1.5) * mean)
+
+    def run(self):
+        c, rng = self.client, self.rng
+
+        login = c.request("POST", "POST /api/login", "/api/login",
+                          {"employeeCode": rng.choice(self.data.employees)}, ok=(200, 401))
+        employee = (login or {}).get("employee") or {}
+        self._pause(self.think)
+
+        c.request("GET", "GET /api/quotation?status=complete", "/api/quotation?status=complete")
+        c.request("GET", "GET /api/quotation?status=draft", "/api/quotation?status=draft")
+        self._pause(self.think)
+
+        customer = self._search_customer()
+        self._pause(self.think)
+
+        cart = []
+        for family in rng.sample(list(FAMILIES) + ["glass"], rng.randint(1, 3)):
+            for item in self._pick_items(family):
+                sku = item.get("sku") or item.get("itemCode")      # accessories ใช้ itemCode
+                name = item.get("name") or item.get("description") or ""
+                cart.append({"sku": sku, "name": name, "qty": rng.randint(1, 20)})
+                self._price(customer, cart)
+                self._pause(self.think)
+
+        # แก้จำนวนในตะกร้าอีกสองสามครั้ง → คำนวณใหม่ทุกครั้ง
+        for _ in range(rng.randint(0, 3) if cart else 0):
+            rng.choice(cart)["qty"] = rng.randint(1, 50)
+            self._price(customer, cart)
+            self._pause(self.think)
+
+        if cart:
+            priced = self._price(customer, cart) or {}
+            self._save_quote(employee, customer, cart, priced)
+
+    def _search_customer(self) -> dict:
+        code, name = self.rng.choice(self.data.customers)
+        term = str(code) if self.rng.random() < 0.5 else str(name or code).strip()[:8]
+        found = None
+        for n in range(1, len(term) + 1):
+            q = urllib.parse.quote(term[:n])
+            found = self.client.request("GET", "GET /api/customer/search",
+                                        f"/api/customer/search?code={q}&phone={q}&name={q}", ok=(200, 404)) or found
+            self._pause(self.keystroke)
+        return found or {}
+
+    def _pick_items(self, family: str) -> list:
+        rng = self.rng
+        if family == "glass":
+            items = (self.client.request("GET", "GET /api/glass/list", "/api/glass/list") or {}).get("items") or []
+            return rng.sample(items, min(len(items), rng.randint(1, 2)))
+
+        filters = {}
+        endpoint = f"GET /api/{family}/master"
+        master = self.client.request("GET", endpoint, f"/api/{family}/master")
+        for param in FAMILIES[family][:rng.randint(1, len(FAMILIES[family]))]:
+            options = (master or {}).get(MASTER_KEYS[param]) or []
+            if not options:
+                break
+            choice = rng.choice(options)
+            filters[param] = choice["code"] if isinstance(choice, dict) else choice
+            self._pause(self.think / 2)
+            master = self.client.request("GET", endpoint, f"/api/{family}/master?{urllib.parse.urlencode(filters)}")
+
+        query = urllib.parse.urlencode(filters)
+        items = self.client.request("GET", f"GET /api/{family}/items", f"/api/{family}/items?{query}") or []
+        return rng.sample(items, min(len(items), rng.randint(1, 3)))
+
+    def _price(self, customer: dict, cart: list):
+        customer_data = {"code": customer.get("id") or customer.get("code") or "", **customer,
+                         "deliveryType": "DELIVERY", "shippingCustomerPay": 0}
+        return self.client.request("POST", "POST /api/pricing/calculate", "/api/pricing/calculate", {
+            "customerData": customer_data, "deliveryType": "DELIVERY", "cart": cart,
+        })
+
+    def _save_quote(self, employee: dict, customer: dict, cart: list, priced: dict):
+        prices = {line.get("sku"): line.get("NewPrice") for line in priced.get("items") or []}
+        lines = [{**item, "price": prices.get(item["sku"]) or 0} for item in cart]
+        self.client.request("POST", "POST /api/quotation", "/api/quotation", {
+            "employee": {"id": employee.get("id", ""), "name": employee.get("name", ""),
+                         "branchId": employee.get("branchId") or "00TR"},
+            "customer": {"code": customer.get("id", ""), "name": customer.get("name", ""),
+                         "phone": customer.get("phone", "")},
+            "deliveryType": "DELIVERY",
+            "cart": lines,
+            "totals": priced.get("totals") or {},
+        })
+
+
+def _user_loop(base_url, data, recorder, args, seed, stop, deadline, start_delay):
+    rng = random.Random(seed)
+    if stop.wait(start_delay):
+        return
+    client = Client(base_url, recorder, args.timeout)
+    done = 0
+    try:
+        while not stop.is_set() and time.monotonic() < deadline:
+            if args.sessions and done >= args.sessions:
+                break
+            t0 = time.perf_counter()
+            try:
+                SalesSession(client, data, rng, args.think, args.keystroke, stop).run()
+                recorder.session_done(time.perf_counter() - t0, True)
+            except _SessionError:
+                recorder.session_done(time.perf_counter() - t0, False)
+            except Exception as e:          # response หน้าตาไม่ตรงที่สคริปต์คาด → นับเป็น session พัง
+                recorder.add("session", time.perf_counter() - t0, "script", f"{type(e).__name__}: {e}")
+                recorder.session_done(time.perf_counter() - t0, False)
+            done += 1
+    finally:
+        client.close()
+
+
+# ============================
+# server ชั่วคราว
+# ============================
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(base_url: str, proc: subprocess.Popen):
+    url = urllib.parse.urlsplit(base_url)
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection(url.hostname, url.port, timeout=2)
+            conn.request("GET", "/")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("uvicorn did not become ready in time")
+
+
+def _start_server(workdir: Path, args):
+    db = workdir / "load.db"
+    if args.scale > 1:
+        build_dataset(db, args.scale, seed=args.seed, source=Path(args.source))
+    else:
+        src = sqlite3.connect(f"file:{args.source}?mode=ro", uri=True)
+        dst = sqlite3.connect(db)
+        try:
+            src.backup(dst)
+        finally:
+            src.close()
+            dst.close()
+    excel = workdir / "load.xlsx"
+    if EXCEL_TEMPLATE.exists():
+        shutil.copy(EXCEL_TEMPLATE, excel)
+
+    port = _free_port()
+    env = dict(os.environ, DB_FILE=str(db), EXCEL_FILE=str(excel), LOG_LEVEL=args.server_log_level)
+    cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+           "--log-level", "warning", "--no-access-log", "--workers", str(args.server_workers)]
+    log = open(workdir / "server.log", "wb")
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(base_url, proc)
+    except Exception:
+        _stop_server(proc)
+        log.close()
+        sys.stderr.write((workdir / "server.log").read_text(errors="replace")[-4000:])
+        raise
+    return proc, log, base_url, db
+
+
+def _stop_server(proc: subprocess.Popen):
+    proc.terminate()
+    try:
+        proc.wait(15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def run_load(args) -> dict:
+    workdir = Path(tempfile.mkdtemp(prefix="smartpricing-load-"))
+    proc = log = None
+    try:
+        if args.url:
+            base_url, db = args.url.rstrip("/"), Path(args.source)
+        else:
+            print("[load] starting uvicorn on a scratch database …", file=sys.stderr)
+            proc, log, base_url, db = _start_server(workdir, args)
+
+        data = SessionData(db)
+        recorder = Recorder()
+        stop = threading.Event()
+        deadline = time.monotonic() + args.duration
+        ramp = args.ramp / args.users if args.users else 0
+        threads = [
+            threading.Thread(target=_user_loop, name=f"user-{i}", daemon=True,
+                             args=(base_url, data, recorder, args, f"{args.seed}:{i}", stop, deadline, i * ramp))
+            for i in range(args.users)
+        ]
+        print(f"[load] {args.users} users for {args.duration:g}s against {base_url} …", file=sys.stderr)
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        try:
+            for t in threads:
+                t.join(max(0.0, deadline - time.monotonic()) + args.timeout + 5)
+        finally:
+            stop.set()
+            for t in threads:
+                t.join(args.timeout + 5)
+        wall = time.perf_counter() - t0
+
+        result = recorder.summary(wall)
+        result["config"] = {
+            "users": args.users, "duration_s": args.duration, "think_s": args.think, "keystroke_s": args.keystroke,
+            "ramp_s": args.ramp, "sessions_per_user": args.sessions, "seed": args.seed, "scale": args.scale,
+            "server_workers": args.server_workers, "url": args.url,
+        }
+        return result
+    finally:
+        if proc is not None:
+            _stop_server(proc)
+            log.close()
+        if args.keep:
+            print(f"[load] kept {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def format_load(result: dict) -> str:
+    lines = [
+        f"{result['requests']} requests in {result['wall_s']:.1f}s ({result['rps']} req/s), "
+        f"{result['errors']} errors, {result['sessions']} sessions ({result['failed_sessions']} failed), "
+        f"session p50 {result['session_p50_s']}s p95 {result['session_p95_s']}s",
+        f"{'endpoint':<42} {'count':>6} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}",
+    ]
+    for name, s in result["endpoints"].items():
+        lines.append(f"{name:<42} {s['count']:>6} {s['errors']:>4} {s['p50_ms']:>9.2f} {s['p95_ms']:>9.2f} "
+                     f"{s['p99_ms']:>9.2f} {s['max_ms']:>9.2f}")
+    for name, err in result["error_samples"].items():
+        lines.append(f"  ! {name}: {err}")
+    return "\n".join(lines)
@@ -0,0 +1,101 @@
+# bench/report.py — สรุปเวลา (ms) ของแต่ละ case และเทียบกับ baseline
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPORT_VERSION = 1
+DEFAULT_THRESHOLD = 1.15     # ช้ากว่า baseline เกิน 15% (median) = regression
+
+
+def summarize(samples: list) -> dict:
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "n": len(ms),
+        "min_ms": round(ms[0], 3),
+        "median_ms": round(statistics.median(ms), 3),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+        "mean_ms": round(statistics.fmean(ms), 3),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=Path(__file__).parent, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def new_report(config: dict) -> dict:
+    return {
+        "version": REPORT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "config": config,
+        "scales": {},
+    }
+
+
+def add_scale(report: dict, scale: int, dataset: dict, result: dict):
+    report["scales"][str(scale)] = {
+        "dataset": dataset,
+        "startup_s": round(result["startup_s"], 3),
+        "cases": {name: summarize(samples) for name, samples in result["cases"].items()},
+        "errors": result["errors"],
+    }
+
+
+def load(path) -> dict:
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    if report.get("version") != REPORT_VERSION:
+        raise ValueError(f"{path}: report version {report.get('version')} (ต้องเป็น {REPORT_VERSION})")
+    return report
+
+
+def save(report: dict, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def compare(current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """แถวเทียบ median ของ case ที่มีทั้งสองฝั่ง: (scale, case, baseline_ms, current_ms, ratio, regressed)"""
+    rows = []
+    for scale, cur in current["scales"].items():
+        base = baseline["scales"].get(scale)
+        if base is None:
+            continue
+        for name, stats in cur["cases"].items():
+            old = base["cases"].get(name)
+            if old is None:
+                continue
+            ratio = stats["median_ms"] / old["median_ms"] if old["median_ms"] else float("inf")
+            rows.append((scale, name, old["median_ms"], stats["median_ms"], ratio, ratio > threshold))
+    return rows
+
+
+def format_report(report: dict) -> str:
+    lines = []
+    for scale, data in report["scales"].items():
+        counts = ", ".join(f"{k}={v}" for k, v in data["dataset"].items())
+        lines.append(f"== scale {scale}x ({counts}; startup {data['startup_s']:.2f}s)")
+        for name, s in data["cases"].items():
+            lines.append(f"  {name:<55} median {s['median_ms']:>10.3f} ms   p95 {s['p95_ms']:>10.3f} ms")
+        for name, err in data["errors"].items():
+            lines.append(f"  {name:<55} ERROR {err}")
+    return "\n".join(lines)
+
+
+def format_comparison(rows: list, threshold: float = DEFAULT_THRESHOLD) -> str:
+    lines = [f"{'scale':>5}  {'case':<55} {'baseline':>10} {'current':>10} {'ratio':>7}"]
+    for scale, name, old, new, ratio, regressed in rows:
+        flag = "  REGRESSION" if regressed else ("  faster" if ratio < 1 / threshold else "")
+        lines.append(f"{scale + 'x':>5}  {name:<55} {old:>10.3f} {new:>10.3f} {ratio:>6.2f}x{flag}")
+    return "\n".join(lines)
@@ -0,0 +1,164 @@
+# cart_sessions.py — ตะกร้าที่ server จำไว้ (/api/pricing/carts)
+#
+# แทนการส่งทั้งตะกร้าไป /calculate ทุกครั้งที่แก้: เพิ่ม / แก้ qty / ลบ ทีละบรรทัด
+# - แต่ละบรรทัดเก็บผลที่คำนวณแล้ว (rows แบบเดียวกับ quote_cache: แถวหลัง merge Items_Test + tier ลูกค้า)
+#   + ยอดเงินของบรรทัด (ราคา × qty, กำไร, ส่วนที่บวกจากเครดิต) คำนวณไว้ตอนใส่บรรทัด
+# - totals รวมยอดของทุกบรรทัดด้วย numpy ตอนตอบ (ไม่ใช่บวก/ลบสะสม): ผลรวม float ต้องเท่ากับ /calculate
+#   ทุกบิต ไม่งั้น round(…, 2) ของ VAT / ยอดรวมต่างกัน 1 สตางค์ได้ — งานนี้ไม่กี่ µs ต่างจาก pipeline pandas
+# - generation (catalog / pricing model ...) ที่ใช้คำนวณติดไว้กับ session
+#   → ผู้เรียกเห็นว่าไม่ตรงกับปัจจุบันแล้วคำนวณใหม่ทั้งตะกร้า (reload_lines)
+# หมดอายุเมื่อไม่ถูกใช้เกิน TTL_SECONDS, เก็บได้ไม่เกิน MAX_SESSIONS (เกิน → ทิ้งตัวที่ไม่ได้ใช้นานสุด)
+import math
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+MAX_SESSIONS = int(os.getenv("CART_SESSION_MAX", "2000"))
+TTL_SECONDS = float(os.getenv("CART_SESSION_TTL", "1800"))
+MAX_LINES = int(os.getenv("CART_SESSION_MAX_LINES", "500"))
+
+VAT_RATE = 0.07
+
+
+def _num(value) -> float:
+    # เทียบเท่า pd.to_numeric(errors="coerce").fillna(0)
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if math.isnan(value) else value
+
+
+def _line_amounts(rows) -> tuple:
+    """ยอดของแต่ละแถว: (ราคา × qty, กำไร, ส่วนที่บวกจากเครดิต) — สูตรเดียวกับ _priced_response"""
+    return tuple(
+        (
+            row["NewPrice"] * row["Quantity"],
+            (row["NewPrice"] - _num(row.get("cost"))) * row["Quantity"],
+            (row["NewPrice"] - row.get("_BasePrice", row["NewPrice"])) * row["Quantity"],
+        )
+        for row in rows
+    )
+
+
+class CartSession:
+    def __init__(self, customer_data: dict, customer_code: str, delivery_type: str, breakdown: bool):
+        self.id = secrets.token_urlsafe(12)
+        self.customer_data = customer_data
+        self.customer_code = customer_code
+        self.delivery_type = delivery_type
+        self.breakdown = breakdown
+        self.generation = None
+        self.lines = {}          # line_id → (CartItem, rows, ยอดต่อแถว) เรียงตามลำดับที่เพิ่ม
+        self.next_line = 1
+        self.lock = threading.Lock()
+        self.touched = time.monotonic()
+
+    def put_line(self, line_id: int, item, rows: tuple):
+        # บรรทัดเดิม → แทนที่ตำแหน่งเดิม (ลำดับใน dict ไม่เปลี่ยน)
+        self.lines[line_id] = (item, rows, _line_amounts(rows))
+
+    def items(self) -> list:
+        return [item for item, _, _ in self.lines.values()]
+
+    def drop_line(self, line_id: int) -> bool:
+        return self.lines.pop(line_id, None) is not None
+
+    def reload_lines(self, generation, rows_per_line: list):
+        """คำนวณใหม่ทั้งตะกร้าแล้ว (generation เปลี่ยน / เปลี่ยนวิธีรับสินค้า)"""
+        items = [(line_id, item) for line_id, (item, _, _) in self.lines.items()]
+        self.lines = {}
+        for (line_id, item), rows in zip(items, rows_per_line):
+            self.put_line(line_id, item, rows)
+        self.generation = generation
+
+    def customer_tier(self):
+        if not self.customer_code:
+            return "R2"
+        for _, rows, _ in self.lines.values():
+            if rows:
+                return rows[0]["_Tier_Z"]
+        return "N/A"
+
+    def totals(self) -> dict:
+        # สูตรเดียวกับ _priced_response / _default_response
+        amounts = [a for _, _, line in self.lines.values() for a in line]
+        # array ต่อเนื่องแยกคอลัมน์ → ลำดับการบวก (pairwise) ของ numpy ตรงกับ Series.sum() ใน /calculate
+        line_totals, profits, markups = (np.array(col, dtype=np.float64) for col in zip(*amounts)) \
+            if amounts else (np.zeros(0),) * 3
+        subtotal = float(line_totals.sum())
+        vat = float(round(subtotal * VAT_RATE, 2))
+        product_total = float(round(subtotal + vat, 2))
+        shipping_customer_pay = float(self.customer_data.get("shippingCustomerPay", 0) or 0)
+        totals = {
+            "subtotal": subtotal,
+            "vat": vat,
+            "product_total": product_total,
+            "shippingCustomerPay": shipping_customer_pay,
+            "total": float(round(product_total + shipping_customer_pay, 2)),
+            "profit": float(profits.sum()) if self.customer_code else 0,
+        }
+        if self.breakdown and self.customer_code:
+            # _priced_response รวมด้วย sum() ของ Python ทีละบรรทัด
+            totals["payment_term_markup"] = float(round(sum(markups.tolist()), 2))
+        return totals
+
+
+_lock = threading.Lock()
+_sessions: "OrderedDict[str, CartSession]" = OrderedDict()     # ไม่ได้ใช้นานสุดอยู่หน้า
+_stats = {"created": 0, "expired": 0, "evicted": 0, "deleted": 0}
+
+
+def _sweep(now: float):
+    # เรียกตอนถือ _lock — ตัวหน้าสุดคือตัวที่ไม่ได้ใช้นานสุด → หยุดที่ตัวแรกที่ยังไม่หมดอายุ
+    while _sessions:
+        session = next(iter(_sessions.values()))
+        if now - session.touched <= TTL_SECONDS:
+            break
+        _sessions.popitem(last=False)
+        _stats["expired"] += 1
+
+
+def add(session: CartSession):
+    with _lock:
+        _sweep(time.monotonic())
+        _sessions[session.id] = session
+        _stats["created"] += 1
+        while len(_sessions) > MAX_SESSIONS:
+            _sessions.popitem(last=False)
+            _stats["evicted"] += 1
+
+
+def get(cart_id: str) -> CartSession | None:
+    now = time.monotonic()
+    with _lock:
+        _sweep(now)
+        session = _sessions.get(cart_id)
+        if session is not None:
+            session.touched = now
+            _sessions.move_to_end(cart_id)
+        return session
+
+
+def remove(cart_id: str) -> bool:
+    with _lock:
+        if _sessions.pop(cart_id, None) is None:
+            return False
+        _stats["deleted"] += 1
+        return True
+
+
+def stats() -> dict:
+    with _lock:
+        _sweep(time.monotonic())
+        return {
+            "sessions": len(_sessions),
+            "max_sessions": MAX_SESSIONS,
+            "ttl_seconds": TTL_SECONDS,
+            "max_lines": MAX_LINES,
+            **_stats,
+        }
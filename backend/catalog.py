@@ -0,0 +1,122 @@
+# catalog.py — Snapshot ของ Items_Test ในหน่วยความจำ (ใช้ร่วมกันทุก router)
+#
+# โหลดทั้งตารางครั้งเดียว แบ่ง partition ตามตัวอักษรแรกของ SKU (A/C/E/G/S/Y)
+# แล้วสลับ snapshot ใหม่ทั้งก้อนเมื่อแถวใน Items_Test เปลี่ยนจริง หรือมีการ bump_version()
+# - แถวใน Items_Test ถูกเขียน (table_version) → อ่านตารางใหม่แล้วเทียบ ถ้าเหมือนเดิมก็ใช้ snapshot / version เดิมต่อ
+#   (บันทึกใบเสนอราคา / outbox ไม่แตะ Items_Test → ไม่ต้องอ่านใหม่ และ catalog_version ไม่เปลี่ยน
+#   → cache ที่ผูกกับ version ไม่หลุด)
+#
+# ⚠️ DataFrame และค่าจาก derived() (index / item dict ของ sku_family ฯลฯ) ถูกแชร์ระหว่าง request → ห้ามแก้ไข in-place
+#    (DataFrame ล็อกไม่ได้ และ item dict ต้องส่งเข้า orjson ตรง ๆ จึงคืนตัวจริง ไม่ใช่ view อ่านอย่างเดียว)
+import threading
+import pandas as pd
+from db_sqlite import read_conn, table_version
+
+ITEMS_TABLE = "Items_Test"
+
+
+class CatalogSnapshot:
+    def __init__(self, bumps: int, version: int, items: pd.DataFrame):
+        self.bumps = bumps
+        self.version = version
+        self.items = items
+
+        prefix = items["No."].astype(str).str.upper().str[:1]
+        self.families = {
+            p: part.reset_index(drop=True)
+            for p, part in items.groupby(prefix, sort=False)
+        }
+        self._empty = items.iloc[0:0]
+
+        self._derived = {}
+        self._derived_lock = threading.RLock()   # builder เรียก derived() ตัวอื่นซ้อนได้
+
+    def family(self, prefix: str) -> pd.DataFrame:
+        """สินค้าที่ SKU ขึ้นต้นด้วย prefix (ไม่สนตัวพิมพ์เล็ก/ใหญ่) เรียงตามลำดับในตาราง"""
+        return self.families.get(prefix.upper(), self._empty)
+
+    def derived(self, name: str, builder):
+        """ค่าที่คำนวณจาก snapshot นี้ (เช่น parse SKU) — คำนวณครั้งเดียวต่อ snapshot"""
+        try:
+            return self._derived[name]
+        except KeyError:
+            pass
+        with self._derived_lock:
+            if name not in self._derived:
+                self._derived[name] = builder(self)
+            return self._derived[name]
+
+
+_lock = threading.Lock()
+_bumps = 0          # นับการสั่ง reload ด้วยมือ (bump_version)
+_version = 0        # เพิ่มทุกครั้งที่สลับ snapshot
+_SNAPSHOT: CatalogSnapshot | None = None
+_stamp = None       # table_version ของ Items_Test ตอนเช็คล่าสุด
+_stats = {"hits": 0, "loads": 0, "unchanged_checks": 0}     # ไม่ล็อกตอนนับ hit (ใช้ดูแนวโน้ม ไม่ต้องแม่นทุกครั้ง)
+
+
+def _load_items() -> pd.DataFrame:
+    with read_conn() as conn:
+        df = pd.read_sql_query(f'SELECT * FROM "{ITEMS_TABLE}"', conn)
+
+    # กันเคสคอลัมน์มี space เช่น " Description"
+    df.columns = [c.strip() for c in df.columns]
+    return df
+
+
+def get_snapshot() -> CatalogSnapshot:
+    global _SNAPSHOT, _version, _stamp
+    stamp = table_version(ITEMS_TABLE)
+    snap = _SNAPSHOT
+    if snap is not None and snap.bumps == _bumps and stamp == _stamp:
+        _stats["hits"] += 1
+        return snap
+
+    with _lock:
+        snap = _SNAPSHOT
+        if snap is not None and snap.bumps == _bumps and stamp == _stamp:
+            _stats["hits"] += 1
+            return snap
+
+        items = _load_items()
+        if snap is None or snap.bumps != _bumps or not items.equals(snap.items):
+            _version += 1
+            _SNAPSHOT = CatalogSnapshot(_bumps, _version, items)
+            _stats["loads"] += 1
+        else:
+            _stats["unchanged_checks"] += 1
+        _stamp = stamp
+        return _SNAPSHOT
+
+
+def bump_version() -> None:
+    """บังคับให้โหลด Items_Test ใหม่ใน request ถัดไป (เช่น หลังนำเข้าราคาใหม่)"""
+    global _bumps
+    with _lock:
+        _bumps += 1
+
+
+def catalog_version() -> int:
+    return get_snapshot().version
+
+
+def get_items() -> pd.DataFrame:
+    return get_snapshot().items
+
+
+def get_family(prefix: str) -> pd.DataFrame:
+    return get_snapshot().family(prefix)
+
+
+def derived(name: str, builder):
+    return get_snapshot().derived(name, builder)
+
+
+def stats() -> dict:
+    """hit / load ของ snapshot (ไม่บังคับโหลด)"""
+    snap = _SNAPSHOT
+    return {
+        "version": snap.version if snap is not None else 0,
+        "items": len(snap.items) if snap is not None else 0,
+        **_stats,
+    }
@@ -1,9 +1,11 @@
 # customer.py  --- ใช้ SQLite เต็มรูปแบบ
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException, Response
 import pandas as pd
-from db_sqlite import get_conn
+from db_sqlite import read_conn
+from customer_index import get_index, index_version, clean
+from response_cache import cached_route
 
-router = APIRouter(prefix="/customer")
+router = APIRouter(prefix="/customer", route_class=cached_route(index_version))
 
 
 # ----------------------------------------
@@ -11,9 +13,8 @@ router = APIRouter(prefix="/customer")
 # ----------------------------------------
 @router.get("/")
 def get_customers():
-    conn = get_conn()
-    df = pd.read_sql_query('SELECT * FROM "Customer"', conn)
-    conn.close()
+    with read_conn() as conn:
+        df = pd.read_sql_query('SELECT * FROM "Customer"', conn)
     return df.to_dict(orient="records")
 
 
@@ -29,50 +30,55 @@ def search_customer(
     if not code and not phone and not name:
         raise HTTPException(status_code=400, detail="กรุณาระบุ code, phone หรือ name อย่างน้อย 1 ค่า")
 
-    conn = get_conn()
-
-    # --- Load entire table (ง่ายที่สุด และรองรับ column ที่มี space) ---
-    df = pd.read_sql_query('SELECT * FROM "Customer"', conn)
-    conn.close()
-
-    if df.empty:
+    idx = get_index()
+    if not idx.rows:
         raise HTTPException(status_code=500, detail="Customer table is empty")
 
-    def clean(x):
-        if x is None:
-            return ""
-        if pd.isna(x):
-            return ""
-        return str(x).strip()
-
     # -------- 1) ค้นด้วยรหัสลูกค้า ------------
-    found = pd.DataFrame()
+    r = None
     if code:
-        found = df[df["Customer"].astype(str).str.strip() == str(code).strip()]
+        r = idx.find_code(code)
 
-    # -------- 2) ค้นด้วยเบอร์โทร ------------
-    if found.empty and phone:
-        def normalize_phone(x):
-            x = clean(x)
-            return "".join(ch for ch in x if ch.isdigit())
-
-        target = normalize_phone(phone)
-        mask = df["Tel"].apply(lambda x: normalize_phone(x) == target)
-        found = df[mask]
+    # -------- 2) ค้นด้วยเบอร์โทร (เทียบเฉพาะตัวเลข) ------------
+    if r is None and phone:
+        r = idx.find_phone(phone)
 
     # -------- 3) ค้นด้วยชื่อ ------------
-    if found.empty and name:
-        search_name = name.strip().lower()
-        mask = df["Name"].astype(str).str.strip().str.lower().str.contains(search_name)
-        found = df[mask]
+    if r is None and name:
+        r = idx.find_name(name)
 
-    if found.empty:
+    if r is None:
         raise HTTPException(status_code=404, detail="ไม่พบข้อมูลลูกค้า")
 
-    r = found.iloc[0]
+    return _customer_json(r)
+
+
+# ----------------------------------------
+#  /customers/search/ranked → ค้นจากช่องเดียว คืนหลายรายการเรียงตามความใกล้เคียง
+# ----------------------------------------
+@router.get("/search/ranked")
+def search_customer_ranked(
+    q: str = Query(..., min_length=1, description="รหัส / เบอร์โทร / ชื่อ (บางส่วนก็ได้)"),
+    limit: int = Query(10, ge=1, le=50),
+):
+    results = []
+    for score, match, r in get_index().search(q, limit):
+        item = _customer_json(r)
+        item["score"] = score
+        item["match"] = match
+        results.append(item)
+    return results
+
+
+@router.get("/index/status")
+def customer_index_status(response: Response):
+    response.headers["Cache-Control"] = "no-store"
+    idx = get_index()
+    return {"version": idx.version, "rows": len(idx.rows), **idx.stats}
+
 
+def _customer_json(r) -> dict:
     # --------  ส่งข้อมูลกลับแบบ JSON  --------
-        # --------  ส่งข้อมูลกลับแบบ JSON  --------
     base = {
         "id": clean(r["Customer"]),
         "name": clean(r["Name"]),
@@ -0,0 +1,274 @@
+# customer_index.py — ดัชนีค้นหาลูกค้าในหน่วยความจำ (แทนการอ่านตาราง Customer ทั้งตารางทุกครั้งที่ค้นหา)
+#
+# - code  : dict รหัสลูกค้า (strip) → rowid
+# - phone : dict เบอร์ที่เหลือแต่ตัวเลข → rowid + list เรียงไว้ทำ prefix / suffix (พิมพ์ 4 ตัวท้าย)
+# - name  : trigram ของชื่อ (ตัวพิมพ์เล็ก) → rowid ใช้ได้ทั้งไทยและอังกฤษเพราะตัดเป็นตัวอักษร ไม่ต้องตัดคำ
+#
+# ลำดับ "แถวแรก" = rowid น้อยสุด (ตรงกับ SELECT * แล้วเอา iloc[0] แบบเดิม)
+# เมื่อแถวในตาราง Customer เปลี่ยน (table_version) จะอ่านตารางใหม่แล้วปรับเฉพาะแถวที่เพิ่ม/แก้/ลบ
+# (เขียนตารางอื่น เช่น ใบเสนอราคา / outbox ไม่ต้องอ่าน Customer ใหม่)
+import bisect
+import re
+import threading
+from collections import defaultdict
+
+import pandas as pd
+
+from db_sqlite import read_conn, table_version
+
+CUSTOMER_TABLE = "Customer"
+GRAM = 3
+
+_REGEX_CHARS = set(".^$*+?{}[]\\|()")
+
+
+def digits_only(x) -> str:
+    return "".join(ch for ch in clean(x) if ch.isdigit())
+
+
+def clean(x):
+    if x is None:
+        return ""
+    if pd.isna(x):
+        return ""
+    return str(x).strip()
+
+
+def normalize_name(x) -> str:
+    # สำหรับ ranked search: ไม่สนตัวพิมพ์ และรวมช่องว่างซ้อนเป็นช่องเดียว
+    return " ".join(clean(x).casefold().split())
+
+
+def _grams(text: str) -> set:
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+class CustomerIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stamp = None                   # table_version ของ Customer ที่ index นี้ตรงด้วย
+        self.version = 0
+        self.stats = {"full_loads": 0, "incremental_updates": 0, "rows_changed": 0}
+
+        self.rows = {}                      # rowid → record (ค่าตาม pandas เหมือนเดิม)
+        self.sigs = {}                      # rowid → tuple ไว้เทียบว่าแถวเปลี่ยนไหม
+        self.code_map = defaultdict(set)    # code → {rowid}
+        self.phone_map = defaultdict(set)   # digits → {rowid}
+        self.name_grams = defaultdict(set)  # trigram → {rowid}
+        self.names_compat = {}              # rowid → str(Name).strip().lower() (ค้นแบบ /search เดิม)
+        self.names_norm = {}                # rowid → normalize_name(Name)
+
+        self.order = []                     # rowid เรียงน้อย → มาก
+        self.codes_sorted = []              # [(code.casefold(), rowid)]
+        self.phones_sorted = []             # [(digits, rowid)]
+        self.phones_rev_sorted = []         # [(digits กลับด้าน, rowid)] ไว้หา suffix
+
+    # ----------------------------------------
+    #  build / refresh
+    # ----------------------------------------
+    def _add(self, rowid, rec):
+        code = str(rec["Customer"]).strip()
+        phone = digits_only(rec["Tel"])
+        name_compat = str(rec["Name"]).strip().lower()
+        name_norm = normalize_name(rec["Name"])
+
+        self.rows[rowid] = rec
+        self.code_map[code].add(rowid)
+        self.phone_map[phone].add(rowid)
+        self.names_compat[rowid] = name_compat
+        self.names_norm[rowid] = name_norm
+        for g in _grams(name_compat) | _grams(name_norm):
+            self.name_grams[g].add(rowid)
+
+    def _remove(self, rowid):
+        rec = self.rows.pop(rowid)
+        for mapping, key in (
+            (self.code_map, str(rec["Customer"]).strip()),
+            (self.phone_map, digits_only(rec["Tel"])),
+        ):
+            mapping[key].discard(rowid)
+            if not mapping[key]:
+                del mapping[key]
+        for g in _grams(self.names_compat.pop(rowid)) | _grams(self.names_norm.pop(rowid)):
+            self.name_grams[g].discard(rowid)
+            if not self.name_grams[g]:
+                del self.name_grams[g]
+
+    def _rebuild_sorted(self):
+        self.order = sorted(self.rows)
+        self.codes_sorted = sorted(
+            (code.casefold(), rid) for code, rids in self.code_map.items() if code for rid in rids
+        )
+        self.phones_sorted = sorted(
+            (p, rid) for p, rids in self.phone_map.items() if p for rid in rids
+        )
+        self.phones_rev_sorted = sorted((p[::-1], rid) for p, rid in self.phones_sorted)
+
+    def apply(self, df: pd.DataFrame, stamp=None) -> int:
+        """ปรับ index ให้ตรงกับ df (ตาราง Customer ทั้งตาราง + คอลัมน์ _rowid) คืนจำนวนแถวที่เปลี่ยน"""
+        records = df.drop(columns=["_rowid"]).to_dict("records")
+        fresh = {}
+        for rowid, rec in zip(df["_rowid"].tolist(), records):
+            fresh[rowid] = (rec, tuple(map(repr, rec.values())))
+
+        with self.lock:
+            first_load = not self.rows
+            removed = [rid for rid in self.sigs if rid not in fresh]
+            changed = [rid for rid, (_, sig) in fresh.items() if self.sigs.get(rid) != sig]
+
+            for rid in removed:
+                self._remove(rid)
+                del self.sigs[rid]
+            for rid in changed:
+                if rid in self.rows:
+                    self._remove(rid)
+                rec, sig = fresh[rid]
+                self._add(rid, rec)
+                self.sigs[rid] = sig
+
+            n = len(removed) + len(changed)
+            if n:
+                self._rebuild_sorted()
+                self.version += 1
+                self.stats["full_loads" if first_load else "incremental_updates"] += 1
+                self.stats["rows_changed"] += n
+            self.stamp = stamp
+            return n
+
+    def refresh(self, force: bool = False) -> int:
+        stamp = table_version(CUSTOMER_TABLE)
+        if not force and stamp == self.stamp:
+            return 0
+
+        with read_conn() as conn:
+            df = pd.read_sql_query(f'SELECT rowid AS _rowid, * FROM "{CUSTOMER_TABLE}"', conn)
+        return self.apply(df, stamp)
+
+    # ----------------------------------------
+    #  /customer/search (ผลเหมือนเดิม: แถวแรกที่ตรง)
+    # ----------------------------------------
+    def find_code(self, code: str):
+        with self.lock:
+            rids = self.code_map.get(str(code).strip())
+            return self.rows[min(rids)] if rids else None
+
+    def find_phone(self, phone: str):
+        with self.lock:
+            rids = self.phone_map.get(digits_only(phone))
+            return self.rows[min(rids)] if rids else None
+
+    def find_name(self, name: str):
+        """substring ของชื่อแบบ str.contains เดิม (ถ้ามีอักขระ regex ก็ตีความเป็น regex เหมือนเดิม)"""
+        search_name = name.strip().lower()
+        with self.lock:
+            if _REGEX_CHARS & set(search_name):
+                pattern = re.compile(search_name)
+                hit = next((rid for rid in self.order if pattern.search(self.names_compat[rid])), None)
+            else:
+                candidates = self._name_candidates(search_name)
+                hit = next((rid for rid in candidates if search_name in self.names_compat[rid]), None)
+            return self.rows[hit] if hit is not None else None
+
+    def _name_candidates(self, text: str) -> list:
+        """rowid ที่อาจมี text อยู่ในชื่อ เรียงตาม rowid (ยังต้องเช็ค substring ซ้ำ)"""
+        if len(text) < GRAM:
+            return self.order
+        postings = sorted((self.name_grams.get(g, set()) for g in _grams(text)), key=len)
+        rids = set(postings[0])
+        for p in postings[1:]:
+            rids &= p
+            if not rids:
+                break
+        return sorted(rids)
+
+    # ----------------------------------------
+    #  ranked search
+    # ----------------------------------------
+    def search(self, q: str, limit: int = 10) -> list:
+        """
+        คืน [(score, match, record)] เรียงคะแนนมาก → น้อย
+        รหัสตรง 100 > เบอร์ตรง 95 > ชื่อตรง 90 > รหัสขึ้นต้น 80 > เบอร์ขึ้นต้น/ลงท้าย 70
+        > ชื่อขึ้นต้น 65 > คำในชื่อขึ้นต้น 55 > ชื่อมีคำค้น 40
+        """
+        text = normalize_name(q)
+        if not text:
+            return []
+        digits = "".join(ch for ch in text if ch.isdigit())
+        scores = {}
+
+        def hit(rid, score, match):
+            if score > scores.get(rid, (0, ""))[0]:
+                scores[rid] = (score, match)
+
+        with self.lock:
+            # --- code ---
+            for rid in self.code_map.get(q.strip(), ()):
+                hit(rid, 100, "code")
+            for rid in _prefix_range(self.codes_sorted, text):
+                hit(rid, 80, "code_prefix")
+
+            # --- phone (อย่างน้อย 3 หลัก และคำค้นเป็นเบอร์ล้วน ๆ) ---
+            if len(digits) >= 3 and len(digits) >= len(text.replace("-", "").replace(" ", "")):
+                for rid in self.phone_map.get(digits, ()):
+                    hit(rid, 95, "phone")
+                for rid in _prefix_range(self.phones_sorted, digits):
+                    hit(rid, 70, "phone_prefix")
+                for rid in _prefix_range(self.phones_rev_sorted, digits[::-1]):
+                    hit(rid, 70, "phone_suffix")
+
+            # --- name ---
+            for rid in self._name_candidates(text):
+                name = self.names_norm[rid]
+                pos = name.find(text)
+                if pos < 0:
+                    continue
+                if name == text:
+                    hit(rid, 90, "name")
+                elif pos == 0:
+                    hit(rid, 65, "name_prefix")
+                elif name[pos - 1] == " ":
+                    hit(rid, 55, "name_word")
+                else:
+                    hit(rid, 40, "name_contains")
+
+            ranked = sorted(
+                scores.items(),
+                key=lambda kv: (-kv[1][0], len(self.names_norm[kv[0]]), kv[0]),
+            )
+
+            # รหัสซ้ำในตาราง Customer → แสดงครั้งเดียว (แถวแรกแบบเดียวกับ /search)
+            results, seen = [], set()
+            for rid, (score, match) in ranked:
+                code = str(self.rows[rid]["Customer"]).strip()
+                if code in seen:
+                    continue
+                seen.add(code)
+                results.append((score, match, self.rows[min(self.code_map[code])]))
+                if len(results) >= limit:
+                    break
+            return results
+
+
+def _prefix_range(sorted_pairs: list, prefix: str):
+    """rowid ของทุกคู่ (key, rowid) ที่ key ขึ้นต้นด้วย prefix"""
+    i = bisect.bisect_left(sorted_pairs, (prefix,))
+    while i < len(sorted_pairs) and sorted_pairs[i][0].startswith(prefix):
+        yield sorted_pairs[i][1]
+        i += 1
+
+
+_INDEX = CustomerIndex()
+
+
+def get_index() -> CustomerIndex:
+    _INDEX.refresh()
+    return _INDEX
+
+
+def index_version() -> int:
+    return get_index().version
+
+
+def index_stats() -> dict:
+    """สถานะ index ตอนนี้ (ไม่ refresh)"""
+    return {"version": _INDEX.version, "rows": len(_INDEX.rows), **_INDEX.stats}
@@ -0,0 +1,87 @@
+# customer_tier.py — ตาราง Score/Tier ของลูกค้าทุกคน (คำนวณล่วงหน้าด้วย LevelPrice)
+# pricing ใช้ lookup ด้วยรหัสลูกค้าแทนการรัน LevelPrice ทุก request
+# สร้างใหม่เมื่อแถวในตาราง Customer เปลี่ยนจริง (version ของ customer_index) ไม่ใช่ทุกครั้งที่ DB ถูกเขียน
+# (บันทึกใบเสนอราคา / outbox ไม่ทำให้ต้องรัน LevelPrice ทั้งตารางใหม่)
+import threading
+from datetime import datetime
+import pandas as pd
+
+import LevelPrice
+import pricing_model
+from customer_index import index_version
+from db_sqlite import read_conn
+
+# คอลัมน์ที่ LevelPrice() เติมให้ (ขึ้นกับลูกค้าอย่างเดียว ไม่ขึ้นกับสินค้าในตะกร้า)
+TIER_COLS = [
+    "_TenureScore_Z",
+    "_Accum6m_ln",
+    "_Accum6mScore_Z",
+    "_FrequencyScore_Z",
+    "_GenBusRaw",
+    "_GenBusScore_Z",
+    "_Score_Z",
+    "_Tier_Z",
+]
+
+# คอลัมน์จากตาราง Customer ที่ pricing ใช้ต่อ (ค่าในตารางทับค่าที่ FE ส่งมาใน customerData)
+CUSTOMER_COLS = [
+    "payment_terms",   # → markup ตามเครดิตใน Price() (payment_terms.py)
+]
+
+# Customer (SQLite) → key เดียวกับที่ customer.search_customer ส่งให้ FE
+RENAME_MAP = {
+    "Customer": "code",
+    "Gen Bus": "gen_bus",
+    "Customer Date": "customer_date",
+    "Accum6m": "accum_6m",
+    "Frequency": "frequency",
+    "Payment Terms Code": "payment_terms",
+}
+
+_lock = threading.Lock()
+_TABLE = (None, {})   # (stamp, {code: {col: value}})
+
+
+def _stamp(model: pricing_model.PricingModel):
+    # ตาราง Customer เปลี่ยน / mean_sd.json เปลี่ยน / ขึ้นปีใหม่ (tenure) / pricing model version ใหม่ → ต้องคำนวณใหม่
+    return (index_version(), LevelPrice.stats_version(), datetime.now().year, model.version)
+
+
+def build_customer_tiers(model: pricing_model.PricingModel | None = None) -> dict:
+    with read_conn() as conn:
+        df = pd.read_sql_query('SELECT * FROM "Customer"', conn)
+
+    df = df[list(RENAME_MAP)].rename(columns=RENAME_MAP)
+
+    # แปลงเป็นข้อความแบบเดียวกับ clean() ใน customer.py
+    # เพื่อให้ผลลัพธ์ตรงกับการรัน LevelPrice จาก customerData ที่ FE ส่งมา
+    for col in df.columns:
+        df[col] = df[col].where(df[col].notna(), "").astype(str).str.strip()
+
+    df = df.drop_duplicates("code", keep="first").reset_index(drop=True)
+    df = LevelPrice.LevelPrice(df, model)
+
+    records = df[["code"] + TIER_COLS + CUSTOMER_COLS].to_dict("records")
+    return {r.pop("code"): r for r in records}
+
+
+def refresh(force: bool = False) -> dict:
+    """สร้างตารางใหม่ถ้าข้อมูลเปลี่ยน (หรือบังคับด้วย force=True)"""
+    global _TABLE
+    model = pricing_model.current()
+    stamp = _stamp(model)
+    if not force and _TABLE[0] == stamp:
+        return _TABLE[1]
+
+    with _lock:
+        if force or _TABLE[0] != stamp:
+            _TABLE = (stamp, build_customer_tiers(model))
+        return _TABLE[1]
+
+
+def get_customer_tier(code) -> dict | None:
+    """คืนค่า {_Score_Z, _Tier_Z, ...} ของลูกค้า หรือ None ถ้าไม่พบรหัส"""
+    code = str(code or "").strip()
+    if not code:
+        return None
+    return refresh().get(code)
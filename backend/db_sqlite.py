@@ -1,12 +1,400 @@
 from pathlib import Path
+from contextlib import contextmanager
+import logging
+import os
 import sqlite3
+import threading
+import time
 
-# ชี้ไปที่ฐานข้อมูลจริงตาม path ของคุณ
-DB_FILE = Path(__file__).parent / "data" / "Quetung.db"
-print("USING DB FILE:", DB_FILE.resolve())
-def get_conn():
-    conn = sqlite3.connect(DB_FILE)
+import metrics
+
+log = logging.getLogger(__name__)
+
+# ชี้ไปที่ฐานข้อมูลจริงตาม path ของคุณ (override ได้ด้วย env DB_FILE)
+DB_FILE = Path(os.getenv("DB_FILE") or Path(__file__).parent / "data" / "Quetung.db")
+
+# ============================
+# PRAGMA (ปรับได้ด้วย env)
+# ============================
+# WAL: อ่านพร้อมกันได้ระหว่างที่มีการเขียน (ถ้า volume ไม่รองรับ shared memory ให้ตั้ง DB_JOURNAL_MODE=DELETE)
+JOURNAL_MODE = os.getenv("DB_JOURNAL_MODE", "WAL")
+CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "32768"))          # 32 MB ต่อ connection
+MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))   # 256 MB
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+
+
+# ============================
+# จับเวลา query → metrics (นับ statement ตอน execute, เวลา = execute + fetch*)
+# วน for บน cursor ตรง ๆ ได้แค่เวลา execute (ไม่ override __next__ เพราะช้าทุกแถว)
+# ============================
+class _TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            metrics.record_query(time.perf_counter() - t0)
+
+    def executemany(self, sql, seq_of_parameters):
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            metrics.record_query(time.perf_counter() - t0)
+
+    def executescript(self, sql_script):
+        t0 = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            metrics.record_query(time.perf_counter() - t0)
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            metrics.record_query(time.perf_counter() - t0, 0)
+
+    def fetchmany(self, size=None):
+        t0 = time.perf_counter()
+        try:
+            return super().fetchmany(self.arraysize if size is None else size)
+        finally:
+            metrics.record_query(time.perf_counter() - t0, 0)
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            metrics.record_query(time.perf_counter() - t0, 0)
+
+
+class _TimedConnection(sqlite3.Connection):
+    # Connection.execute ของ C เรียก cursor execute ภายในโดยตรง → ต้องผ่าน cursor ของเราเอง
+    def cursor(self, factory=_TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def _open(read_only: bool = False, check_same_thread: bool = True) -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_FILE, check_same_thread=check_same_thread, factory=_TimedConnection)
     conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    if read_only:
+        conn.execute("PRAGMA query_only = ON")
     return conn
 
 
+def get_conn():
+    """connection ใหม่แบบไม่ผ่าน pool (สำหรับสคริปต์ / งานนอก request) — ต้อง close เอง"""
+    _ensure_journal_mode()
+    return _open()
+
+
+# ============================
+# Journal mode (ตั้งครั้งเดียวต่อไฟล์ — ค่าถูกเก็บใน DB)
+# ============================
+_journal_lock = threading.Lock()
+_journal_ready = False
+
+
+def _ensure_journal_mode():
+    global _journal_ready
+    if _journal_ready:
+        return
+    with _journal_lock:
+        if _journal_ready:
+            return
+        conn = sqlite3.connect(DB_FILE)
+        try:
+            conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+            mode = conn.execute(f"PRAGMA journal_mode = {JOURNAL_MODE}").fetchone()[0]
+        finally:
+            conn.close()
+        _journal_ready = True
+        # แจ้งไฟล์ที่ใช้ครั้งเดียวตอนเปิดจริง (เดิม print ตอน import)
+        log.info("using db file", extra={"db_file": str(DB_FILE.resolve()), "journal_mode": mode})
+
+
+# ============================
+# Connection pool
+# - read : connection อ่านอย่างเดียว (query_only) ยืม/คืนผ่าน idle list — เก็บไว้ไม่เกิน POOL_SIZE ตัว
+#          (ไม่ผูกกับ thread เพราะ worker thread ของ FastAPI เกิด/ตายได้ตลอด)
+# - write: connection เดียวทั้ง process ใช้ทีละ request (lock) → เขียนเรียงกัน
+# ============================
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+
+
+class _PoolStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.read_hits = 0
+        self.read_misses = 0
+        self.read_discards = 0         # คืนตอน idle เต็ม → ปิดทิ้ง
+        self.write_checkouts = 0
+        self.write_waits = 0           # ครั้งที่ต้องรอ writer คนก่อน
+        self.write_wait_total = 0.0    # วินาที
+        self.write_wait_max = 0.0
+        self.write_hold_total = 0.0    # เวลาที่ถือ writer (วินาที)
+
+
+_stats = _PoolStats()
+_idle_readers: list[sqlite3.Connection] = []
+_readers_lock = threading.Lock()
+_readers_open = 0
+
+_writer: sqlite3.Connection | None = None
+_writer_lock = threading.Lock()
+
+
+def _checkout_reader() -> sqlite3.Connection:
+    global _readers_open
+    with _readers_lock:
+        if _idle_readers:
+            _stats.read_hits += 1
+            return _idle_readers.pop()
+        _stats.read_misses += 1
+        _readers_open += 1
+
+    _ensure_journal_mode()
+    try:
+        return _open(read_only=True, check_same_thread=False)
+    except Exception:
+        with _readers_lock:
+            _readers_open -= 1
+        raise
+
+
+def _return_reader(conn: sqlite3.Connection):
+    global _readers_open
+    with _readers_lock:
+        if len(_idle_readers) < POOL_SIZE:
+            _idle_readers.append(conn)
+            return
+        _stats.read_discards += 1
+        _readers_open -= 1
+    conn.close()
+
+
+@contextmanager
+def read_conn():
+    """
+    with read_conn() as conn: ...
+    ยืม connection อ่านอย่างเดียวจาก pool แล้วคืนเมื่อจบ block (ห้าม close เอง)
+    """
+    conn = _checkout_reader()
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        _return_reader(conn)
+
+
+@contextmanager
+def write_conn():
+    """
+    with write_conn() as conn: ...
+    ได้ writer ตัวเดียวของ process — จบ block ปกติ = commit, มี exception = rollback
+    """
+    global _writer
+    t0 = time.perf_counter()
+    contended = not _writer_lock.acquire(blocking=False)
+    if contended:
+        _writer_lock.acquire()
+    t1 = time.perf_counter()
+
+    with _stats.lock:
+        _stats.write_checkouts += 1
+        if contended:
+            _stats.write_waits += 1
+            _stats.write_wait_total += t1 - t0
+            _stats.write_wait_max = max(_stats.write_wait_max, t1 - t0)
+
+    try:
+        if _writer is None:
+            _ensure_journal_mode()
+            _writer = _open(check_same_thread=False)
+        conn = _writer
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    finally:
+        with _stats.lock:
+            _stats.write_hold_total += time.perf_counter() - t1
+        _writer_lock.release()
+
+
+def pool_stats() -> dict:
+    with _stats.lock:
+        s = _stats
+        reads = s.read_hits + s.read_misses
+        return {
+            "journal_mode": JOURNAL_MODE,
+            "pool_size": POOL_SIZE,
+            "read_connections_open": _readers_open,
+            "read_connections_idle": len(_idle_readers),
+            "read_hits": s.read_hits,
+            "read_misses": s.read_misses,
+            "read_hit_ratio": round(s.read_hits / reads, 4) if reads else None,
+            "read_discards": s.read_discards,
+            "write_checkouts": s.write_checkouts,
+            "write_waits": s.write_waits,
+            "write_wait_total_ms": round(s.write_wait_total * 1000, 3),
+            "write_wait_max_ms": round(s.write_wait_max * 1000, 3),
+            "write_wait_avg_ms": round(s.write_wait_total * 1000 / s.write_waits, 3) if s.write_waits else 0.0,
+            "write_hold_total_ms": round(s.write_hold_total * 1000, 3),
+        }
+
+
+def close_all():
+    """ปิดทุก connection ใน pool (ตอน shutdown)"""
+    global _writer, _readers_open, _watch
+    with _watch_lock:
+        if _watch is not None:
+            _watch.close()
+            _watch = None
+    with _readers_lock:
+        for conn in _idle_readers:
+            conn.close()
+        _readers_open -= len(_idle_readers)
+        _idle_readers.clear()
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+
+
+# ============================
+# version ต่อตาราง (cache ใช้ตัดสินว่าต้องโหลดตารางนั้นใหม่ไหม)
+# - trigger AFTER INSERT / UPDATE / DELETE ของตารางที่ถูกถาม บวก Version ของตารางนั้นใน _Table_Version
+#   → เขียนตารางอื่น (ใบเสนอราคา / outbox / sequence) ไม่ทำให้ version ของ Customer / Items_Test เปลี่ยน
+# - trigger อยู่ใน DB → เห็นการเขียนจากทุก process (uvicorn --workers N) และจากภายนอก (sqlite3 / สคริปต์นำเข้า)
+# - ตารางถูก DROP แล้วสร้างใหม่ → trigger หายไปด้วย: PRAGMA schema_version เปลี่ยน → เช็คแล้วติดตั้งใหม่
+#   พร้อมบวก version (ระหว่างที่ไม่มี trigger เนื้อหาอาจเปลี่ยนไปแล้ว)
+# - ทางลัด: PRAGMA data_version ของ connection เฝ้าดู (ไม่เคยเขียน) เปลี่ยนเมื่อมี connection อื่น commit เท่านั้น
+#   → ไม่มีใคร commit ตั้งแต่อ่านครั้งก่อน ใช้ version ชุดเดิมได้เลย (~7 µs แทนการยืม reader + query)
+# ============================
+VERSION_TABLE = "_Table_Version"
+_TRIGGER_OPS = ("INSERT", "UPDATE", "DELETE")
+
+_versions_lock = threading.Lock()
+_versions_checked = {}      # ตาราง → schema_version ตอนที่เช็คว่ามี trigger ครบล่าสุด
+_versions_cache = {}        # tuple ของตาราง / "schema" → (data_version ตอนอ่าน, ค่า)
+
+_watch: sqlite3.Connection | None = None
+_watch_lock = threading.Lock()
+
+
+def _data_version() -> int:
+    global _watch
+    with _watch_lock:
+        if _watch is None:
+            _ensure_journal_mode()
+            _watch = sqlite3.connect(DB_FILE, check_same_thread=False)
+            _watch.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        return _watch.execute("PRAGMA data_version").fetchone()[0]
+
+
+def _trigger_names(table: str) -> list:
+    return [f"_tv_{table}_{op.lower()}" for op in _TRIGGER_OPS]
+
+
+def _install_version_triggers(conn, table: str):
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS "{VERSION_TABLE}" ('
+        f'"Name" TEXT PRIMARY KEY, "Version" INTEGER NOT NULL DEFAULT 0)'
+    )
+    conn.execute(f'INSERT OR IGNORE INTO "{VERSION_TABLE}" (Name) VALUES (?)', (table,))
+    literal = table.replace("'", "''")
+    for op, name in zip(_TRIGGER_OPS, _trigger_names(table)):
+        conn.execute(
+            f'CREATE TRIGGER IF NOT EXISTS "{name}" AFTER {op} ON "{table}" BEGIN '
+            f"UPDATE \"{VERSION_TABLE}\" SET Version = Version + 1 WHERE Name = '{literal}'; END"
+        )
+    conn.execute(f'UPDATE "{VERSION_TABLE}" SET Version = Version + 1 WHERE Name = ?', (table,))
+
+
+def _missing_triggers(conn, tables) -> list:
+    """ตารางที่ยังไม่มี trigger ครบ (หรือไม่มีตาราง _Table_Version / ไม่มีแถวของตารางนั้น)"""
+    names = [n for t in tables for n in _trigger_names(t)]
+    marks = ",".join("?" * len(names))
+    found = {r[0] for r in conn.execute(
+        f"SELECT name FROM sqlite_master WHERE type = 'trigger' AND name IN ({marks})", names
+    )}
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (VERSION_TABLE,)).fetchone():
+        marks = ",".join("?" * len(tables))
+        found.update(r[0] for r in conn.execute(
+            f'SELECT Name FROM "{VERSION_TABLE}" WHERE Name IN ({marks})', list(tables)
+        ))
+    return [t for t in tables if t not in found or not found.issuperset(_trigger_names(t))]
+
+
+def schema_version() -> int:
+    """PRAGMA schema_version — เปลี่ยนเมื่อมีการสร้าง / ลบ / แก้โครงสร้างตารางใด ๆ"""
+    data_version = _data_version()
+    hit = _versions_cache.get("schema")
+    if hit is not None and hit[0] == data_version:
+        return hit[1]
+    with read_conn() as conn:
+        schema = conn.execute("PRAGMA schema_version").fetchone()[0]
+    _versions_cache["schema"] = (data_version, schema)
+    return schema
+
+
+def table_versions(tables) -> tuple:
+    """
+    version ของแต่ละตาราง (ลำดับตาม tables) — เปลี่ยนเมื่อแถวในตารางนั้นถูกเพิ่ม / แก้ / ลบเท่านั้น
+    ใช้เทียบว่าเท่าเดิมไหมเท่านั้น (ค่าไม่ได้บอกจำนวนครั้งที่เขียน)
+    """
+    tables = tuple(tables)
+    data_version = _data_version()
+    hit = _versions_cache.get(tables)
+    if hit is not None and hit[0] == data_version:
+        return hit[1]
+
+    with read_conn() as conn:
+        schema = conn.execute("PRAGMA schema_version").fetchone()[0]
+        unchecked = [t for t in tables if _versions_checked.get(t) != schema]
+        if unchecked:
+            # โครงสร้าง DB เปลี่ยนตั้งแต่เช็คล่าสุด (หรือยังไม่เคยเช็ค) → trigger อาจหายไปกับตารางที่ถูกสร้างใหม่
+            with _versions_lock:
+                with write_conn() as wconn:
+                    for table in _missing_triggers(wconn, unchecked):
+                        _install_version_triggers(wconn, table)
+                schema = conn.execute("PRAGMA schema_version").fetchone()[0]
+                for table in unchecked:
+                    _versions_checked[table] = schema
+
+        marks = ",".join("?" * len(tables))
+        found = dict(conn.execute(
+            f'SELECT Name, Version FROM "{VERSION_TABLE}" WHERE Name IN ({marks})', tables
+        ).fetchall())
+    versions = tuple(found[t] for t in tables)
+    # ถ้ามีคน commit ระหว่างนี้ data_version รอบหน้าจะไม่ตรง → อ่านใหม่ (ไม่มีทางได้ค่าเก่าค้าง)
+    _versions_cache[tables] = (data_version, versions)
+    return versions
+
+
+def table_version(table: str) -> int:
+    return table_versions((table,))[0]
@@ -2,13 +2,17 @@
 from pathlib import Path
 from typing import Any, Dict, Optional, List
 import math
+import re
+import threading
 import pandas as pd
 from fastapi import APIRouter, Query, HTTPException
 from pydantic import BaseModel
-from db_sqlite import get_conn   # ← ใช้ SQLite
+from db_sqlite import read_conn, table_version   # ← ใช้ SQLite
 
 router = APIRouter(prefix="/employees", tags=["employees"])
 
+EMPLOYEES_TABLE = "Employees"
+
 
 # ============================
 #  Schema ของ Employees (SQLite)
@@ -28,9 +32,8 @@ router = APIRouter(prefix="/employees", tags=["employees"])
 
 
 def load_employees_sqlite() -> pd.DataFrame:
-    conn = get_conn()
-    df = pd.read_sql_query('SELECT * FROM "Employees"', conn)
-    conn.close()
+    with read_conn() as conn:
+        df = pd.read_sql_query(f'SELECT * FROM "{EMPLOYEES_TABLE}"', conn)
 
     # --- CLEAN BLOCK (แก้เฉพาะส่วนนี้) ---
     # ป้องกันไม่ให้ NaN / None กลายเป็น "None" หรือ "nan"
@@ -67,6 +70,62 @@ def load_employees_sqlite() -> pd.DataFrame:
     return df
 
 
+# ============================
+#  Employee directory (cache)
+# ============================
+# ข้อมูลที่ clean แล้ว + index สำหรับ login / list / get — สร้างใหม่เมื่อแถวในตาราง Employees เปลี่ยน (table_version)
+_REGEX_CHARS = set(".^$*+?{}[]\\|()")
+
+
+class EmployeeDirectory:
+    def __init__(self, stamp, df: pd.DataFrame):
+        self.stamp = stamp
+        # (empCode, empName, branchCode) เรียงตามลำดับในตาราง
+        self.rows = list(zip(df["empCode"].tolist(), df["empName"].tolist(), df["branchCode"].tolist()))
+
+        self.by_code = {}        # empCode.lower() → index แถวแรก
+        self.by_branch = {}      # branchCode.lower() → [index, ...]
+        self.search_keys = []    # (empCode.lower(), empName.lower())
+        for i, (code, name, branch) in enumerate(self.rows):
+            self.by_code.setdefault(code.lower(), i)
+            self.by_branch.setdefault(str(branch).lower(), []).append(i)
+            self.search_keys.append((code.lower(), name.lower()))
+
+    def get(self, code: str):
+        i = self.by_code.get(code.lower())
+        return self.rows[i] if i is not None else None
+
+    def filter(self, q: Optional[str] = None, branch: Optional[str] = None) -> list:
+        """index ของแถวที่ตรงเงื่อนไข (ลำดับเดิม) — q เป็น substring ของรหัสหรือชื่อ"""
+        idx = self.by_branch.get(branch.lower(), []) if branch else range(len(self.rows))
+        if not q:
+            return list(idx)
+
+        key = q.strip().lower()
+        if _REGEX_CHARS & set(key):
+            # เหมือน str.contains เดิม (ตีความเป็น regex)
+            pattern = re.compile(key)
+            return [i for i in idx if pattern.search(self.search_keys[i][0]) or pattern.search(self.search_keys[i][1])]
+        return [i for i in idx if key in self.search_keys[i][0] or key in self.search_keys[i][1]]
+
+
+_dir_lock = threading.Lock()
+_DIRECTORY: EmployeeDirectory | None = None
+
+
+def get_employee_directory() -> EmployeeDirectory:
+    global _DIRECTORY
+    stamp = table_version(EMPLOYEES_TABLE)
+    d = _DIRECTORY
+    if d is not None and d.stamp == stamp:
+        return d
+
+    with _dir_lock:
+        if _DIRECTORY is None or _DIRECTORY.stamp != stamp:
+            _DIRECTORY = EmployeeDirectory(stamp, load_employees_sqlite())
+        return _DIRECTORY
+
+
 class EmployeeOut(BaseModel):
     id: str
     name: str
@@ -95,29 +154,17 @@ def list_employees(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=200),
 ):
-    df = load_employees_sqlite()
-
-    # search
-    if q:
-        key = q.strip().lower()
-        df = df[
-            df["empCode"].str.lower().str.contains(key) |
-            df["empName"].str.lower().str.contains(key)
-        ]
-
-    # branch filter
-    if branch:
-        df = df[df["branchCode"].astype(str).str.lower() == branch.lower()]
+    directory = get_employee_directory()
+    matched = directory.filter(q, branch)
 
-    total = len(df)
+    total = len(matched)
     pages = max(1, math.ceil(total / page_size))
     start = (page - 1) * page_size
     end = start + page_size
-    df_page = df.iloc[start:end].copy()
 
     data = [
-        {"id": r["empCode"], "name": r["empName"], "branchId": r["branchCode"] or None}
-        for _, r in df_page.iterrows()
+        {"id": code, "name": name, "branchId": branch_code or None}
+        for code, name, branch_code in (directory.rows[i] for i in matched[start:end])
     ]
 
     return EmployeesResponse(
@@ -131,15 +178,14 @@ def list_employees(
 # =============================
 @router.get("/{code}", response_model=EmployeeOut)
 def get_employee(code: str):
-    df = load_employees_sqlite()
-    row = df[df["empCode"].str.lower() == code.lower()]
-    if row.empty:
+    r = get_employee_directory().get(code)
+    if r is None:
         raise HTTPException(status_code=404, detail=f"ไม่พบพนักงานรหัส {code}")
 
-    r = row.iloc[0].to_dict()
+    emp_code, emp_name, branch_code = r
 
     return {
-        "id": r["empCode"],
-        "name": r["empName"],
-        "branchId": r["branchCode"] or None
+        "id": emp_code,
+        "name": emp_name,
+        "branchId": branch_code or None
     }
@@ -0,0 +1,359 @@
+# excel_outbox.py — สำเนาใบเสนอราคาลง QuoteTemplate.xlsx แบบ background
+#
+# - create/update quotation เขียนแถวที่ต้อง append ลงตาราง Excel_Outbox ใน transaction เดียวกับ
+#   Quote_Header/Quote_Line → commit แล้วตอบ HTTP ได้ทันที และไม่หายถ้า process ตาย
+# - มี writer thread เดียวต่อ process ดึงแถวที่ยังไม่ export ทีละก้อน เปิด workbook ครั้งเดียว append ทั้งก้อน แล้ว save
+#   (ไม่ต้องโหลด workbook ใหม่ทุกใบ)
+# - หลาย process (uvicorn --workers N) ใช้ไฟล์เดียวกัน → ต้องถือ lease ใน SQLite (Excel_Outbox_Lease) ก่อน
+#   ถึงจะ claim แถว (UPDATE … RETURNING) และเขียนไฟล์ได้ — ครั้งละ process เดียว ไม่ append ซ้ำ / ไม่ save ทับกัน
+#   process ที่ตายระหว่างถือ lease / claim → หมดอายุใน LEASE_SECONDS แล้ว process อื่นรับงานต่อ
+# - ถ้า save แล้วแต่ process ตายก่อน mark ว่า export แล้ว → รอบหน้าจะ append ซ้ำ (at-least-once)
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from db_sqlite import read_conn, write_conn
+
+log = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).parent / "data"
+EXCEL_FILE = Path(os.getenv("EXCEL_FILE") or DATA_DIR / "QuoteTemplate.xlsx")   # override ได้ด้วย env (เช่น benchmark)
+
+OUTBOX_TABLE = "Excel_Outbox"
+BATCH_SIZE = 500          # แถวต่อการ save 1 ครั้ง
+POLL_SECONDS = 5.0        # ตื่นมาเช็คเอง (กันพลาด notify)
+RETRY_SECONDS = 30.0      # รอก่อนลองใหม่เมื่อเขียนไฟล์ไม่ได้ (เช่น มีคนเปิดไฟล์ค้างไว้)
+KEEP_DAYS = 7             # เก็บแถวที่ export แล้วไว้ดูย้อนหลังกี่วัน
+LEASE_SECONDS = 300.0     # lease / claim ที่ไม่ถูกปล่อยนานเกินนี้ถือว่า process นั้นตายไปแล้ว
+LEASE_TABLE = "Excel_Outbox_Lease"
+
+_CREATE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS "{OUTBOX_TABLE}" (
+        "id"         INTEGER PRIMARY KEY AUTOINCREMENT,
+        "Sheet"      TEXT NOT NULL,
+        "QuoteNo"    TEXT,
+        "RowJson"    TEXT NOT NULL,
+        "CreatedAt"  TEXT NOT NULL,
+        "ExportedAt" TEXT,
+        "Attempts"   INTEGER NOT NULL DEFAULT 0,
+        "LastError"  TEXT
+    )
+"""
+_INDEX_SQL = f'CREATE INDEX IF NOT EXISTS idx_excel_outbox_pending ON "{OUTBOX_TABLE}" (ExportedAt, id)'
+_CLAIM_COLUMNS = {"ClaimedBy": "TEXT", "ClaimedAt": "TEXT"}     # เพิ่มทีหลัง → ALTER ตาราง outbox เดิม
+_LEASE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS "{LEASE_TABLE}" (
+        "Name"      TEXT PRIMARY KEY,
+        "Holder"    TEXT,
+        "ExpiresAt" TEXT
+    )
+"""
+LEASE_NAME = "excel"
+
+_table_ready = False
+
+
+def _now_iso():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _create(conn):
+    conn.execute(_CREATE_SQL)
+    conn.execute(_INDEX_SQL)
+    columns = {r[1] for r in conn.execute(f'PRAGMA table_info("{OUTBOX_TABLE}")')}
+    for name, kind in _CLAIM_COLUMNS.items():
+        if name not in columns:
+            conn.execute(f'ALTER TABLE "{OUTBOX_TABLE}" ADD COLUMN "{name}" {kind}')
+    conn.execute(_LEASE_SQL)
+    conn.execute(f'INSERT OR IGNORE INTO "{LEASE_TABLE}" (Name) VALUES (?)', (LEASE_NAME,))
+
+
+def ensure_table(conn=None):
+    global _table_ready
+    if _table_ready:
+        return
+    if conn is None:
+        with write_conn() as conn:
+            _create(conn)
+    else:
+        _create(conn)
+    _table_ready = True
+
+
+# id ของ writer ต่อ process (process ลูกที่ fork มาได้ id ใหม่)
+_worker = (None, None)
+
+
+def _worker_id() -> str:
+    global _worker
+    pid = os.getpid()
+    if _worker[0] != pid:
+        _worker = (pid, f"{pid}-{secrets.token_hex(4)}")
+    return _worker[1]
+
+
+# -----------------------------------------------------
+# Enqueue (เรียกภายใน write_conn ของ quotation)
+# -----------------------------------------------------
+def enqueue_header(conn, header: dict):
+    _enqueue(conn, "Quote_Header", header.get("QuoteNo"), [header])
+
+
+def enqueue_lines(conn, quote_no: str, lines: list):
+    _enqueue(conn, "Quote_Line", quote_no, [{"QuoteID": quote_no, **ln} for ln in lines])
+
+
+def _enqueue(conn, sheet: str, quote_no, rows: list):
+    if not rows:
+        return
+    ensure_table(conn)
+    now = _now_iso()
+    conn.executemany(
+        f'INSERT INTO "{OUTBOX_TABLE}" (Sheet, QuoteNo, RowJson, CreatedAt) VALUES (?,?,?,?)',
+        [(sheet, quote_no, json.dumps(r, ensure_ascii=False), now) for r in rows],
+    )
+
+
+# -----------------------------------------------------
+# Writer
+# -----------------------------------------------------
+def _safe_get_header_row(ws):
+    first_row = next(ws.iter_rows(min_row=1, max_row=1))
+    return [c.value for c in first_row]
+
+
+def _append_rows(pending: list) -> int:
+    """append แถวทั้งก้อนลง workbook แล้ว save ครั้งเดียว (คืนจำนวนแถวที่เขียนจริง)"""
+    if not EXCEL_FILE.exists():
+        return 0
+
+    from openpyxl import load_workbook   # โหลดเฉพาะตอนมีงาน export
+
+    wb = load_workbook(EXCEL_FILE)
+    sheet_headers = {}
+    written = 0
+
+    for sheet, row_json in pending:
+        if sheet not in wb.sheetnames:
+            continue
+        ws = wb[sheet]
+        if sheet not in sheet_headers:
+            sheet_headers[sheet] = _safe_get_header_row(ws)
+        headers = sheet_headers[sheet]
+
+        row = [""] * len(headers)
+        for key, val in json.loads(row_json).items():
+            if key in headers:
+                row[headers.index(key)] = val
+        ws.append(row)
+        written += 1
+
+    if written:
+        wb.save(EXCEL_FILE)
+    return written
+
+
+class _WriterState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread: threading.Thread | None = None
+        self.wake = threading.Event()
+        self.stop = threading.Event()
+        self.last_export_at = None
+        self.last_batch_rows = 0
+        self.last_batch_ms = 0.0
+        self.exported_total = 0
+        self.last_error = None
+        self.last_error_at = None
+
+
+_state = _WriterState()
+
+
+def _lease_expiry() -> str:
+    return (datetime.now() + timedelta(seconds=LEASE_SECONDS)).isoformat(timespec="seconds")
+
+
+def _acquire_lease(me: str) -> bool:
+    """ได้สิทธิ์เขียนไฟล์ (UPDATE เดียว → atomic ข้าม process) — process อื่นถืออยู่และยังไม่หมดอายุ → False"""
+    with write_conn() as conn:
+        cur = conn.execute(
+            f'UPDATE "{LEASE_TABLE}" SET Holder = ?, ExpiresAt = ? '
+            f'WHERE Name = ? AND (Holder IS NULL OR Holder = ? OR ExpiresAt < ?)',
+            (me, _lease_expiry(), LEASE_NAME, me, _now_iso()),
+        )
+        return cur.rowcount == 1
+
+
+def _release_lease(me: str):
+    with write_conn() as conn:
+        conn.execute(f'UPDATE "{LEASE_TABLE}" SET Holder = NULL, ExpiresAt = NULL WHERE Name = ? AND Holder = ?',
+                     (LEASE_NAME, me))
+
+
+# แถวที่ writer นี้ claim ได้: ยังไม่ export และยังไม่มีใคร claim / claim เอง / claim ค้างเกิน LEASE_SECONDS
+_CLAIMABLE = "ExportedAt IS NULL AND (ClaimedBy IS NULL OR ClaimedBy = ? OR ClaimedAt < ?)"
+
+
+def _stale_before(now: datetime) -> str:
+    return (now - timedelta(seconds=LEASE_SECONDS)).isoformat(timespec="seconds")
+
+
+def _has_work(me: str) -> bool:
+    """มีแถวให้ claim ไหม — อ่านอย่างเดียว (ไม่มีงาน → ไม่แตะ lease: server ว่างไม่ commit อะไรเลยทุก POLL_SECONDS)"""
+    with read_conn() as conn:
+        row = conn.execute(
+            f'SELECT 1 FROM "{OUTBOX_TABLE}" WHERE {_CLAIMABLE} LIMIT 1', (me, _stale_before(datetime.now()))
+        ).fetchone()
+    return row is not None
+
+
+def _claim(me: str) -> list:
+    """จองแถวที่ยังไม่ export (หรือ claim ของ process ที่ค้างเกิน LEASE_SECONDS) ให้ writer นี้"""
+    now = datetime.now()
+    with write_conn() as conn:
+        rows = conn.execute(
+            f'UPDATE "{OUTBOX_TABLE}" SET ClaimedBy = ?, ClaimedAt = ? '
+            f'WHERE id IN (SELECT id FROM "{OUTBOX_TABLE}" WHERE {_CLAIMABLE} ORDER BY id LIMIT ?) '
+            f'RETURNING id, Sheet, RowJson',
+            (me, now.isoformat(timespec="seconds"), me, _stale_before(now), BATCH_SIZE),
+        ).fetchall()
+    # RETURNING ไม่รับประกันลำดับ → เรียงตาม id ให้ append ตามลำดับที่ enqueue
+    return sorted(rows, key=lambda r: r["id"])
+
+
+def export_batch() -> int:
+    """export แถวที่ค้างอยู่ 1 ก้อน (คืนจำนวนแถวที่ดึงมา, 0 = ไม่มีงาน หรือ process อื่นกำลังเขียนไฟล์อยู่)"""
+    ensure_table()
+    me = _worker_id()
+    if not _has_work(me) or not _acquire_lease(me):
+        return 0
+    try:
+        return _export_claimed(me)
+    finally:
+        _release_lease(me)
+
+
+def _export_claimed(me: str) -> int:
+    rows = _claim(me)
+    if not rows:
+        return 0
+
+    ids = [r["id"] for r in rows]
+    marks = ",".join("?" * len(ids))
+    t0 = time.perf_counter()
+    try:
+        _append_rows([(r["Sheet"], r["RowJson"]) for r in rows])
+    except Exception as e:
+        with write_conn() as conn:
+            conn.execute(
+                f'UPDATE "{OUTBOX_TABLE}" SET Attempts = Attempts + 1, LastError = ?, ClaimedBy = NULL '
+                f'WHERE id IN ({marks}) AND ClaimedBy = ?',
+                [str(e)[:500], *ids, me],
+            )
+        raise
+
+    now = _now_iso()
+    with write_conn() as conn:
+        conn.execute(
+            f'UPDATE "{OUTBOX_TABLE}" SET ExportedAt = ?, Attempts = Attempts + 1, LastError = NULL '
+            f'WHERE id IN ({marks}) AND ClaimedBy = ?',
+            [now, *ids, me],
+        )
+        cutoff = (datetime.now() - timedelta(days=KEEP_DAYS)).isoformat(timespec="seconds")
+        conn.execute(f'DELETE FROM "{OUTBOX_TABLE}" WHERE ExportedAt IS NOT NULL AND ExportedAt < ?', (cutoff,))
+
+    with _state.lock:
+        _state.last_export_at = now
+        _state.last_batch_rows = len(ids)
+        _state.last_batch_ms = round((time.perf_counter() - t0) * 1000, 1)
+        _state.exported_total += len(ids)
+    return len(ids)
+
+
+def drain() -> int:
+    """export จนไม่มีงานค้าง (ใช้ใน writer thread / ตอน shutdown)"""
+    total = 0
+    while True:
+        n = export_batch()
+        if not n:
+            return total
+        total += n
+
+
+def _run():
+    while not _state.stop.is_set():
+        try:
+            drain()
+        except Exception as e:
+            log.exception("Excel outbox export failed")
+            with _state.lock:
+                _state.last_error = str(e)
+                _state.last_error_at = _now_iso()
+            _state.stop.wait(RETRY_SECONDS)
+            continue
+        _state.wake.wait(POLL_SECONDS)
+        _state.wake.clear()
+
+
+def start():
+    """เริ่ม writer thread (ถ้ายังไม่ทำงาน) — เรียกซ้ำได้"""
+    with _state.lock:
+        if _state.thread is not None and _state.thread.is_alive():
+            return
+        _state.stop.clear()
+        _state.thread = threading.Thread(target=_run, name="excel-outbox", daemon=True)
+        _state.thread.start()
+
+
+def notify():
+    """มีงานใหม่หลัง commit → ปลุก writer"""
+    start()
+    _state.wake.set()
+
+
+def stop(timeout: float = 10.0):
+    _state.stop.set()
+    _state.wake.set()
+    thread = _state.thread
+    if thread is not None:
+        thread.join(timeout)
+
+
+def status() -> dict:
+    ensure_table()
+    with read_conn() as conn:
+        row = conn.execute(
+            f'SELECT COUNT(*) AS pending, MIN(CreatedAt) AS oldest, MAX(Attempts) AS attempts '
+            f'FROM "{OUTBOX_TABLE}" WHERE ExportedAt IS NULL'
+        ).fetchone()
+        lease = conn.execute(
+            f'SELECT Holder, ExpiresAt FROM "{LEASE_TABLE}" WHERE Name = ?', (LEASE_NAME,)
+        ).fetchone()
+
+    lag = 0.0
+    if row["oldest"]:
+        lag = max(0.0, (datetime.now() - datetime.fromisoformat(row["oldest"])).total_seconds())
+
+    with _state.lock:
+        return {
+            "running": _state.thread is not None and _state.thread.is_alive(),
+            "worker": _worker_id(),
+            "lease_holder": lease["Holder"] if lease else None,
+            "excel_file": EXCEL_FILE.name,
+            "pending_rows": row["pending"],
+            "oldest_pending_at": row["oldest"],
+            "lag_seconds": round(lag, 1),
+            "max_attempts": row["attempts"] or 0,
+            "last_export_at": _state.last_export_at,
+            "last_batch_rows": _state.last_batch_rows,
+            "last_batch_ms": _state.last_batch_ms,
+            "exported_total": _state.exported_total,
+            "last_error": _state.last_error,
+            "last_error_at": _state.last_error_at,
+        }
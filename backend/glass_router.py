@@ -1,10 +1,53 @@
 # glass_router.py — FULL FIXED VERSION (SQLite + Correct TypeName Mapping)
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Depends, Query, Response
 from pydantic import BaseModel
 from typing import Optional
-from db_sqlite import get_conn
+import pandas as pd
+from item_paging import ItemPage, item_page
+from lookup_tables import get_lookups
+from response_cache import cached_route
+from sku_family import data_version, FamilySpec, SkuField, get_family
+import catalog
 
-router = APIRouter(prefix="/glass", tags=["glass"])
+router = APIRouter(prefix="/glass", tags=["glass"], route_class=cached_route(data_version))
+
+
+# ----------------------------------------
+# Glass family (rows เรียงตาม SKU เหมือน ORDER BY [No.])
+# mapping ของกระจกเก็บ Code เป็นตัวเลข → zfill ให้กว้างเท่า field / SubGroup ใช้ key (Type, Code)
+# ----------------------------------------
+GLASS = FamilySpec(
+    name="glass",
+    prefix="G",
+    sku_style="raw",
+    mapping_style="zfill",
+    sort_by_sku=True,
+    fields=(
+        SkuField("brand", 1, 3, "Glass_Brand"),
+        SkuField("type", 3, 5, "Glass_Group"),
+        SkuField("subGroup", 5, 8, "Glass_SubGroup", scope="type"),
+        SkuField("color", 8, 10, "Glass_Color"),
+        SkuField("thickness", 10, 12),
+        SkuField("width", 12, 15, cast=int),
+        SkuField("height", 15, 18, cast=int),
+    ),
+    item=(
+        ("sku", "col:No."),
+        ("description", "col:Description"),
+        ("inventory", "col:Inventory"),
+        ("brand", "field:brand"),
+        ("brandName", "label:brand"),
+        ("type", "field:type"),
+        ("typeName", "label:type"),
+        ("subGroup", "field:subGroup"),
+        ("subGroupName", "label:subGroup"),
+        ("color", "field:color"),
+        ("colorName", "label:color"),
+        ("thickness", "field:thickness"),
+        ("width", "field:width"),
+        ("height", "field:height"),
+    ),
+)
 
 
 # ----------------------------------------
@@ -16,15 +59,13 @@ def parse_glass_sku(sku: str):
     G + Brand(2) + Type(2) + SubGroup(3)
       + Color(2) + Thickness(2) + Width(3) + Height(3)
     """
-    return {
-        "brand": sku[1:3],
-        "type": sku[3:5],
-        "subGroup": sku[5:8],
-        "color": sku[8:10],
-        "thickness": sku[10:12],
-        "width": int(sku[12:15]),
-        "height": int(sku[15:18]),
-    }
+    return GLASS.parse(sku)
+
+
+def _build_price_r2(snap):
+    # SKU → R2 (SKU ซ้ำ → ใช้แถวแรก เหมือน fetchone)
+    df = snap.items.drop_duplicates("No.", keep="first")
+    return dict(zip(df["No."], df["R2"]))
 
 
 # ----------------------------------------
@@ -32,85 +73,22 @@ def parse_glass_sku(sku: str):
 # ----------------------------------------
 @router.get("/list")
 def get_glass_list(
+    response: Response,
     brand: Optional[str] = Query(None),
     type: Optional[str] = Query(None),
     subGroup: Optional[str] = Query(None),
     color: Optional[str] = Query(None),
-    thickness: Optional[str] = Query(None)
+    thickness: Optional[str] = Query(None),
+    page: ItemPage = Depends(item_page)
 ):
-    conn = get_conn()
-    cur = conn.cursor()
-
-    # Load items
-    cur.execute("""
-        SELECT [No.], Description, Inventory 
-        FROM Items_Test
-        WHERE [No.] LIKE 'G%'
-        ORDER BY [No.]
-    """)
-    rows = cur.fetchall()
-
-    # Load mapping tables
-    cur.execute("SELECT Code, Name FROM Glass_Brand")
-    brand_map = {str(c).zfill(2): n for c, n in cur.fetchall()}
-
-    cur.execute("SELECT Code, Name FROM Glass_Color")
-    color_map = {str(c).zfill(2): n for c, n in cur.fetchall()}
-
-    cur.execute("SELECT Code, Name FROM Glass_Group")
-    type_map = {str(c).zfill(2): n for c, n in cur.fetchall()}
-
-    cur.execute("SELECT Type, Code, Name FROM Glass_SubGroup")
-    subgroup_map = {(str(t).zfill(2), str(c).zfill(3)): n for t, c, n in cur.fetchall()}
-
-    result = []
-
-    for sku, desc, inv in rows:
-        parsed = parse_glass_sku(sku)
-
-        # Filtering
-        if brand and parsed["brand"] != brand:
-            continue
-        if type and parsed["type"] != type:
-            continue
-        if subGroup and parsed["subGroup"] != subGroup:
-            continue
-        if color and parsed["color"] != color:
-            continue
-        if thickness and parsed["thickness"] != thickness:
-            continue
-
-        # Mapping names
-        brandName = brand_map.get(parsed["brand"], "")
-        colorName = color_map.get(parsed["color"], "")
-        typeName = type_map.get(parsed["type"], "")
-        subGroupName = subgroup_map.get((parsed["type"], parsed["subGroup"]), "")
-
-        result.append({
-            "sku": sku,
-            "description": desc,
-            "inventory": inv,
-
-            "brand": parsed["brand"],
-            "brandName": brandName,
-
-            "type": parsed["type"],
-            "typeName": typeName,
-
-            "subGroup": parsed["subGroup"],
-            "subGroupName": subGroupName,
-
-            "color": parsed["color"],
-            "colorName": colorName,
-
-            "thickness": parsed["thickness"],
-
-            "width": parsed["width"],
-            "height": parsed["height"],
-        })
-
-    conn.close()
-    return {"items": result}
+    items = get_family(GLASS).items_for({
+        "brand": brand,
+        "type": type,
+        "subGroup": subGroup,
+        "color": color,
+        "thickness": thickness,
+    }, page, response)
+    return {"items": items}
 
 
 # ----------------------------------------
@@ -135,41 +113,19 @@ class GlassCalcRequest(BaseModel):
 def calc_glass(req: GlassCalcRequest):
     parsed = parse_glass_sku(req.sku)
 
-    conn = get_conn()
-    cur = conn.cursor()
-
-    # Load names
-    cur.execute("SELECT Name FROM Glass_Brand WHERE Code=?", (parsed["brand"],))
-    brandName = (cur.fetchone() or [""])[0]
-
-    cur.execute("SELECT Name FROM Glass_Color WHERE Code=?", (parsed["color"],))
-    colorName = (cur.fetchone() or [""])[0]
-
-    cur.execute("SELECT Code, Name FROM Glass_Group")
-    type_map = {str(c).zfill(2): n for c, n in cur.fetchall()}
-
-    cur.execute("""
-        SELECT Name 
-        FROM Glass_SubGroup
-        WHERE Type=? AND Code=?
-    """, (parsed["type"], parsed["subGroup"]))
-    subGroupName = (cur.fetchone() or [""])[0]
+    # Load names (cache กลาง: exact = WHERE Code=? แถวแรก, Glass_Group zfill เหมือน /list)
+    lookups = get_lookups()
+    brandName = lookups.exact_map("Glass_Brand").get(parsed["brand"], "")
+    colorName = lookups.exact_map("Glass_Color").get(parsed["color"], "")
+    type_map = lookups.zfill_map("Glass_Group", 2)
+    subGroupName = lookups.exact_map("Glass_SubGroup", ("Type", "Code")).get((parsed["type"], parsed["subGroup"]), "")
 
     typeName = type_map.get(parsed["type"], "")
 
-    conn.close()
-
-    # --- เพิ่มส่วนโหลดราคา R2 จาก Items_Test ---
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT R2 
-        FROM Items_Test
-        WHERE [No.] = ?
-    """, (req.sku,))
-    row = cur.fetchone()
-    price_r2 = row[0] if row and row[0] else 0   # default = 0
-    conn.close()
+    # --- เพิ่มส่วนโหลดราคา R2 จาก Items_Test (snapshot กลาง) ---
+    price_r2 = catalog.derived("price_r2", _build_price_r2).get(req.sku)
+    if not price_r2 or pd.isna(price_r2):
+        price_r2 = 0   # default = 0
 
     # คำนวณราคาต่อชิ้น (R2 × พื้นที่)
     total_price_r2 = price_r2 * req.sqftRounded
@@ -1,10 +1,11 @@
 # gypsum_router.py — SQLite Version + API ใหม่ + JSON เดิม
-from fastapi import APIRouter, HTTPException, Query
-import pandas as pd
+from fastapi import APIRouter, Depends, Query, Response
 from typing import Optional
-from db_sqlite import get_conn
+from item_paging import ItemPage, item_page
+from response_cache import cached_route
+from sku_family import data_version, FamilySpec, SkuField, get_family
 
-router = APIRouter(prefix="/gypsum", tags=["gypsum"])
+router = APIRouter(prefix="/gypsum", tags=["gypsum"], route_class=cached_route(data_version))
 
 # === SQLite TABLES ===
 ITEMS_TABLE = "Items_Test"
@@ -16,115 +17,35 @@ THICKNESS_TABLE = "Gypsum_Thickness"
 
 
 # -------------------------------------------------------
-# โหลด mapping จาก SQLite
+# Gypsum SKU: Y + brand(2) + group(2) + subGroup(2) + color(3) + thickness(2) + size(6)
 # -------------------------------------------------------
-def load_mapping(table_name: str):
-    conn = get_conn()
-    df = pd.read_sql_query(f'SELECT * FROM "{table_name}"', conn)
-    conn.close()
-
-    # strip ช่องว่างในชื่อคอลัมน์
-    df.columns = [c.strip() for c in df.columns]
-
-    mapping = {}
-    for _, row in df.iterrows():
-        code = str(row["Code"]).strip()
-        name = str(row["Name"]).strip()
-        mapping[code] = name
-    return mapping
-
-
-def mapping_to_list(mapping: dict):
-    return [{"code": k, "name": v} for k, v in mapping.items()]
-
-
-# -------------------------------------------------------
-# Load Gypsum items (จาก SQLite)
-# -------------------------------------------------------
-def load_gypsum_items():
-    conn = get_conn()
-    df = pd.read_sql_query(f'SELECT * FROM "{ITEMS_TABLE}"', conn)
-    conn.close()
-
-    df.columns = [c.strip() for c in df.columns]
-
-    # ยิปซัมขึ้นต้นด้วย Y
-    df = df[df["No."].astype(str).str.upper().str.startswith("Y")].copy()
-
-    if df.empty:
-        return pd.DataFrame()
-
-    df["SKU"] = df["No."].astype(str).str.upper().str.strip()
-
-    # parse SKU
-    parsed = df["SKU"].apply(parse_gypsum_sku)
-    parsed_df = pd.json_normalize(parsed)
-
-    out = pd.concat([df.reset_index(drop=True), parsed_df.reset_index(drop=True)], axis=1)
-
-    # onhand = Inventory
-    if "Inventory" in out.columns:
-        out["onhand_qty"] = pd.to_numeric(out["Inventory"], errors="coerce").fillna(0).astype(int)
-    else:
-        out["onhand_qty"] = 0
-
-    return out
-
-
-# -------------------------------------------------------
-# Parse Gypsum SKU
-# -------------------------------------------------------
-def parse_gypsum_sku(sku: str):
-    s = (sku or "").strip().upper()
-
-    if not s.startswith("Y") or len(s) < 18:
-        return {
-            "sku": s,
-            "brand": None,
-            "group": None,
-            "subGroup": None,
-            "color": None,
-            "thickness": None,
-            "sizeCode": None,
-        }
-
-    try:
-        brand = s[1:3]
-        group = s[3:5]
-        sub_group = s[5:7]
-        color = s[7:10]
-        thickness = s[10:12]
-        size_code = s[12:18]   # 6 digits size
-    except:
-        brand = group = sub_group = color = thickness = size_code = None
-
-    return {
-        "sku": s,
-        "brand": brand,
-        "group": group,
-        "subGroup": sub_group,
-        "color": color,
-        "thickness": thickness,
-        "sizeCode": size_code,
-    }
-
-
-# -------------------------------------------------------
-# Filtering
-# -------------------------------------------------------
-def filter_gypsum(df, brand, group, subGroup, color, thickness):
-    q = df.copy()
-    if brand:
-        q = q[q["brand"] == str(brand).zfill(2)]
-    if group:
-        q = q[q["group"] == str(group).zfill(2)]
-    if subGroup:
-        q = q[q["subGroup"] == str(subGroup).zfill(2)]
-    if color:
-        q = q[q["color"] == str(color).zfill(3)]
-    if thickness:
-        q = q[q["thickness"] == str(thickness).zfill(2)]
-    return q
+GYPSUM = FamilySpec(
+    name="gypsum",
+    prefix="Y",
+    min_len=18,
+    fields=(
+        SkuField("brand", 1, 3, BRAND_TABLE, "brands", pad=2),
+        SkuField("group", 3, 5, GROUP_TABLE, "groups", pad=2),
+        SkuField("subGroup", 5, 7, SUBGROUP_TABLE, "subGroups", pad=2),
+        SkuField("color", 7, 10, COLOR_TABLE, "colors", pad=3),
+        SkuField("thickness", 10, 12, THICKNESS_TABLE, "thickness", pad=2),
+        SkuField("sizeCode", 12, 18),   # 6 digits size
+    ),
+    item=(
+        ("sku", "sku"),
+        ("name", "col:Description"),
+        ("brand", "field:brand"),
+        ("brandName", "label:brand"),
+        ("group", "field:group"),
+        ("groupName", "label:group"),
+        ("subGroup", "field:subGroup"),
+        ("subGroupName", "label:subGroup"),
+        ("color", "field:color"),
+        ("colorName", "label:color"),
+        ("thickness", "field:thickness"),
+        ("inventory", "onhand"),
+    ),
+)
 
 
 # -------------------------------------------------------
@@ -137,41 +58,15 @@ def gypsum_master(
     subGroup: Optional[str] = Query(None),
     color: Optional[str] = Query(None),
     thickness: Optional[str] = Query(None),
+    counts: bool = False,
 ):
-    df = load_gypsum_items()
-
-    if df.empty:
-        return {
-            "brands": [],
-            "groups": [],
-            "subGroups": [],
-            "colors": [],
-            "thickness": [],
-        }
-
-    df_f = filter_gypsum(df, brand, group, subGroup, color, thickness)
-
-    # load mapping
-    brand_map = load_mapping(BRAND_TABLE)
-    group_map = load_mapping(GROUP_TABLE)
-    sub_map = load_mapping(SUBGROUP_TABLE)
-    color_map = load_mapping(COLOR_TABLE)
-    thick_map = load_mapping(THICKNESS_TABLE)
-
-    # unique code lists
-    brands = sorted({x for x in df_f["brand"].dropna()})
-    groups = sorted({x for x in df_f["group"].dropna()})
-    subGroups = sorted({x for x in df_f["subGroup"].dropna()})
-    colors = sorted({x for x in df_f["color"].dropna()})
-    thicknesses = sorted({x for x in df_f["thickness"].dropna()})
-
-    return {
-        "brands": [{"code": b, "name": brand_map.get(b, b)} for b in brands],
-        "groups": [{"code": g, "name": group_map.get(g, g)} for g in groups],
-        "subGroups": [{"code": s, "name": sub_map.get(s, s)} for s in subGroups],
-        "colors": [{"code": c, "name": color_map.get(c, c)} for c in colors],
-        "thickness": [{"code": t, "name": thick_map.get(t, t)} for t in thicknesses],
-    }
+    return get_family(GYPSUM).master({
+        "brand": brand,
+        "group": group,
+        "subGroup": subGroup,
+        "color": color,
+        "thickness": thickness,
+    }, counts)
 
 
 # -------------------------------------------------------
@@ -184,6 +79,7 @@ def gypsum_options(
     subGroup: Optional[str] = Query(None),
     color: Optional[str] = Query(None),
     thickness: Optional[str] = Query(None),
+    counts: bool = False,
 ):
     return gypsum_master(
         brand=brand,
@@ -191,48 +87,23 @@ def gypsum_options(
         subGroup=subGroup,
         color=color,
         thickness=thickness,
+        counts=counts,
     )
 
 @router.get("/items")
 def gypsum_items(
+    response: Response,
     brand: Optional[str] = None,
     group: Optional[str] = None,
     subGroup: Optional[str] = None,
     color: Optional[str] = None,
     thickness: Optional[str] = None,
+    page: ItemPage = Depends(item_page),
 ):
-    df = load_gypsum_items()
-    if df.empty:
-        return []
-
-    df = filter_gypsum(df, brand, group, subGroup, color, thickness)
-
-    brand_map = load_mapping(BRAND_TABLE)
-    group_map = load_mapping(GROUP_TABLE)
-    sub_map = load_mapping(SUBGROUP_TABLE)
-    color_map = load_mapping(COLOR_TABLE)
-    thick_map = load_mapping(THICKNESS_TABLE)
-
-    items = []
-    for _, row in df.iterrows():
-        items.append({
-            "sku": row["SKU"],
-            "name": row.get("Description", ""),
-
-            "brand": row.get("brand"),
-            "brandName": brand_map.get(row.get("brand"), ""),
-
-            "group": row.get("group"),
-            "groupName": group_map.get(row.get("group"), ""),
-
-            "subGroup": row.get("subGroup"),
-            "subGroupName": sub_map.get(row.get("subGroup"), ""),
-
-            "color": row.get("color"),
-            "colorName": color_map.get(row.get("color"), ""),
-
-            "thickness": row.get("thickness"),
-            "inventory": row.get("onhand_qty", 0)
-        })
-
-    return items
+    return get_family(GYPSUM).items_for({
+        "brand": brand,
+        "group": group,
+        "subGroup": subGroup,
+        "color": color,
+        "thickness": thickness,
+    }, page, response)
@@ -0,0 +1,158 @@
+# item_paging.py — แบ่งหน้า / เรียง / เลือก field ของรายการสินค้า (opt-in)
+#
+# ไม่ส่ง limit / cursor / sort / fields → ได้ JSON เดิมทุกอย่าง
+# ส่งมา → body ยังเป็นรูปเดิม (list หรือ {"items": [...]}) แต่:
+#   - X-Total-Count  = จำนวนแถวทั้งหมดที่ตรง filter (ก่อนตัดหน้า)
+#   - X-Next-Cursor  = ส่งกลับมาเป็น cursor เพื่อขอหน้าถัดไป (ไม่มี = หน้าสุดท้าย)
+#
+# ลำดับของแต่ละ sort key คำนวณครั้งเดียวต่อชุดข้อมูล (RowOrder ผูกกับ snapshot)
+# cursor เก็บ key ของแถวสุดท้าย (ค่า, ตำแหน่ง) → ขอหน้าถัดไปด้วย bisect ไม่ต้องนับ offset
+import base64
+import bisect
+import json
+import math
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+from fastapi import HTTPException, Query, Response
+
+PAGE_MAX_LIMIT = 1000
+
+
+def _sort_value(v):
+    # ตัวเลขก่อน → ข้อความ → ค่าว่าง (None / NaN) ไว้ท้าย (เทียบกันเฉพาะชนิดเดียวกัน)
+    if v is None or (isinstance(v, float) and math.isnan(v)):
+        return (2, "")
+    if isinstance(v, (int, float)):
+        return (0, v)
+    return (1, str(v))
+
+
+class RowOrder:
+    """ลำดับแถวของ rows (list ของ dict) ตาม key ต่าง ๆ — คำนวณเมื่อถูกขอครั้งแรก"""
+
+    def __init__(self, rows: list, keys: list):
+        self.rows = rows
+        self.keys = list(keys)
+        self._orders = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Optional[str]):
+        """(ตำแหน่งแถวเรียงน้อย → มาก, sort tuple ที่เรียงแล้ว, rank ของแต่ละแถว)"""
+        try:
+            return self._orders[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._orders:
+                self._orders[key] = self._build(key)
+            return self._orders[key]
+
+    def _build(self, key):
+        n = len(self.rows)
+        if key is None:
+            tuples = [(i,) for i in range(n)]          # ลำดับเดิมของ endpoint
+        else:
+            tuples = sorted(_sort_value(r.get(key)) + (i,) for i, r in enumerate(self.rows))
+        positions = np.fromiter((t[-1] for t in tuples), dtype=np.int64, count=n)
+        rank = np.empty(n, dtype=np.int64)
+        rank[positions] = np.arange(n, dtype=np.int64)
+        return positions, tuples, rank
+
+
+def _encode_cursor(sort: str, last: tuple) -> str:
+    raw = json.dumps([sort, list(last)], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        value = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if isinstance(value, list) and len(value) == 2 and isinstance(value[1], list):
+            return value[0], tuple(value[1])
+    except (ValueError, UnicodeError):
+        pass
+    raise HTTPException(400, "cursor ไม่ถูกต้อง")
+
+
+@dataclass
+class ItemPage:
+    limit: Optional[int] = None
+    cursor: Optional[str] = None
+    sort: Optional[str] = None
+    fields: Optional[str] = None
+
+    @property
+    def requested(self) -> bool:
+        return any(v is not None for v in (self.limit, self.cursor, self.sort, self.fields))
+
+    def _field_list(self, keys: list) -> Optional[list]:
+        if not self.fields:
+            return None
+        wanted = {f.strip() for f in self.fields.split(",") if f.strip()}
+        unknown = sorted(wanted - set(keys))
+        if unknown:
+            raise HTTPException(400, f"ไม่รู้จัก field: {', '.join(unknown)} (มี: {', '.join(keys)})")
+        return [k for k in keys if k in wanted]
+
+    def apply(self, order: RowOrder, selected, response: Response) -> list:
+        """
+        selected = ตำแหน่งแถวที่ผ่าน filter (None = ทุกแถว)
+        คืน rows ของหน้านี้ (ตัด field แล้ว) และตั้ง header X-Total-Count / X-Next-Cursor
+        """
+        sort = self.sort or ""
+        key = sort.lstrip("-") or None
+        desc = sort.startswith("-")
+        if key is not None and key not in order.keys:
+            raise HTTPException(400, f"sort ไม่ได้ด้วย {key} (มี: {', '.join(order.keys)})")
+        fields = self._field_list(order.keys)
+
+        positions, tuples, rank = order.get(key)
+        if selected is None:
+            sel = positions
+        else:
+            mask = np.zeros(len(order.rows), dtype=bool)
+            mask[np.asarray(selected, dtype=np.int64)] = True
+            sel = positions[mask[positions]]
+        total = len(sel)
+        ranks = rank[sel]
+        if desc:
+            sel, ranks = sel[::-1], ranks[::-1]
+
+        start = 0
+        if self.cursor:
+            cursor_sort, last = _decode_cursor(self.cursor)
+            if cursor_sort != sort:
+                raise HTTPException(400, "cursor ไม่ตรงกับ sort ที่ขอ")
+            try:
+                if desc:
+                    r = bisect.bisect_left(tuples, last)
+                    start = int(np.searchsorted(-ranks, -r, side="right"))
+                else:
+                    r = bisect.bisect_right(tuples, last)
+                    start = int(np.searchsorted(ranks, r, side="left"))
+            except TypeError:
+                raise HTTPException(400, "cursor ไม่ถูกต้อง")
+
+        end = total if self.limit is None else min(total, start + self.limit)
+        page = sel[start:end].tolist()
+
+        response.headers["X-Total-Count"] = str(total)
+        if end < total and page:
+            response.headers["X-Next-Cursor"] = _encode_cursor(sort, tuples[rank[page[-1]]])
+
+        rows = order.rows
+        if fields is None:
+            return [rows[i] for i in page]
+        return [{k: rows[i][k] for k in fields} for i in page]
+
+
+def item_page(
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_LIMIT, description="ไม่ส่ง = ทั้งหมด (แบบเดิม)"),
+    cursor: Optional[str] = Query(None, description="ค่า X-Next-Cursor จากหน้าก่อน"),
+    sort: Optional[str] = Query(None, description="ชื่อ field, ขึ้นต้นด้วย - = มาก → น้อย"),
+    fields: Optional[str] = Query(None, description="field ที่ต้องการ คั่นด้วย , เช่น sku,name"),
+) -> ItemPage:
+    return ItemPage(limit, cursor, sort, fields)
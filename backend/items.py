@@ -1,16 +1,22 @@
 # items.py — FINAL VERSION FOR YOUR DATABASE
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Response
+import numpy as np
 import pandas as pd
-from db_sqlite import get_conn
+import catalog
+from item_paging import ItemPage, item_page, RowOrder
+from response_cache import cached_route
 
-router = APIRouter(prefix="/items", tags=["items"])
+router = APIRouter(prefix="/items", tags=["items"], route_class=cached_route(catalog.catalog_version))
 TABLE_NAME = "Items_Test"
 
 
 def load_items_sqlite():
-    conn = get_conn()
-    df = pd.read_sql_query(f'SELECT * FROM "{TABLE_NAME}"', conn)
-    conn.close()
+    # ใช้ snapshot กลาง (คำนวณคอลัมน์เพิ่มครั้งเดียวต่อ snapshot — ห้ามแก้ไข df in-place)
+    return catalog.derived("items", _build_items)
+
+
+def _build_items(snap):
+    df = snap.items.copy()
 
     # rename important columns
     rename_map = {
@@ -88,15 +94,35 @@ def get_items_by_category(category_name: str):
     return items
 
 
-@router.get("/")
-def search_items(q: str | None = Query(None)):
-    df = load_items_sqlite()
+class _SearchRows:
+    # แถวของ /items/ แปลงเป็น dict ไว้ครั้งเดียว + ข้อความตัวเล็กไว้ค้น
+    def __init__(self, df):
+        self.records = df.to_dict("records")
+        self.sku_text = df["sku"].astype(str).str.lower()
+        self.name_text = df["name"].astype(str).str.lower()
+        self.order = RowOrder(self.records, list(df.columns))
+
 
+def _build_search_rows(snap):
+    return _SearchRows(load_items_sqlite())
+
+
+@router.get("/")
+def search_items(
+    response: Response,
+    q: str | None = Query(None),
+    page: ItemPage = Depends(item_page),
+):
+    rows = catalog.derived("items_search", _build_search_rows)
+
+    selected = None
     if q:
         q = q.lower()
-        df = df[
-            df["sku"].astype(str).str.lower().str.contains(q) |
-            df["name"].astype(str).str.lower().str.contains(q)
-        ]
-
-    return df.to_dict("records")
+        mask = rows.sku_text.str.contains(q) | rows.name_text.str.contains(q)
+        selected = np.flatnonzero(mask.to_numpy())
+
+    if page.requested:
+        return page.apply(rows.order, selected, response)
+    if selected is None:
+        return list(rows.records)
+    return [rows.records[i] for i in selected.tolist()]
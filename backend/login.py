@@ -2,9 +2,10 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from datetime import datetime, timedelta, timezone
-import jwt, os, pandas as pd
+import os
+import pandas as pd
 
-from employees import load_employees_sqlite   # ← ใช้ SQLite แทน Excel
+from employees import get_employee_directory   # ← ใช้ SQLite แทน Excel (cache + index ตามรหัส)
 
 router = APIRouter(prefix="/login", tags=["auth"])
 
@@ -21,17 +22,15 @@ class LoginRequest(BaseModel):
 
 # === HELPER ===
 def load_employee(code: str):
-    df = load_employees_sqlite()  # ← SQLite dataframe จาก employees.py
-
-    row = df[df["empCode"].astype(str).str.lower() == code.lower()]
-    if row.empty:
+    r = get_employee_directory().get(code)
+    if r is None:
         return None
 
-    r = row.iloc[0]
+    emp_code, emp_name, branch_code = r
     return {
-        "id": str(r["empCode"]).strip(),
-        "name": str(r["empName"]).strip(),
-        "branchId": str(r["branchCode"]).strip() if pd.notna(r["branchCode"]) else None,
+        "id": str(emp_code).strip(),
+        "name": str(emp_name).strip(),
+        "branchId": str(branch_code).strip() if pd.notna(branch_code) else None,
     }
 
 
@@ -42,6 +41,8 @@ def login(req: LoginRequest):
     if not emp:
         raise HTTPException(status_code=401, detail="รหัสพนักงานไม่ถูกต้อง")
 
+    import jwt   # import ตอน login ครั้งแรก (ไม่ถ่วงเวลา start)
+
     token = jwt.encode(
         {
             "sub": emp["id"],
@@ -0,0 +1,182 @@
+# lookup_tables.py — cache ตาราง mapping Code → Name ทั้งหมด (Brand/Group/SubGroup/Color/Thickness/Character)
+#
+# - โหลดทุกตารางรอบเดียว (connection เดียว) ตอน startup แล้วเก็บเป็น snapshot มี version
+# - dict / payload ที่ต่อจาก snapshot (text / zfill / exact, JSON ของ /options) คำนวณครั้งเดียวต่อ version
+#   mapping คืนเป็น MappingProxyType (อ่านอย่างเดียว) เพราะแชร์ระหว่าง request
+# - แถวในตาราง lookup ถูกเขียน (table_versions) หรือมีตาราง lookup เพิ่ม / ลบ (schema_version)
+#   → อ่านตารางใหม่แล้วเทียบ ถ้าแถวเหมือนเดิมก็ใช้ version เดิมต่อ (เขียนใบเสนอราคาไม่ต้องอ่านใหม่)
+# - reload() = hook บังคับโหลดใหม่ทันที (เช่น หลังแก้ตาราง mapping)
+import json
+import threading
+import time
+from types import MappingProxyType
+from typing import Mapping
+
+import pandas as pd
+
+from db_sqlite import read_conn, schema_version, table_versions
+
+LOOKUP_SUFFIXES = ("_Brand", "_Group", "_SubGroup", "_Color", "_Thickness")
+EXTRA_TABLES = ("Character",)
+
+
+def _is_lookup(name: str) -> bool:
+    return name in EXTRA_TABLES or name.endswith(LOOKUP_SUFFIXES)
+
+
+def _lookup_names(conn) -> tuple:
+    return tuple(
+        r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")
+        if _is_lookup(r[0])
+    )
+
+
+def _read_tables() -> dict:
+    """{ชื่อตาราง: (คอลัมน์, แถว)} ของทุกตาราง lookup"""
+    tables = {}
+    with read_conn() as conn:
+        for name in _lookup_names(conn):
+            cur = conn.execute(f'SELECT * FROM "{name}"')
+            columns = tuple(d[0] for d in cur.description)
+            tables[name] = (columns, tuple(tuple(r) for r in cur.fetchall()))
+    return tables
+
+
+def _render(content) -> bytes:
+    # เหมือน fastapi.responses.JSONResponse.render
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+class LookupSnapshot:
+    def __init__(self, version: int, tables: dict):
+        self.version = version
+        self.tables = tables
+        self.loaded_at = time.time()
+        self._derived = {}
+        self._lock = threading.RLock()     # builder เรียก memo ซ้อนได้ (options_payload → text_map)
+
+    def _memo(self, key, builder):
+        try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = builder()
+            return self._derived[key]
+
+    def _frame(self, table: str) -> pd.DataFrame:
+        # ชนิดข้อมูลเหมือน pd.read_sql_query (เช่น Code ตัวเลข → int) + strip ชื่อคอลัมน์
+        columns, rows = self.tables[table]
+        df = pd.DataFrame.from_records(list(rows), columns=list(columns), coerce_float=True)
+        df.columns = [c.strip() for c in df.columns]
+        return df
+
+    def text_map(self, table: str) -> Mapping:
+        """str(Code).strip() → str(Name).strip() (แถวหลังทับแถวก่อน)"""
+        def build():
+            df = self._frame(table)
+            mapping = {}
+            for code, name in zip(df["Code"].tolist(), df["Name"].tolist()):
+                mapping[str(code).strip()] = str(name).strip()
+            return MappingProxyType(mapping)
+        return self._memo(("text", table), build)
+
+    def zfill_map(self, table: str, width: int, scope_width: int | None = None) -> Mapping:
+        """Code zfill(width) → Name (scope_width → key เป็น (Type zfill, Code zfill))"""
+        def build():
+            columns, rows = self.tables[table]
+            ix = {c: i for i, c in enumerate(columns)}
+            code, name = ix["Code"], ix["Name"]
+            if scope_width is None:
+                return MappingProxyType({str(r[code]).zfill(width): r[name] for r in rows})
+            typ = ix["Type"]
+            return MappingProxyType({(str(r[typ]).zfill(scope_width), str(r[code]).zfill(width)): r[name] for r in rows})
+        return self._memo(("zfill", table, width, scope_width), build)
+
+    def exact_map(self, table: str, key_columns: tuple = ("Code",)) -> Mapping:
+        """ค่าดิบของ key_columns → Name แถวแรกที่ตรง (เหมือน SELECT Name ... WHERE Code=? แล้ว fetchone)"""
+        def build():
+            columns, rows = self.tables[table]
+            ix = {c: i for i, c in enumerate(columns)}
+            keys = [ix[c] for c in key_columns]
+            name = ix["Name"]
+            mapping = {}
+            for r in rows:
+                key = r[keys[0]] if len(keys) == 1 else tuple(r[k] for k in keys)
+                mapping.setdefault(key, r[name])
+            return MappingProxyType(mapping)
+        return self._memo(("exact", table, key_columns), build)
+
+    def options_payload(self, facets: tuple) -> bytes:
+        """JSON ของ {facet: [{code, name}, ...]} จาก text_map ของแต่ละตาราง — facets = ((facet, table), ...)"""
+        def build():
+            return _render({
+                facet: [{"code": k, "name": v} for k, v in self.text_map(table).items()]
+                for facet, table in facets
+            })
+        return self._memo(("options", facets), build)
+
+
+class _LookupCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.snapshot: LookupSnapshot | None = None
+        self.stamp = None
+        self.names = (None, ())     # (schema_version, ชื่อตาราง lookup) — อ่าน sqlite_master ใหม่เมื่อโครงสร้างเปลี่ยน
+        self.stats = {"loads": 0, "reloads": 0, "unchanged_checks": 0}
+
+
+_cache = _LookupCache()
+
+
+def _stamp():
+    schema = schema_version()
+    if _cache.names[0] != schema:
+        with read_conn() as conn:
+            _cache.names = (schema, _lookup_names(conn))
+    names = _cache.names[1]
+    return names, table_versions(names) if names else ()
+
+
+def refresh(force: bool = False) -> LookupSnapshot:
+    stamp = _stamp()
+    snap = _cache.snapshot
+    if snap is not None and not force and stamp == _cache.stamp:
+        return snap
+
+    with _cache.lock:
+        snap = _cache.snapshot
+        if snap is not None and not force and stamp == _cache.stamp:
+            return snap
+
+        tables = _read_tables()
+        if snap is None or tables != snap.tables:
+            version = snap.version + 1 if snap is not None else 1
+            _cache.snapshot = snap = LookupSnapshot(version, tables)
+            _cache.stats["loads" if version == 1 else "reloads"] += 1
+        else:
+            _cache.stats["unchanged_checks"] += 1
+        _cache.stamp = stamp
+        return snap
+
+
+def get_lookups() -> LookupSnapshot:
+    return refresh()
+
+
+def reload() -> dict:
+    """hook: โหลดตาราง mapping ใหม่ทันที (แม้ table version ไม่เปลี่ยน)"""
+    refresh(force=True)
+    return status()
+
+
+def status() -> dict:
+    snap = _cache.snapshot
+    return {
+        "version": snap.version if snap else 0,
+        "tables": len(snap.tables) if snap else 0,
+        "rows": sum(len(rows) for _, rows in snap.tables.values()) if snap else 0,
+        "loaded_at": snap.loaded_at if snap else None,
+        **_cache.stats,
+    }
@@ -1,6 +1,12 @@
 # main.py
+import startup_profile  # จับเวลา start (บรรทัดแรก) — GET /api/startup, python startup_profile.py
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+import app_logging
+app_logging.setup()     # ก่อน import router อื่น → log ตอนโหลด module ก็เข้าคิว
 
 from customer import router as customer_router   
 from items import router as items_router
@@ -15,6 +21,17 @@ from accessories_router import router as accessories_router
 from sealant_router import router as sealant_router
 from gypsum_router import router as gypsum_router
 from quotation import router as quotation_router
+import catalog
+import customer_index
+import customer_tier
+import db_sqlite
+import quotation
+import excel_outbox
+import lookup_tables
+import response_cache
+import metrics
+startup_profile.mark("import modules")
+
 app = FastAPI(title="Smart Pricing API", version="1.0.0")
 
 app.add_middleware(
@@ -26,7 +43,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", app_logging.REQUEST_ID_HEADER],
 )
+# วัดเวลา / query DB ต่อ route (ตัวนอกสุด → รวมเวลา CORS ด้วย)
+app.add_middleware(metrics.MetricsMiddleware)
+# request id ต่อ log ทุกบรรทัดของ request (อยู่นอก metrics → log จาก middleware ก็มี id)
+app.add_middleware(app_logging.RequestIdMiddleware)
 
 app.include_router(quotation_router, prefix="/api")
 app.include_router(customer_router, prefix="/api")
@@ -41,6 +63,91 @@ app.include_router(cline_router,prefix="/api")
 app.include_router(accessories_router,prefix="/api")
 app.include_router(sealant_router,prefix="/api")
 app.include_router(gypsum_router,prefix="/api")
+startup_profile.mark("build app")
+
+
+@app.on_event("startup")
+@startup_profile.timed
+def ensure_quotation_indexes():
+    quotation.ensure_indexes()
+    quotation.backfill_quote_sequences()
+
+
+@app.on_event("startup")
+@startup_profile.timed
+def start_excel_outbox():
+    # export แถวที่ค้างจากรอบก่อน (ถ้ามี) แล้วรอรับงานใหม่
+    excel_outbox.ensure_table()
+    excel_outbox.start()
+
+
+@app.on_event("startup")
+@startup_profile.timed
+def warm_caches():
+    # โหลด cache ที่ request แรกต้องใช้ — default ทำเบื้องหลังหลังเปิด port (STARTUP_WARMUP=background|sync|off)
+    startup_profile.start_warmup([
+        # ตาราง mapping (Brand/Group/SubGroup/Color/Thickness/Character) ทั้งหมดรอบเดียว
+        ("lookup_tables", lambda: lookup_tables.refresh(force=True)),
+        # index ค้นลูกค้าก่อน — หน้าร้านเริ่ม session ด้วยการค้นลูกค้า
+        ("customer_index", customer_index.get_index),
+        # Tier ลูกค้าทั้งหมด (LevelPrice ทั้งตาราง)
+        ("customer_tiers", customer_tier.refresh),
+        ("catalog", catalog.get_snapshot),
+    ])
+
+
+@app.on_event("startup")
+def startup_ready():
+    startup_profile.mark_ready()
+
+
+@app.on_event("shutdown")
+def close_db_pool():
+    excel_outbox.stop()
+    db_sqlite.close_all()
+    app_logging.shutdown()
+
+
+@app.get("/api/db/pool")
+def db_pool_stats():
+    # hit/miss ของ read connection และเวลารอ writer (ดู contention ตอนออกใบเสนอราคาพร้อมกัน)
+    return db_sqlite.pool_stats()
+
+
+@app.get("/api/cache/stats")
+def response_cache_stats():
+    # hit / 304 / ขนาด cache ของ GET catalog / ลูกค้า
+    return response_cache.stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    # Prometheus text format — latency ต่อ route, in-flight, query DB ต่อ request, hit ratio ของ cache
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/api/startup")
+def startup_report():
+    # เวลา import / startup hook / warm-up แต่ละขั้น (ms ตั้งแต่เริ่ม import main)
+    return startup_profile.report()
+
+
+@app.get("/api/logging")
+def logging_status():
+    return app_logging.stats()
+
+
+@app.get("/api/lookups")
+def lookup_tables_status():
+    return lookup_tables.status()
+
+
+@app.post("/api/lookups/reload")
+def reload_lookup_tables():
+    # เรียกหลังแก้ตาราง mapping → ชื่อใหม่มีผลทันที (ไม่รอรอบเช็ค DB)
+    result = lookup_tables.reload()
+    response_cache.clear()
+    return result
 
 
 @app.get("/")
@@ -1,54 +1,312 @@
-import pandas as pd
-import numpy as np
-from datetime import datetime
+# mean_sd.py — สร้าง mean_sd.json (mean / sd ของ Accum6m (ln), Frequency, Tenure) ที่ LevelPrice ใช้
+#
+#   python mean_sd.py build                                   # อ่านตาราง Customer ใน DB_FILE แล้ว publish
+#   python mean_sd.py build AY.xlsx BKK.csv --sheet AY1-6     # export ของหลายสาขา (อ่านขนานกัน --jobs)
+#   python mean_sd.py build db AY.xlsx --dry-run              # DB + ไฟล์ รวมกัน ไม่เขียนไฟล์
+#   python mean_sd.py build AY.xlsx --partial ay.partial.json # ผลย่อยของสาขา (ไว้ merge ทีหลัง)
+#   python mean_sd.py merge ay.partial.json bkk.partial.json  # รวมผลย่อยแล้ว publish
+#
+# - อ่านทีละ chunk (ไม่โหลดทั้งตารางเข้า memory) → สะสมด้วย Welford / Chan (n, mean, M2)
+#   ผลย่อยของแต่ละ chunk / ไฟล์ / สาขา merge กันได้ลำดับไหนก็ได้ ได้ค่าเดียวกับคำนวณรวดเดียว
+# - sd แบบ population (ddof=0) ข้ามค่า NaN / ว่าง เหมือน np.nanmean / np.nanstd เดิม
+# - publish: เขียนไฟล์ชั่วคราวใน directory เดียวกันแล้ว os.replace → LevelPrice ไม่มีทางอ่านเจอไฟล์ครึ่ง ๆ
+#   version เพิ่มทีละ 1 ทุกครั้งที่ publish; LevelPrice.load_stats() เห็น mtime เปลี่ยน → โหลดใหม่เอง
+#   (customer_tier คำนวณ tier ใหม่ตาม) ไม่ต้อง restart
+import argparse
 import json
+import math
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
 from pathlib import Path
 
-# โหลดไฟล์
-FILE_PATH = r"C:\Users\HP\Desktop\Quetung\Corr\AY\AYUTTHAYA .xlsx"
-SHEET_NAME = "AY1-6"
-OUTPUT_JSON = Path(__file__).parent / "mean_sd.json" 
-
-try:
-    df = pd.read_excel(FILE_PATH, sheet_name=SHEET_NAME)
-except FileNotFoundError:
-    print(f"Error: ไม่พบไฟล์ {FILE_PATH}")
-    exit()
-except Exception as e:
-    print(f"Error: ไม่สามารถอ่านไฟล์ Excel: {e}")
-    exit()
-
-
-# --- แปลงข้อมูล ---
-# (ใช้ชื่อคอลัมน์จาก Excel ต้นฉบับ)
-df["Accum6m"] = pd.to_numeric(df.get("Accum6m"), errors="coerce")
-df["Frequency"] = pd.to_numeric(df.get("Frequency"), errors="coerce")
-df["Customer Date"] = pd.to_datetime(df.get("Customer Date"), errors="coerce")
-
-# Accum6m ไป ln 
-df["Accum6m_ln"] = np.log(df["Accum6m"] + 1)   # +1 กัน log(0)
-
-# แปลง Customer Date → Tenure (ปี)
-current_year = datetime.now().year
-df["Tenure_Year"] = current_year - df["Customer Date"].dt.year
-
-
-# --- คำนวณ mean และ sd ---
-# (❗️ FIX: เปลี่ยน Key ทั้งหมดเป็น snake_case)
-summary = {
-    "accum_6m_ln_mean": np.nanmean(df["Accum6m_ln"]),
-    "accum_6m_ln_sd": np.nanstd(df["Accum6m_ln"], ddof=0),
-    "frequency_mean": np.nanmean(df["Frequency"]),
-    "frequency_sd": np.nanstd(df["Frequency"], ddof=0),
-    "tenure_mean": np.nanmean(df["Tenure_Year"]),
-    "tenure_sd": np.nanstd(df["Tenure_Year"], ddof=0)
-}
-
-# --- บันทึกเป็น JSON ---
-try:
-    with open(OUTPUT_JSON, "w", encoding="utf-8") as f:
-        # ใส่ [summary] เพื่อให้โครงสร้างเหมือนไฟล์ mean_sd.json เดิม
-        json.dump([summary], f, indent=4)
-    print(f"บันทึกไฟล์ mean_sd.json (ฉบับแก้ไข) เรียบร้อยที่: {OUTPUT_JSON}")
-except Exception as e:
-    print(f"Error: ไม่สามารถบันทึกไฟล์ JSON: {e}")
\ No newline at end of file
+import numpy as np
+import pandas as pd
+
+OUTPUT_JSON = Path(__file__).parent / "mean_sd.json"
+PARTIAL_KIND = "mean_sd_partial"
+CHUNK_SIZE = 5000
+
+# ชื่อคอลัมน์ตามตาราง Customer / export Excel ของสาขา
+COL_ACCUM6M = "Accum6m"
+COL_FREQUENCY = "Frequency"
+COL_CUSTOMER_DATE = "Customer Date"
+COLUMNS = [COL_ACCUM6M, COL_FREQUENCY, COL_CUSTOMER_DATE]
+
+# key ใน mean_sd.json: {name}_mean / {name}_sd (LevelPrice อ่านตามนี้)
+STAT_NAMES = ["accum_6m_ln", "frequency", "tenure"]
+
+
+# ============================
+# Welford / Chan
+# ============================
+@dataclass
+class RunningStats:
+    n: int = 0
+    mean: float = 0.0
+    m2: float = 0.0          # ผลรวมกำลังสองของส่วนต่างจาก mean
+
+    def merge(self, other: "RunningStats") -> "RunningStats":
+        """Chan et al.: รวม (n, mean, M2) สองชุด"""
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.n, self.mean, self.m2 = other.n, other.mean, other.m2
+            return self
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+        return self
+
+    def push(self, values) -> "RunningStats":
+        """เพิ่มทั้ง chunk: (n, mean, M2) ของ chunk ด้วย numpy แล้ว merge (ค่าที่ไม่ finite ข้าม)"""
+        x = np.asarray(values, dtype=float)
+        x = x[np.isfinite(x)]
+        if x.size == 0:
+            return self
+        mean = float(x.mean())
+        return self.merge(RunningStats(int(x.size), mean, float(((x - mean) ** 2).sum())))
+
+    @property
+    def sd(self) -> float:
+        return math.sqrt(self.m2 / self.n) if self.n else float("nan")
+
+
+class StatsBuilder:
+    def __init__(self, year: int | None = None):
+        # tenure = ปีปัจจุบัน - ปีที่เป็นลูกค้า → ผลย่อยที่ merge กันต้องใช้ปีเดียวกัน
+        self.year = year or datetime.now().year
+        self.stats = {name: RunningStats() for name in STAT_NAMES}
+        self.sources = []
+        self.rows = 0
+
+    def add_chunk(self, df: pd.DataFrame):
+        accum6m = pd.to_numeric(df[COL_ACCUM6M], errors="coerce")
+        frequency = pd.to_numeric(df[COL_FREQUENCY], errors="coerce")
+        customer_date = pd.to_datetime(df[COL_CUSTOMER_DATE], errors="coerce")
+
+        # แปลงแบบเดียวกับ LevelPrice(): ln(1 + Accum6m), tenure เป็นปี
+        self.stats["accum_6m_ln"].push(np.log1p(accum6m))
+        self.stats["frequency"].push(frequency)
+        self.stats["tenure"].push(self.year - customer_date.dt.year)
+        self.rows += len(df)
+
+    def merge(self, other: "StatsBuilder") -> "StatsBuilder":
+        if other.year != self.year:
+            raise ValueError(f"merge ผลย่อยต่างปีไม่ได้ ({self.year} กับ {other.year}) — tenure คิดจากปีปัจจุบัน")
+        for name in STAT_NAMES:
+            self.stats[name].merge(other.stats[name])
+        self.sources += other.sources
+        self.rows += other.rows
+        return self
+
+    # ---------- ผลย่อย (JSON) ----------
+    def to_partial(self) -> dict:
+        return {
+            "kind": PARTIAL_KIND,
+            "year": self.year,
+            "rows": self.rows,
+            "sources": self.sources,
+            "stats": {name: {"n": s.n, "mean": s.mean, "m2": s.m2} for name, s in self.stats.items()},
+        }
+
+    @classmethod
+    def from_partial(cls, data: dict) -> "StatsBuilder":
+        if data.get("kind") != PARTIAL_KIND:
+            raise ValueError("ไม่ใช่ไฟล์ผลย่อยของ mean_sd.py")
+        builder = cls(year=data["year"])
+        builder.rows = data["rows"]
+        builder.sources = list(data["sources"])
+        for name in STAT_NAMES:
+            builder.stats[name] = RunningStats(**data["stats"][name])
+        return builder
+
+    # ---------- ผลลัพธ์ ----------
+    def summary(self) -> dict:
+        out = {}
+        for name in STAT_NAMES:
+            out[f"{name}_mean"] = self.stats[name].mean
+            out[f"{name}_sd"] = self.stats[name].sd
+        return out
+
+    def validate(self):
+        # sd = 0 / ไม่มีข้อมูล → LevelPrice ให้คะแนน 0 ทุกคน ไม่ publish ทับของเดิม
+        for name in STAT_NAMES:
+            s = self.stats[name]
+            if s.n == 0 or not s.sd > 0:
+                raise ValueError(f"{name}: ข้อมูลไม่พอ (n={s.n}, sd={s.sd})")
+
+
+# ============================
+# แหล่งข้อมูล (อ่านทีละ chunk)
+# ============================
+def iter_db_chunks(chunksize: int = CHUNK_SIZE):
+    from db_sqlite import read_conn
+
+    cols = ", ".join(f'"{c}"' for c in COLUMNS)
+    with read_conn() as conn:
+        yield from pd.read_sql_query(f'SELECT {cols} FROM "Customer"', conn, chunksize=chunksize)
+
+
+def iter_excel_chunks(path: Path, sheet: str | None = None, chunksize: int = CHUNK_SIZE):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if sheet and sheet in wb.sheetnames else wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        header = [str(h).strip() if h is not None else "" for h in next(rows, ())]
+        missing = [c for c in COLUMNS if c not in header]
+        if missing:
+            raise ValueError(f"{path}: ไม่พบคอลัมน์ {missing}")
+        positions = [header.index(c) for c in COLUMNS]
+
+        chunk = []
+        for row in rows:
+            chunk.append([row[i] if i < len(row) else None for i in positions])
+            if len(chunk) >= chunksize:
+                yield pd.DataFrame(chunk, columns=COLUMNS)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=COLUMNS)
+    finally:
+        wb.close()
+
+
+def iter_csv_chunks(path: Path, chunksize: int = CHUNK_SIZE):
+    yield from pd.read_csv(path, usecols=COLUMNS, chunksize=chunksize)
+
+
+def build_source(source: str, sheet: str | None = None, chunksize: int = CHUNK_SIZE,
+                 year: int | None = None) -> dict:
+    """แหล่งเดียว ("db" หรือ path ไฟล์) → ผลย่อย (dict ส่งข้าม process ได้)"""
+    builder = StatsBuilder(year)
+    if source == "db":
+        chunks = iter_db_chunks(chunksize)
+    else:
+        path = Path(source)
+        if path.suffix.lower() == ".csv":
+            chunks = iter_csv_chunks(path, chunksize)
+        else:
+            chunks = iter_excel_chunks(path, sheet, chunksize)
+    for chunk in chunks:
+        builder.add_chunk(chunk)
+    builder.sources.append(source)
+    return builder.to_partial()
+
+
+def build(sources: list, sheet: str | None = None, chunksize: int = CHUNK_SIZE, jobs: int = 1) -> StatsBuilder:
+    year = datetime.now().year
+    if jobs > 1 and len(sources) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(sources))) as pool:
+            partials = list(pool.map(build_source, sources, [sheet] * len(sources),
+                                     [chunksize] * len(sources), [year] * len(sources)))
+    else:
+        partials = [build_source(s, sheet, chunksize, year) for s in sources]
+
+    result = StatsBuilder(year)
+    for partial in partials:
+        result.merge(StatsBuilder.from_partial(partial))
+    return result
+
+
+# ============================
+# publish (atomic + version)
+# ============================
+def current_version(path: Path = OUTPUT_JSON) -> int:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return int(json.load(f)[0].get("version", 0))
+    except (FileNotFoundError, ValueError, KeyError, IndexError, TypeError, AttributeError):
+        return 0
+
+
+def _write_atomic(path: Path, data):
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def publish(builder: StatsBuilder, path: Path = OUTPUT_JSON) -> dict:
+    builder.validate()
+    doc = {
+        **builder.summary(),
+        "version": current_version(path) + 1,
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+        "year": builder.year,
+        "rows": builder.rows,
+        "n": {name: builder.stats[name].n for name in STAT_NAMES},
+        "sources": builder.sources,
+    }
+    # ใส่ [doc] เพื่อให้โครงสร้างเหมือนไฟล์ mean_sd.json เดิม
+    _write_atomic(path, [doc])
+    return doc
+
+
+# ============================
+# CLI
+# ============================
+def _finish(builder: StatsBuilder, args) -> int:
+    if args.partial:
+        _write_atomic(Path(args.partial), builder.to_partial())
+        print(f"บันทึกผลย่อย ({builder.rows} แถว) → {args.partial}")
+        return 0
+    if args.dry_run:
+        builder.validate()
+        print(json.dumps({**builder.summary(), "rows": builder.rows, "sources": builder.sources}, indent=4))
+        return 0
+    doc = publish(builder, Path(args.out))
+    print(f"publish mean_sd.json version {doc['version']} ({doc['rows']} แถว) → {args.out}")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python mean_sd.py")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def output_args(p):
+        p.add_argument("--out", default=str(OUTPUT_JSON), help="ไฟล์ที่ publish (default: mean_sd.json ข้าง LevelPrice)")
+        p.add_argument("--partial", help="เขียนผลย่อยไฟล์นี้แทนการ publish")
+        p.add_argument("--dry-run", action="store_true", help="แสดงผลอย่างเดียว ไม่เขียนไฟล์")
+
+    b = sub.add_parser("build", help="อ่านข้อมูลลูกค้า (DB / .xlsx / .csv) แล้วคำนวณ mean / sd")
+    b.add_argument("sources", nargs="*", default=["db"], help='"db" = ตาราง Customer ใน DB_FILE หรือ path ไฟล์')
+    b.add_argument("--sheet", help="ชื่อ sheet ของไฟล์ Excel (default: sheet แรก)")
+    b.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    b.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="จำนวน process อ่านไฟล์พร้อมกัน")
+    output_args(b)
+
+    m = sub.add_parser("merge", help="รวมผลย่อยจาก build --partial")
+    m.add_argument("partials", nargs="+")
+    output_args(m)
+
+    args = parser.parse_args()
+    try:
+        if args.command == "build":
+            builder = build(args.sources, args.sheet, args.chunksize, args.jobs)
+        else:
+            builder = None
+            for path in args.partials:
+                with open(path, "r", encoding="utf-8") as f:
+                    part = StatsBuilder.from_partial(json.load(f))
+                builder = part if builder is None else builder.merge(part)
+        return _finish(builder, args)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,318 @@
+# metrics.py — เวลาตอบของแต่ละ endpoint + query DB ต่อ request → GET /metrics (Prometheus text format)
+#
+# ไม่พึ่ง library ภายนอก (ใช้ได้ในเครื่องที่ไม่มี internet)
+# - MetricsMiddleware : ASGI middleware แบบ raw (ไม่บัฟเฟอร์ body เหมือน BaseHTTPMiddleware)
+#   label route = path template ของ route (เช่น /api/glass/items) → จำนวน series คงที่ ไม่โตตาม URL
+#   ไม่ match route ไหน → route="<unmatched>"
+# - DB: db_sqlite เรียก record_query() ทุก execute / fetch → นับเข้า request ปัจจุบัน (contextvar)
+#   งานนอก request (excel outbox, warm-up) นับแยกเป็น context="background"
+# - ค่าของ cache ต่าง ๆ (catalog / lookup / response cache / customer index / pool) อ่านตอน scrape
+#
+# module นี้ import แค่ stdlib ที่ระดับบนสุด (db_sqlite import module นี้) — module อื่นดึงใน collector
+import contextvars
+import threading
+import time
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED = "<unmatched>"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_started_at = time.time()
+_lock = threading.Lock()
+
+
+class _RequestDB:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# ตัวนับ DB ของ request ปัจจุบัน (threadpool ของ FastAPI copy context → endpoint sync ก็เห็นตัวเดียวกัน)
+_current_db: contextvars.ContextVar = contextvars.ContextVar("metrics_request_db", default=None)
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)     # ไม่สะสม — สะสมตอน render
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, le in enumerate(BUCKETS):
+            if value <= le:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+_latency: dict = {}          # (method, route) → _Histogram
+_requests: dict = {}         # (method, route, status) → count
+_route_db: dict = {}         # (method, route) → [queries, seconds]
+_in_flight: dict = {}        # method → จำนวนที่กำลังทำ (ยังไม่รู้ route จนกว่า router จะ match)
+_db_totals = {"request": [0, 0.0], "background": [0, 0.0]}
+
+
+def record_query(seconds: float, queries: int = 1):
+    """เรียกจาก db_sqlite ทุกครั้งที่ execute (queries=1) / fetch (queries=0)"""
+    current = _current_db.get()
+    if current is not None:
+        current.queries += queries
+        current.seconds += seconds
+        return
+    with _lock:
+        total = _db_totals["background"]
+        total[0] += queries
+        total[1] += seconds
+
+
+def _route_of(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or UNMATCHED
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        db = _RequestDB()
+        token = _current_db.set(db)
+        with _lock:
+            _in_flight[method] = _in_flight.get(method, 0) + 1
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - t0
+            _current_db.reset(token)
+            key = (method, _route_of(scope))
+            with _lock:
+                _in_flight[method] -= 1
+                hist = _latency.get(key)
+                if hist is None:
+                    hist = _latency[key] = _Histogram()
+                hist.observe(elapsed)
+                rkey = key + (str(status),)
+                _requests[rkey] = _requests.get(rkey, 0) + 1
+                per_route = _route_db.setdefault(key, [0, 0.0])
+                per_route[0] += db.queries
+                per_route[1] += db.seconds
+                total = _db_totals["request"]
+                total[0] += db.queries
+                total[1] += db.seconds
+
+
+# ============================
+# render (Prometheus text exposition format 0.0.4)
+# ============================
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _num(value) -> str:
+    if value is None:
+        return "NaN"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float):
+        return repr(value) if value == value else "NaN"
+    return str(value)
+
+
+class _Writer:
+    def __init__(self):
+        self.lines = []
+
+    def family(self, name: str, kind: str, help_text: str):
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name: str, value, **labels):
+        self.lines.append(f"{name}{_labels(**labels)} {_num(value)}")
+
+    def text(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def _ratio(hits, misses):
+    total = hits + misses
+    return hits / total if total else None
+
+
+def _write_http(w: _Writer):
+    with _lock:
+        latency = {k: (list(h.counts), h.sum, h.count) for k, h in _latency.items()}
+        requests = dict(_requests)
+        route_db = {k: tuple(v) for k, v in _route_db.items()}
+        in_flight = dict(_in_flight)
+        db_totals = {k: tuple(v) for k, v in _db_totals.items()}
+
+    w.family("http_requests_in_flight", "gauge", "Requests currently being served.")
+    for method, n in sorted(in_flight.items()):
+        w.sample("http_requests_in_flight", n, method=method)
+
+    w.family("http_requests_total", "counter", "Requests served, by route template and status code.")
+    for (method, route, status), n in sorted(requests.items()):
+        w.sample("http_requests_total", n, method=method, route=route, status=status)
+
+    w.family("http_request_duration_seconds", "histogram", "Request latency by route template.")
+    for (method, route), (counts, total, count) in sorted(latency.items()):
+        cumulative = 0
+        for le, n in zip(BUCKETS, counts):
+            cumulative += n
+            w.sample("http_request_duration_seconds_bucket", cumulative, method=method, route=route, le=_num(le))
+        w.sample("http_request_duration_seconds_bucket", count, method=method, route=route, le="+Inf")
+        w.sample("http_request_duration_seconds_sum", total, method=method, route=route)
+        w.sample("http_request_duration_seconds_count", count, method=method, route=route)
+
+    w.family("http_request_db_queries_total", "counter", "SQLite statements executed while serving the route.")
+    for (method, route), (queries, _) in sorted(route_db.items()):
+        w.sample("http_request_db_queries_total", queries, method=method, route=route)
+
+    w.family("http_request_db_seconds_total", "counter", "Time spent in SQLite execute/fetch while serving the route.")
+    for (method, route), (_, seconds) in sorted(route_db.items()):
+        w.sample("http_request_db_seconds_total", seconds, method=method, route=route)
+
+    w.family("db_queries_total", "counter", "SQLite statements executed, inside requests or in background work.")
+    for context, (queries, _) in sorted(db_totals.items()):
+        w.sample("db_queries_total", queries, context=context)
+
+    w.family("db_query_seconds_total", "counter", "Time spent in SQLite execute/fetch.")
+    for context, (_, seconds) in sorted(db_totals.items()):
+        w.sample("db_query_seconds_total", seconds, context=context)
+
+
+def _write_caches(w: _Writer):
+    # import ตอน scrape: db_sqlite import module นี้ (กัน import วน) และไม่บังคับโหลด cache ที่ยังไม่ถูกใช้
+    import app_logging
+    import cart_sessions
+    import catalog
+    import customer_index
+    import db_sqlite
+    import lookup_tables
+    import pricing_model
+    import quote_cache
+    import response_cache
+
+    cat = catalog.stats()
+    w.family("catalog_snapshot_requests_total", "counter",
+             "Catalog snapshot lookups served from memory (hit), re-read with no row change (unchanged) or reloaded (load).")
+    w.sample("catalog_snapshot_requests_total", cat["hits"], result="hit")
+    w.sample("catalog_snapshot_requests_total", cat["unchanged_checks"], result="unchanged")
+    w.sample("catalog_snapshot_requests_total", cat["loads"], result="load")
+    w.family("catalog_snapshot_hit_ratio", "gauge", "Share of catalog snapshot lookups that did not reload.")
+    w.sample("catalog_snapshot_hit_ratio", _ratio(cat["hits"], cat["loads"]))
+    w.family("catalog_version", "gauge", "Current catalog snapshot version.")
+    w.sample("catalog_version", cat["version"])
+    w.family("catalog_items", "gauge", "Rows in the current catalog snapshot.")
+    w.sample("catalog_items", cat["items"])
+
+    rc = response_cache.stats()
+    w.family("response_cache_requests_total", "counter", "Cached GET lookups by result.")
+    for key, result in (("hits", "hit"), ("misses", "miss"), ("not_modified", "not_modified")):
+        w.sample("response_cache_requests_total", rc[key], result=result)
+    w.family("response_cache_hit_ratio", "gauge", "Share of cached GET lookups answered without running the endpoint.")
+    w.sample("response_cache_hit_ratio", _ratio(rc["hits"], rc["misses"]))
+    w.family("response_cache_entries", "gauge", "Entries in the response cache.")
+    w.sample("response_cache_entries", rc["entries"])
+    w.family("response_cache_bytes", "gauge", "Bytes held by the response cache (all encodings).")
+    w.sample("response_cache_bytes", rc["bytes"])
+    w.family("response_cache_evictions_total", "counter", "Entries evicted by the LRU cap.")
+    w.sample("response_cache_evictions_total", rc["evictions"])
+
+    lk = lookup_tables.status()
+    w.family("lookup_tables_version", "gauge", "Current lookup table snapshot version.")
+    w.sample("lookup_tables_version", lk["version"])
+    w.family("lookup_tables_checks_total", "counter", "Lookup table reads by outcome.")
+    for outcome in ("loads", "reloads", "unchanged_checks"):
+        w.sample("lookup_tables_checks_total", lk[outcome], outcome=outcome)
+
+    pm = pricing_model.status()
+    w.family("pricing_model_version", "gauge", "Pricing model version stamped on priced lines.")
+    w.sample("pricing_model_version", pm["version"])
+    w.family("pricing_model_reloads_total", "counter", "Pricing model files by outcome (rejected = failed validation, previous version kept).")
+    w.sample("pricing_model_reloads_total", pm["loads"], outcome="loaded")
+    w.sample("pricing_model_reloads_total", pm["rejected"], outcome="rejected")
+
+    qc = quote_cache.stats()
+    w.family("quote_cache_requests_total", "counter", "Priced cart lines served from the quote cache (hit) or recomputed (miss).")
+    w.sample("quote_cache_requests_total", qc["hits"], result="hit")
+    w.sample("quote_cache_requests_total", qc["misses"], result="miss")
+    w.family("quote_cache_hit_ratio", "gauge", "Share of priced cart lines that were not recomputed.")
+    w.sample("quote_cache_hit_ratio", _ratio(qc["hits"], qc["misses"]))
+    w.family("quote_cache_entries", "gauge", "Cart lines held by the quote cache.")
+    w.sample("quote_cache_entries", qc["entries"])
+    w.family("quote_cache_evictions_total", "counter", "Quote cache entries dropped by reason.")
+    w.sample("quote_cache_evictions_total", qc["evictions"], reason="lru")
+    w.sample("quote_cache_evictions_total", qc["expired"], reason="ttl")
+    w.family("quote_cache_invalidations_total", "counter", "Full quote cache flushes after a catalog, pricing model or stats reload.")
+    w.sample("quote_cache_invalidations_total", qc["invalidations"])
+
+    cs = cart_sessions.stats()
+    w.family("cart_sessions", "gauge", "Server-side cart sessions currently held.")
+    w.sample("cart_sessions", cs["sessions"])
+    w.family("cart_sessions_total", "counter", "Cart sessions by lifecycle event.")
+    for event in ("created", "expired", "evicted", "deleted"):
+        w.sample("cart_sessions_total", cs[event], event=event)
+
+    ci = customer_index.index_stats()
+    w.family("customer_index_version", "gauge", "Current customer index version.")
+    w.sample("customer_index_version", ci["version"])
+    w.family("customer_index_rows", "gauge", "Customers in the search index.")
+    w.sample("customer_index_rows", ci["rows"])
+    w.family("customer_index_updates_total", "counter", "Customer index refreshes by kind.")
+    for kind in ("full_loads", "incremental_updates"):
+        w.sample("customer_index_updates_total", ci[kind], kind=kind)
+
+    pool = db_sqlite.pool_stats()
+    w.family("db_pool_read_checkouts_total", "counter", "Read connection checkouts served from the idle pool (hit) or by opening one (miss).")
+    w.sample("db_pool_read_checkouts_total", pool["read_hits"], result="hit")
+    w.sample("db_pool_read_checkouts_total", pool["read_misses"], result="miss")
+    w.family("db_pool_read_connections", "gauge", "Read connections by state.")
+    w.sample("db_pool_read_connections", pool["read_connections_open"], state="open")
+    w.sample("db_pool_read_connections", pool["read_connections_idle"], state="idle")
+    w.family("db_pool_write_checkouts_total", "counter", "Writer checkouts.")
+    w.sample("db_pool_write_checkouts_total", pool["write_checkouts"])
+    w.family("db_pool_write_waits_total", "counter", "Writer checkouts that had to wait for another writer.")
+    w.sample("db_pool_write_waits_total", pool["write_waits"])
+    w.family("db_pool_write_wait_seconds_total", "counter", "Time spent waiting for the writer.")
+    w.sample("db_pool_write_wait_seconds_total", pool["write_wait_total_ms"] / 1000)
+
+    lg = app_logging.stats()
+    w.family("log_queue_depth", "gauge", "Log records waiting for the writer thread.")
+    w.sample("log_queue_depth", lg["queued"])
+    w.family("log_records_dropped_total", "counter", "Log records dropped because the queue was full.")
+    w.sample("log_records_dropped_total", lg["dropped"])
+
+
+def render() -> str:
+    w = _Writer()
+    w.family("process_start_time_seconds", "gauge", "Start time of the process since unix epoch in seconds.")
+    w.sample("process_start_time_seconds", _started_at)
+    _write_http(w)
+    _write_caches(w)
+    return w.text()
@@ -0,0 +1,108 @@
+# payment_terms.py — เงื่อนไขเครดิต (Payment Terms Code) → จำนวนวัน → markup ราคา
+#
+# - ตาราง term → (วัน, markup) สร้างครั้งเดียวจากค่าที่ไม่ซ้ำของ "Payment Terms Code" ในตาราง Customer
+#   ต่อ (version ของตาราง Customer, pricing model version) → regex ทำตอนสร้างตารางเท่านั้น ไม่ใช่ทุกแถวของตะกร้า
+#   (version จาก customer_index เปลี่ยนเมื่อแถว Customer เปลี่ยนจริง — เขียน DB ส่วนอื่นไม่ทำให้สร้างใหม่)
+# - markup_for(คอลัมน์ payment_terms, model): factorize (ตะกร้าหนึ่งมักมีค่าเดียว) → lookup → array ทั้งคอลัมน์
+#   term ที่ไม่มีในตาราง (ลูกค้านอกตาราง Customer ที่ FE ส่งมาเอง) parse ครั้งแรกแล้วจำไว้ในตารางนั้น
+# - markup ต่อวันอยู่ใน pricing_model (payment_terms.markup) — วันที่ไม่มีในตาราง = 0
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+import pricing_model
+from customer_index import index_version
+from db_sqlite import read_conn
+
+MAX_EXTRA_TERMS = 1000      # term นอกตาราง Customer ที่จำไว้ได้ต่อตาราง (เกินนี้ parse ทุกครั้ง ไม่เก็บ)
+
+_DIGITS = re.compile(r"\d+")
+
+
+def _key(term) -> str:
+    return str(term or "").strip().lower()
+
+
+def parse_days(term, cash_keywords=("cash", "cod")) -> int | None:
+    """จำนวนวันเครดิตจากข้อความเงื่อนไข; ไม่รู้ → None"""
+    term = _key(term)
+    # ดึงตัวเลขทั้งหมดในสตริง เช่น "NET 30 DAYS", "30.0", "CREDIT60" → [30], [30,0], [60]
+    nums = _DIGITS.findall(term)
+    if nums:
+        # ใช้ค่ามากสุดเผื่อเคส "30.0" จะได้ 30 แทน 0
+        return max(int(n) for n in nums)
+    # เผื่อเคสที่เขียนว่า "cash", "cod" ให้ถือเป็น 0 วัน
+    if any(k in term for k in cash_keywords):
+        return 0
+    return None
+
+
+class TermTable:
+    def __init__(self, stamp, model: pricing_model.PricingModel, terms):
+        self.stamp = stamp
+        self.model = model
+        self.entries = {}        # key → (days (NaN = ไม่รู้), markup)
+        for term in terms:
+            key = _key(term)
+            self.entries[key] = self._parse(key)
+        self.known = len(self.entries)
+
+    def _parse(self, key: str) -> tuple:
+        days = parse_days(key, self.model.cash_keywords)
+        return (np.nan if days is None else float(days), self.model.markup_by_days.get(days, 0.0))
+
+    def lookup(self, term) -> tuple:
+        key = _key(term)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self._parse(key)
+            if len(self.entries) < self.known + MAX_EXTRA_TERMS:
+                self.entries[key] = entry
+        return entry
+
+
+_lock = threading.Lock()
+_TABLE: TermTable | None = None
+
+
+def _distinct_terms() -> list:
+    with read_conn() as conn:
+        rows = conn.execute('SELECT DISTINCT "Payment Terms Code" FROM "Customer"').fetchall()
+    return [r[0] for r in rows]
+
+
+def get_table(model: pricing_model.PricingModel | None = None) -> TermTable:
+    global _TABLE
+    model = model or pricing_model.current()
+    stamp = (index_version(), model.version)
+    table = _TABLE
+    if table is not None and table.stamp == stamp:
+        return table
+    with _lock:
+        if _TABLE is None or _TABLE.stamp != stamp:
+            _TABLE = TermTable(stamp, model, _distinct_terms())
+        return _TABLE
+
+
+def markup_for(terms: pd.Series, model: pricing_model.PricingModel | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """(วันเครดิต, markup) ของทุกแถว — markup เป็นสัดส่วน (0.006 = 0.6%)"""
+    table = get_table(model)
+    codes, uniques = pd.factorize(terms, use_na_sentinel=False)
+    entries = [table.lookup(u) for u in uniques]
+    days = np.array([d for d, _ in entries], dtype=np.float64)
+    pct = np.array([p for _, p in entries], dtype=np.float64)
+    return days[codes], pct[codes]
+
+
+def status() -> dict:
+    table = _TABLE
+    if table is None:
+        return {"model_version": None, "terms": 0, "extra_terms": 0}
+    return {
+        "model_version": table.model.version,
+        "terms": table.known,
+        "extra_terms": len(table.entries) - table.known,
+        "table": {k: {"days": None if np.isnan(d) else int(d), "markup": p} for k, (d, p) in table.entries.items()},
+    }
@@ -1,15 +1,21 @@
-# price.py (UPDATED - สูตรปลอดภัยขึ้น)
+# price.py (VECTORIZED - คำนวณทั้งคอลัมน์ ไม่ใช้ df.apply ต่อแถว)
+import logging
 import pandas as pd
 import numpy as np
-import re
-import math
+
+import payment_terms
+import pricing_model
+from app_logging import sample_rows
+
+log = logging.getLogger(__name__)
 
 # ===== flexible column picking =====
 CAND_QTY      = ["Quantity", "Qty", "จำนวน", "ปริมาณ"]
-CAND_E        = ["_RelevantSales"] 
+CAND_E        = ["_RelevantSales"]
 CAND_SHIPMENT = ["DeliveryType", "Shipment Method Code", "shipment", "ขนส่ง", "วิธีรับสินค้า"]
-COL_TIER      = "_Tier_Z"  
+COL_TIER      = "_Tier_Z"
 CAND_SDM      = ["pkg_size", "sdm", "H", "Package Size", "SDM"]
+CAND_TERMS    = ["payment_terms", "Payment Terms Code", "creditTerm"]
 
 def _pick_col(df: pd.DataFrame, candidates: list[str], default=None):
     for c in candidates:
@@ -22,153 +28,177 @@ def _pick_col(df: pd.DataFrame, candidates: list[str], default=None):
             return low_cols[key]
     return default
 
-# ===== weights =====
-W_QTY   = 0.3382
-W_E     = 0.3971
-W_SHIP  = 0.2647
-
-# ===== mapping Tier → คอลัมน์ราคาที่ใช้คั่น =====
-INTERP_COLS = {
-    "R2->R1": ("priceR1", "priceR2"),
-    "R1->W2": ("priceW2", "priceR1"),
-    "W2->W1": ("priceW1", "priceW2"),
-    "W1->P":  ("priceP",  "priceW1"), 
-    "P->P":   ("priceP",  "priceP"),
-}
-DEFAULT_COLS = ("priceR2", "priceR1")
+# ===== weights / mapping Tier → คอลัมน์ราคาที่ใช้คั่น / markup =====
+# อยู่ใน pricing_model (pricing_model.json — แก้แล้วมีผลทันที ไม่ต้อง restart)
 
-# ---------- 3 score functions (0.0-1.0) ----------
 
-# ❗️ 1. (แก้ไข) เพิ่ม try-except เพื่อดักค่า pkg_size ที่เป็น None/NaN
-def _score_qty01(qty: float, pkg_size: float) -> float:
-    try:
-        qty_f = float(qty)
-        pkg_size_f = float(pkg_size)
-        
-        # (ตรวจสอบ NaN เพิ่มเติม)
-        if pd.isna(pkg_size_f) or pkg_size_f == 0:
-            return 0.0 
-        
-        score = qty_f / pkg_size_f
-        return min(score, 1.0)
-    except (ValueError, TypeError):
-        # (ถ้า pkg_size เป็น "" หรือ None แล้ว float() พัง)
-        return 0.0 # ❗️❗️ <--- จุดนี้คือจุดที่แก้ Error (คืนค่า 0.0 แทน None)
+# ---------- helpers: แปลงทั้งคอลัมน์ ----------
 
-# ❗️ 2. (แก้ไข) เพิ่ม try-except เพื่อดักค่า e_val ที่เป็น None/NaN
-def _score_e01(e_val: float) -> float:
+def _try_float(x):
     try:
-        e = float(e_val)
-        if pd.isna(e):
-             return 0.0
-        score = np.log1p(e) / 13.0 # 13 คือค่าคงที่
-        return min(score, 1.0)
+        return float(x), True
     except (ValueError, TypeError):
-        return 0.0 # ❗️❗️ <--- จุดนี้คือจุดที่แก้ Error (คืนค่า 0.0 แทน None)
+        return np.nan, False
+
+
+def _float_values(df: pd.DataFrame, col) -> tuple[np.ndarray, np.ndarray]:
+    """
+    แปลงคอลัมน์เป็น float64 ให้ได้ผลเท่ากับเรียก float(x) ทีละแถว
+    คืน (values, ok) — ok=False คือแถวที่ float() พัง (None, "", ข้อความ)
+    หรือไม่มีคอลัมน์นี้เลย (เทียบเท่า row.get(col) → None)
+    """
+    n = len(df)
+    if col is None or col not in df.columns:
+        return np.full(n, np.nan), np.zeros(n, dtype=bool)
+
+    s = df[col]
+    if isinstance(s.dtype, np.dtype) and pd.api.types.is_numeric_dtype(s.dtype):
+        return s.to_numpy(dtype=np.float64), np.ones(n, dtype=bool)
+
+    # object: แปลงเฉพาะค่าที่ไม่ซ้ำ (ข้อมูลลูกค้าที่ broadcast มาทั้งตะกร้ามักมีค่าเดียว)
+    codes, uniques = pd.factorize(s, use_na_sentinel=False)
+    conv = [_try_float(u) for u in uniques]
+    u_vals = np.array([v for v, _ in conv], dtype=np.float64)
+    u_ok = np.array([ok for _, ok in conv], dtype=bool)
+    values, ok = u_vals[codes], u_ok[codes]
+
+    # factorize รวม None / pd.NA เข้ากับ NaN → แยกกลับให้ตรงกับ float() เดิม
+    for i in np.flatnonzero(s.isna().to_numpy()):
+        values[i], ok[i] = _try_float(s.iloc[i])
+    return values, ok
+
+
+def _map_unique_str(s: pd.Series, fn, dtype) -> np.ndarray:
+    """
+    เรียก fn(str(x)) กับค่าที่ไม่ซ้ำเท่านั้น แล้วกระจายกลับทุกแถว
+    (factorize หลัง astype(str) เพื่อไม่ให้ 1 กับ 1.0 ถูกรวมเป็นค่าเดียวกัน)
+    """
+    codes, uniques = pd.factorize(s.astype(str), use_na_sentinel=False)
+    table = np.array([fn(u) for u in uniques], dtype=dtype)
+    return table[codes] if len(table) else np.empty(len(s), dtype=dtype)
+
+# ---------- 3 score functions (0.0-1.0) ----------
+
+# 1. qty / pkg_size (ถ้าแปลงไม่ได้, pkg_size เป็น NaN หรือ 0 → 0.0)
+def _score_qty01(qty: np.ndarray, qty_ok: np.ndarray, pkg: np.ndarray, pkg_ok: np.ndarray) -> np.ndarray:
+    valid = qty_ok & pkg_ok & ~np.isnan(pkg) & (pkg != 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        score = np.minimum(qty / pkg, 1.0)
+    return np.where(valid, score, 0.0)
+
+# 2. log1p(E) / e_log_scale (13) (ถ้าแปลงไม่ได้หรือ NaN → 0.0)
+def _score_e01(e: np.ndarray, e_ok: np.ndarray, scale: float) -> np.ndarray:
+    valid = e_ok & ~np.isnan(e)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        score = np.minimum(np.log1p(e) / scale, 1.0)
+    return np.where(valid, score, 0.0)
+
+# 3. 1 = PICKUP, อย่างอื่น = DELIVERY
+def _score_ship01(df: pd.DataFrame, col_ship) -> np.ndarray:
+    if col_ship not in df.columns:
+        return np.zeros(len(df))
+    return _map_unique_str(
+        df[col_ship],
+        lambda v: 1.0 if v.strip() == "1" else 0.0,
+        np.float64,
+    )
+
+
+# ---------- payment term markup ----------
+# เครดิต → markup ดูจากตารางที่ payment_terms สร้างไว้ (ค่าที่ไม่ซ้ำของคอลัมน์เท่านั้น ไม่ regex ทุกแถว)
+def _term_markup(df: pd.DataFrame, col_terms, model) -> tuple[np.ndarray, np.ndarray]:
+    if col_terms is None:
+        return np.full(len(df), np.nan), np.zeros(len(df))
+    return payment_terms.markup_for(df[col_terms], model)
 
-# ❗️ 3. (แก้ไข) เพิ่ม try-except (เผื่อไว้)
-def _score_ship01(ship_val: str) -> float:
-    try:
-        if str(ship_val).strip() == "1": # 1 = PICKUP
-            return 1.0
-    except Exception:
-        pass # (ไม่เป็นไร เพราะสุดท้ายจะ return 0.0)
-    return 0.0 # 0 = DELIVERY (หรือค่า default)
-
-# (ส่ง col_sdm เข้าไป)
-def _calc_score01(row, col_qty, col_e, col_ship, col_sdm):
-    qty01  = _score_qty01(row.get(col_qty), row.get(col_sdm)) 
-    e01    = _score_e01(row.get(col_e))
-    ship01 = _score_ship01(row.get(col_ship))
-    total  = (qty01 * W_QTY + e01 * W_E + ship01 * W_SHIP) # (ตอนนี้ qty01, e01, ship01 เป็น 0.0)
-    return qty01, e01, ship01, total
 
 # ---------- ฟังก์ชันหลัก ----------
-def Price(df: pd.DataFrame) -> pd.DataFrame:
+def Price(df: pd.DataFrame, model: pricing_model.PricingModel | None = None) -> pd.DataFrame:
+    # ใช้ model ตัวเดียวตลอดการคำนวณ (ผู้เรียกส่งมาเพื่อให้ตรงกับ LevelPrice ของ request เดียวกัน)
+    model = model or pricing_model.current()
     col_qty  = _pick_col(df, CAND_QTY) or CAND_QTY[0]
     col_e    = _pick_col(df, CAND_E) or CAND_E[0]
     col_ship = _pick_col(df, CAND_SHIPMENT) or CAND_SHIPMENT[0]
-    col_sdm  = _pick_col(df, CAND_SDM) 
-
-    scores = df.apply(
-        lambda r: _calc_score01(r, col_qty, col_e, col_ship, col_sdm),
-        axis=1, result_type="expand"
-    )
-    scores.columns = ["_QtyScore", "_EScore", "_ShipScore", "_Score01"]
-    out = pd.concat([df.reset_index(drop=True), scores], axis=1)
-
-    def _interp_price(row):
-        score = row["_Score01"]
-        
-        # normalize tier first
-        raw = str(row.get(COL_TIER, ""))
-
-        tier = (
-        raw.replace("→", "->")
-            .replace("–", "-")
-            .replace("—", "-")
-            .replace(" ", "")
-            .replace("\n", "")
-            .replace("\r", "")
-            .strip()
-            .upper()
-        )
-
-        
-        # debug
-        print("TIER USED:", tier)
-        
-        col_low, col_high = INTERP_COLS.get(tier, DEFAULT_COLS)
-
-        
-        try:
-            low_price = float(row.get(col_low))
-            high_price = float(row.get(col_high))
-            if pd.isna(low_price) or pd.isna(high_price):
-                return row.get("price") 
-        except Exception:
-            return row.get("price") 
-            
-        new_price = low_price + (high_price - low_price) * (1-score)
-        
-        if pd.isna(new_price):
-            return row.get("price")
-            
-        return new_price
-
-    out["NewPrice"] = out.apply(_interp_price, axis=1)
-    
-    def _apply_payment_term_markup(row):
-        term = str(row.get("payment_terms") or "").strip().lower()
-        base_price = float(row.get("NewPrice", 0))
-
-        # mapping markup %
-        term_markup = {
-            0:   0.000,  # 0 วัน
-            15:  0.003,  # 0.30%
-            30:  0.006,  # 0.60%
-            45:  0.009,  # 0.90%
-            60:  0.012,  # 1.20%
-            90:  0.015,  # 1.50%
-        }
-
-        # 1) ดึงตัวเลขทั้งหมดในสตริง เช่น "NET 30 DAYS", "30.0", "CREDIT60" → [30], [30,0], [60]
-        nums = re.findall(r"\d+", term)
-        days = None
-        if nums:
-            # ใช้ค่ามากสุดเผื่อเคส "30.0" จะได้ 30 แทน 0
-            days = max(int(n) for n in nums)
-        else:
-            # เผื่อเคสที่เขียนว่า "cash", "cod" ให้ถือเป็น 0 วัน
-            if any(k in term for k in ["cash", "cod"]):
-                days = 0
-
-        pct = term_markup.get(days, 0.0)
-        return base_price * (1 + pct)
-
-
-    # ปัดราคาต่อหน่วยลง 2 ทศนิยม (ราคาขายจริง)
-    out["NewPrice"] = out["NewPrice"].apply(lambda x: math.ceil(float(x or 0) * 100) / 100)
-    # ✅ =============================================
-
-    return out
\ No newline at end of file
+    col_sdm  = _pick_col(df, CAND_SDM)
+    col_terms = _pick_col(df, CAND_TERMS)
+
+    out = df.reset_index(drop=True)
+
+    # --- 1. scores ---
+    qty01  = _score_qty01(*_float_values(out, col_qty), *_float_values(out, col_sdm))
+    e01    = _score_e01(*_float_values(out, col_e), model.e_log_scale)
+    ship01 = _score_ship01(out, col_ship)
+    total  = qty01 * model.w_qty + e01 * model.w_e + ship01 * model.w_ship
+
+    out["_QtyScore"]  = qty01
+    out["_EScore"]    = e01
+    out["_ShipScore"] = ship01
+    out["_Score01"]   = total
+
+    # --- 2. tier → (col_low, col_high) ---
+    n = len(out)
+    if COL_TIER in out.columns:
+        tier_codes, tier_uniques = pd.factorize(out[COL_TIER].astype(str), use_na_sentinel=False)
+        tier_pairs = [model.tier_columns(t) for t in tier_uniques]
+    else:
+        tier_codes, tier_pairs = np.zeros(n, dtype=np.intp), [model.default_cols]
+
+    low = np.full(n, np.nan)
+    high = np.full(n, np.nan)
+    ok = np.zeros(n, dtype=bool)
+    col_cache = {}
+    for pair in set(tier_pairs):
+        rows = np.isin(tier_codes, [i for i, p in enumerate(tier_pairs) if p == pair])
+        for col in pair:
+            if col not in col_cache:
+                col_cache[col] = _float_values(out, col)
+        (lo_v, lo_ok), (hi_v, hi_ok) = col_cache[pair[0]], col_cache[pair[1]]
+        low[rows], high[rows] = lo_v[rows], hi_v[rows]
+        ok[rows] = lo_ok[rows] & hi_ok[rows]
+
+    # --- 3. interpolation ---
+    with np.errstate(invalid="ignore"):
+        new_price = low + (high - low) * (1 - total)
+    fallback = ~ok | np.isnan(low) | np.isnan(high) | np.isnan(new_price)
+
+    # แถวที่คำนวณไม่ได้ → ใช้ราคาที่ส่งมากับ cart (None/ไม่มี → 0)
+    if fallback.any():
+        fb_rows = np.flatnonzero(fallback)
+        raw = out["price"].to_numpy(dtype=object)[fb_rows] if "price" in out.columns else [None] * len(fb_rows)
+        new_price[fb_rows] = [float(x or 0) for x in raw]
+
+    # --- 4. markup ตามเครดิต (pricing_model: payment_terms.enabled) ---
+    # แถวที่ใช้ราคาจาก cart (fallback) ไม่บวก — ราคานั้นตกลงกันมาแล้ว
+    if model.markup_enabled:
+        term_days, markup = _term_markup(out, col_terms, model)
+        markup = np.where(fallback, 0.0, markup)
+        out["_BasePrice"] = (np.ceil(new_price * 100) + 0.0) / 100
+        out["_PaymentTermDays"] = term_days
+        out["_PaymentTermMarkup"] = markup
+        # ปัด 6 ตำแหน่งก่อน ceil กัน error ของ float (160 * 1.012 = 161.92000000000002 → 161.93)
+        new_price = np.where(markup != 0, np.round(new_price * (1 + markup), 6), new_price)
+
+    # ปัดราคาต่อหน่วยขึ้น 2 ทศนิยม (ราคาขายจริง)
+    # (+ 0.0 เพื่อให้ -0.0 กลายเป็น 0.0 เหมือน math.ceil เดิม)
+    out["NewPrice"] = (np.ceil(new_price * 100) + 0.0) / 100
+    out["_ModelVersion"] = model.version
+
+    if log.isEnabledFor(logging.DEBUG):
+        _debug_tier_rows(out, tier_codes, tier_pairs, fallback)
+
+    return out
+
+
+def _debug_tier_rows(out: pd.DataFrame, tier_codes, tier_pairs, fallback):
+    # เดิม print "TIER USED" ทุกแถว → สุ่มบางแถวตาม LOG_SAMPLE_RATE
+    tiers = out[COL_TIER] if COL_TIER in out.columns else None
+    skus = out["sku"] if "sku" in out.columns else None
+    for i in sample_rows(len(out)):
+        log.debug("tier used", extra={
+            "sku": skus.iat[i] if skus is not None else None,
+            "tier": tiers.iat[i] if tiers is not None else None,
+            "price_cols": tier_pairs[tier_codes[i]],
+            "score": float(out["_Score01"].iat[i]),
+            "new_price": float(out["NewPrice"].iat[i]),
+            "fallback": bool(fallback[i]),
+        })
@@ -0,0 +1,357 @@
+# pricing_model.py — ค่าคงที่ของโมเดลราคา (น้ำหนัก / tier / markup ตามเครดิต) เป็น snapshot มี version
+#
+# - อ่านจาก pricing_model.json (override path ด้วย env PRICING_MODEL_FILE) ตรวจความถูกต้องแล้ว compile
+#   เป็น PricingModel (immutable) พร้อมตารางที่ใช้ตอนคำนวณ (tier → คู่คอลัมน์ราคา, ช่วงคะแนน, markup)
+#   dict / list / array ข้างในเป็นแบบอ่านอย่างเดียว (MappingProxyType / tuple / array write=False) เพราะแชร์ระหว่าง request
+# - current() เช็ค mtime ของไฟล์ทุกครั้ง (stat เดียว) → แก้ไฟล์แล้วมีผลทันทีไม่ต้อง restart
+#   สลับ snapshot ทั้งก้อน: ผู้เรียกถือ model ตัวเดียวตลอดการคำนวณ (request หนึ่งไม่มีทางเห็นค่าปนสอง version)
+# - ไฟล์ใหม่ไม่ผ่าน validate → ใช้ snapshot เดิมต่อ + log error (ดู error ล่าสุดที่ status())
+#   เนื้อหาเปลี่ยนต้องเปลี่ยน "version" ด้วย (version คือค่าที่ติดไปกับทุกบรรทัดราคา → ต้องชี้เนื้อหาเดียว)
+# - ไม่มีไฟล์ → DEFAULT_CONFIG (ค่าเดียวกับ pricing_model.json ที่ส่งมากับ repo)
+import copy
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from types import MappingProxyType
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+CONFIG_PATH = Path(os.getenv("PRICING_MODEL_FILE") or Path(__file__).parent / "pricing_model.json")
+
+PRICE_COLUMNS = {"priceR1", "priceR2", "priceW1", "priceW2", "priceP"}
+LEVEL_WEIGHT_SUM = 100.0      # น้ำหนัก LevelPrice รวมกัน = 100 (หารด้วยค่านี้ตายตัว)
+WEIGHT_TOLERANCE = 1e-6
+
+DEFAULT_CONFIG = {
+    "version": 2,
+    "price": {
+        # น้ำหนักของคะแนน (รวมกัน = 1)
+        "weights": {"qty": 0.3382, "e": 0.3971, "ship": 0.2647},
+        # E score = min(log1p(ยอดซื้อหมวดนั้น) / e_log_scale, 1)
+        "e_log_scale": 13.0,
+        # Tier → (คอลัมน์ราคาต่ำ, คอลัมน์ราคาสูง) ที่ใช้ interpolate
+        "interp_cols": {
+            "R2->R1": ["priceR1", "priceR2"],
+            "R1->W2": ["priceW2", "priceR1"],
+            "W2->W1": ["priceW1", "priceW2"],
+            "W1->P": ["priceP", "priceW1"],
+            "P->P": ["priceP", "priceP"],
+        },
+        "default_cols": ["priceR2", "priceR1"],
+    },
+    "level": {
+        # น้ำหนักของ LevelPrice (รวมกัน = 100)
+        "weights": {"accum_6m": 20.72, "frequency": 28.5, "tenure": 16.84, "gen_bus": 33.94},
+        "gen_bus_map": {"W": 0.15, "R": 0.27, "P": 0.21},
+        # คะแนนรวม → Tier: min <= score < max (ช่วงสุดท้ายรวม max) นอกช่วง / NaN → "Unknown"
+        "score_bands": [
+            {"min": 0, "max": 40, "tier": "R2->R1"},
+            {"min": 40, "max": 70, "tier": "R1->W2"},
+            {"min": 70, "max": 100, "tier": "W2->W1"},
+        ],
+    },
+    "payment_terms": {
+        # บวก markup ตามเครดิตของลูกค้าใน Price() (false = ราคาเท่ากันทุกเครดิต)
+        "enabled": True,
+        # จำนวนวันเครดิต → markup (สัดส่วน) วันที่ไม่มีในตาราง = 0
+        "markup": {"0": 0.0, "15": 0.003, "30": 0.006, "45": 0.009, "60": 0.012, "90": 0.015},
+        # ไม่มีตัวเลขในเงื่อนไขแต่มีคำเหล่านี้ → ถือเป็น 0 วัน
+        "cash_keywords": ["cash", "cod"],
+    },
+}
+
+
+def normalize_tier(raw) -> str:
+    return (
+        str(raw).replace("→", "->")
+            .replace("–", "-")
+            .replace("—", "-")
+            .replace(" ", "")
+            .replace("\n", "")
+            .replace("\r", "")
+            .strip()
+            .upper()
+    )
+
+
+# ============================
+# validate + compile
+# ============================
+def _number(errors: list, path: str, value, minimum=None, maximum=None):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        errors.append(f"{path}: ต้องเป็นตัวเลข (ได้ {value!r})")
+        return None
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        errors.append(f"{path}: ต้องอยู่ในช่วง [{minimum}, {maximum}] (ได้ {value})")
+        return None
+    return float(value)
+
+
+def _price_pair(errors: list, path: str, value):
+    if (not isinstance(value, (list, tuple)) or len(value) != 2
+            or any(not isinstance(c, str) or c not in PRICE_COLUMNS for c in value)):
+        errors.append(f"{path}: ต้องเป็น [คอลัมน์ต่ำ, คอลัมน์สูง] จาก {sorted(PRICE_COLUMNS)} (ได้ {value!r})")
+        return None
+    return (value[0], value[1])
+
+
+def _section(errors: list, parent: dict, key: str, path: str) -> dict:
+    # ไม่มี → {} (ฟิลด์ข้างในจะฟ้องเอง), มีแต่ไม่ใช่ object → ฟ้องแล้วตรวจต่อด้วย {}
+    value = parent.get(key)
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        errors.append(f"{path}: ต้องเป็น object (ได้ {value!r})")
+        return {}
+    return value
+
+
+def validate(config) -> list:
+    """คืนรายการปัญหา (list ว่าง = ใช้ได้)"""
+    errors = []
+    if not isinstance(config, dict):
+        return ["ไฟล์ต้องเป็น JSON object"]
+
+    version = config.get("version")
+    if isinstance(version, bool) or not isinstance(version, int) or version < 1:
+        errors.append(f"version: ต้องเป็นจำนวนเต็ม >= 1 (ได้ {version!r})")
+
+    price = _section(errors, config, "price", "price")
+    weights = _section(errors, price, "weights", "price.weights")
+    values = [_number(errors, f"price.weights.{k}", weights.get(k), 0, 1) for k in ("qty", "e", "ship")]
+    if None not in values and abs(sum(values) - 1.0) > WEIGHT_TOLERANCE:
+        errors.append(f"price.weights: รวมกันต้องเท่ากับ 1 (ได้ {sum(values)})")
+    scale = _number(errors, "price.e_log_scale", price.get("e_log_scale"), 0)
+    if scale == 0:
+        errors.append("price.e_log_scale: ต้องมากกว่า 0")
+    interp = price.get("interp_cols")
+    if not isinstance(interp, dict) or not interp:
+        errors.append("price.interp_cols: ต้องเป็น object {tier: [คอลัมน์ต่ำ, คอลัมน์สูง]}")
+        interp = {}
+    for tier, pair in interp.items():
+        _price_pair(errors, f"price.interp_cols.{tier}", pair)
+    _price_pair(errors, "price.default_cols", price.get("default_cols"))
+
+    level = _section(errors, config, "level", "level")
+    weights = _section(errors, level, "weights", "level.weights")
+    values = [_number(errors, f"level.weights.{k}", weights.get(k), 0, LEVEL_WEIGHT_SUM)
+              for k in ("accum_6m", "frequency", "tenure", "gen_bus")]
+    if None not in values and abs(sum(values) - LEVEL_WEIGHT_SUM) > WEIGHT_TOLERANCE:
+        errors.append(f"level.weights: รวมกันต้องเท่ากับ {LEVEL_WEIGHT_SUM:g} (ได้ {sum(values)})")
+    gen_bus = level.get("gen_bus_map")
+    if not isinstance(gen_bus, dict):
+        errors.append("level.gen_bus_map: ต้องเป็น object {Gen Bus: 0-1}")
+    else:
+        for code, value in gen_bus.items():
+            _number(errors, f"level.gen_bus_map.{code}", value, 0, 1)
+
+    bands = level.get("score_bands")
+    if not isinstance(bands, list) or not bands:
+        errors.append("level.score_bands: ต้องเป็น list ของ {min, max, tier}")
+        bands = []
+    interp_tiers = {normalize_tier(t) for t in interp}
+    prev_max = None
+    for i, band in enumerate(bands):
+        path = f"level.score_bands[{i}]"
+        if not isinstance(band, dict):
+            errors.append(f"{path}: ต้องเป็น object")
+            continue
+        lo = _number(errors, f"{path}.min", band.get("min"))
+        hi = _number(errors, f"{path}.max", band.get("max"))
+        if lo is not None and hi is not None:
+            if lo >= hi:
+                errors.append(f"{path}: min ต้องน้อยกว่า max")
+            if prev_max is not None and lo < prev_max:
+                errors.append(f"{path}: ช่วงต้องเรียงกันและไม่ซ้อนกัน")
+            prev_max = hi
+        if normalize_tier(band.get("tier")) not in interp_tiers:
+            errors.append(f"{path}.tier: {band.get('tier')!r} ไม่มีใน price.interp_cols")
+
+    terms = _section(errors, config, "payment_terms", "payment_terms")
+    if not isinstance(terms.get("enabled", False), bool):
+        errors.append("payment_terms.enabled: ต้องเป็น true / false")
+    markup = terms.get("markup")
+    if not isinstance(markup, dict):
+        errors.append("payment_terms.markup: ต้องเป็น object {วัน: สัดส่วน}")
+    else:
+        for days, pct in markup.items():
+            if not str(days).isdigit():
+                errors.append(f"payment_terms.markup.{days}: key ต้องเป็นจำนวนวัน (จำนวนเต็ม)")
+            _number(errors, f"payment_terms.markup.{days}", pct, 0, 1)
+    keywords = terms.get("cash_keywords", [])
+    if not isinstance(keywords, list) or not all(isinstance(k, str) and k.strip() for k in keywords):
+        errors.append("payment_terms.cash_keywords: ต้องเป็น list ของข้อความ")
+    return errors
+
+
+def _frozen(value):
+    """dict → MappingProxyType / list → tuple (ทั้งชั้นใน)"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _frozen(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_frozen(v) for v in value)
+    return value
+
+
+def _read_only(values: np.ndarray) -> np.ndarray:
+    values.setflags(write=False)
+    return values
+
+
+class PricingModel:
+    """snapshot ที่ compile แล้ว (สร้างจาก config ที่ผ่าน validate() เท่านั้น)"""
+
+    def __init__(self, config: dict, source: str, checksum: str):
+        self.config = _frozen(config)
+        self.version = config["version"]
+        self.source = source
+        self.checksum = checksum
+        self.loaded_at = time.time()
+
+        price = config["price"]
+        self.w_qty = float(price["weights"]["qty"])
+        self.w_e = float(price["weights"]["e"])
+        self.w_ship = float(price["weights"]["ship"])
+        self.e_log_scale = float(price["e_log_scale"])
+        # key ผ่าน normalize_tier แล้ว → lookup ด้วย normalize_tier(ค่า _Tier_Z) ได้ตรง ๆ
+        self.interp_cols = MappingProxyType({normalize_tier(t): tuple(pair) for t, pair in price["interp_cols"].items()})
+        self.default_cols = tuple(price["default_cols"])
+
+        level = config["level"]
+        self.w_accum6m = float(level["weights"]["accum_6m"])
+        self.w_freq = float(level["weights"]["frequency"])
+        self.w_tenure = float(level["weights"]["tenure"])
+        self.w_genbus = float(level["weights"]["gen_bus"])
+        self.gen_bus_map = MappingProxyType({str(k): float(v) for k, v in level["gen_bus_map"].items()})
+        bands = level["score_bands"]
+        self.band_min = _read_only(np.array([b["min"] for b in bands], dtype=np.float64))
+        self.band_max = _read_only(np.array([b["max"] for b in bands], dtype=np.float64))
+        self.band_tier = tuple(str(b["tier"]) for b in bands)
+
+        terms = config["payment_terms"]
+        self.markup_enabled = terms.get("enabled", False)
+        days = sorted((int(d), float(p)) for d, p in terms["markup"].items())
+        self.markup_days = _read_only(np.array([d for d, _ in days], dtype=np.int64))
+        self.markup_pct = _read_only(np.array([p for _, p in days], dtype=np.float64))
+        self.markup_by_days = MappingProxyType(dict(days))
+        self.cash_keywords = tuple(k.strip().lower() for k in terms.get("cash_keywords", []))
+
+    def tier_columns(self, tier) -> tuple:
+        return self.interp_cols.get(normalize_tier(tier), self.default_cols)
+
+    def score_to_tier(self, scores) -> np.ndarray:
+        """คะแนนรวม (0-100) → ชื่อ Tier ทั้งคอลัมน์ (object array); NaN / นอกช่วง → "Unknown" """
+        s = np.asarray(scores, dtype=np.float64)
+        out = np.full(s.shape, "Unknown", dtype=object)
+        last = len(self.band_tier) - 1
+        with np.errstate(invalid="ignore"):
+            for i, tier in enumerate(self.band_tier):
+                upper = s <= self.band_max[i] if i == last else s < self.band_max[i]
+                out[(s >= self.band_min[i]) & upper] = tier
+        return out
+
+    def info(self) -> dict:
+        return {"version": self.version, "source": self.source, "checksum": self.checksum,
+                "loaded_at": self.loaded_at}
+
+
+def compile_config(config: dict, source: str) -> PricingModel:
+    errors = validate(config)
+    if errors:
+        raise ValueError("; ".join(errors))
+    checksum = hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:12]
+    return PricingModel(copy.deepcopy(config), source, checksum)
+
+
+# ============================
+# snapshot ปัจจุบัน + hot reload
+# ============================
+class _ModelState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.model: PricingModel | None = None
+        self.mtime = -1          # mtime ของไฟล์ที่เช็คล่าสุด (None = ไม่มีไฟล์, -1 = ยังไม่เคยโหลด)
+        self.error = None        # ปัญหาของไฟล์ล่าสุดที่ไม่ได้ใช้ (None = ใช้ไฟล์ล่าสุดได้)
+        self.stats = {"loads": 0, "rejected": 0}
+
+
+_state = _ModelState()
+
+
+def _file_mtime():
+    try:
+        return CONFIG_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _read(mtime) -> PricingModel:
+    if mtime is None:
+        return compile_config(DEFAULT_CONFIG, "default")
+    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    return compile_config(config, str(CONFIG_PATH))
+
+
+def load(force: bool = False) -> PricingModel:
+    """โหลดไฟล์ใหม่เมื่อ mtime เปลี่ยน (หรือ force) — ไม่ผ่าน validate → คืน snapshot เดิม"""
+    mtime = _file_mtime()
+    if not force and mtime == _state.mtime and _state.model is not None:
+        return _state.model
+
+    with _state.lock:
+        if not force and mtime == _state.mtime and _state.model is not None:
+            return _state.model
+        old = _state.model
+        try:
+            model = _read(mtime)
+            if old is not None and model.version == old.version and model.checksum != old.checksum:
+                raise ValueError(f"เนื้อหาเปลี่ยนแต่ version ยังเป็น {old.version} — ต้องเปลี่ยน version ด้วย")
+        except (OSError, ValueError) as e:
+            # จำ mtime หลังบันทึกว่าไฟล์นี้ถูกปฏิเสธแล้วเท่านั้น (ไม่ตรวจซ้ำทุก request แต่ไม่หายเงียบ)
+            _state.mtime = mtime
+            _state.error = str(e)
+            _state.stats["rejected"] += 1
+            if old is None:
+                # ยังไม่เคยมี snapshot (ไฟล์เสียตั้งแต่ start) → ใช้ค่า default ไปก่อน
+                _state.model = compile_config(DEFAULT_CONFIG, "default")
+            log.error("pricing model rejected, keeping previous version",
+                      extra={"path": str(CONFIG_PATH), "error": _state.error, "version": _state.model.version})
+            return _state.model
+
+        _state.mtime = mtime
+        _state.error = None
+        if old is None or model.checksum != old.checksum:
+            _state.model = model
+            _state.stats["loads"] += 1
+            log.info("pricing model loaded", extra=model.info())
+        return _state.model
+
+
+def current() -> PricingModel:
+    return load()
+
+
+def reload() -> dict:
+    """hook: โหลดไฟล์ใหม่ทันที → ValueError ถ้าไฟล์ไม่ผ่าน (snapshot เดิมยังใช้ต่อ)"""
+    load(force=True)
+    if _state.error:
+        raise ValueError(_state.error)
+    return status()
+
+
+def status() -> dict:
+    model = _state.model
+    return {
+        **(model.info() if model else {"version": 0}),
+        "path": str(CONFIG_PATH),
+        "error": _state.error,
+        **_state.stats,
+    }
@@ -1,14 +1,27 @@
+import json
+import logging
 import pandas as pd
 import numpy as np
 from fastapi import APIRouter, HTTPException, Body
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from datetime import datetime
+from types import MappingProxyType
 from typing import List, Dict, Any
 
-from LevelPrice import LevelPrice
+import cart_sessions
+import catalog
+import payment_terms
+import pricing_model
+import quote_cache
+from LevelPrice import LevelPrice, stats_version
 from price import Price
 from items import load_items_sqlite
+from customer_tier import get_customer_tier
 
 router = APIRouter(prefix="/api/pricing", tags=["pricing"])
+log = logging.getLogger(__name__)
 
 
 # -------------------------------
@@ -25,6 +38,8 @@ class PricingRequest(BaseModel):
     customerData: Dict[str, Any]
     deliveryType: str
     cart: List[CartItem]
+    # True → แต่ละบรรทัดมี _BasePrice / _PaymentTermDays / _PaymentTermMarkup (ราคาก่อน-หลัง markup เครดิต)
+    markupBreakdown: bool = False
 
 
 # -------------------------------
@@ -42,35 +57,33 @@ def _get_relevant_sales(row):
 
 
 # -------------------------------
-#  SAFE DEBUG
+#  SAFE DEBUG (ปิด debug → ไม่แตะ DataFrame เลย)
 # -------------------------------
-def _safe_print_df(df, cols, title):
+def _debug_df(df, cols, title):
+    if not log.isEnabledFor(logging.DEBUG):
+        return
     try:
-        print("\n=== " + title)
         existing = [c for c in cols if c in df.columns]
-        print(df[existing].head().to_string(index=False))
-        print("===")
+        log.debug(title, extra={"rows": len(df), "head": df[existing].head().to_dict("records")})
     except Exception:
         pass
 
 
 # -------------------------------
-#  MAIN ENDPOINT
+#  CART → DataFrame (ใช้ร่วมกันทั้ง /calculate และ /calculate-batch)
 # -------------------------------
-@router.post("/calculate")
-async def calculate_pricing(req: PricingRequest = Body(...)):
-
-    # No items
-    if not req.cart:
-        return {"items": [], "subtotal": 0, "customer_tier": "N/A"}
-
-    # Load Items DB
-    df_items = load_items_sqlite()
-    if df_items.empty:
-        raise HTTPException(500, "ไม่สามารถโหลด Items_Test")
+def _build_cart_frame(jobs: List[PricingRequest], df_items: pd.DataFrame) -> pd.DataFrame:
+    """
+    รวมตะกร้าของหลาย job เป็น DataFrame เดียว (คอลัมน์ _job = index ของ job ใน list)
+    ⚠️ ทุก job ต้องมี key ของ customerData ชุดเดียวกัน (คอลัมน์ต้องเหมือนกับกรณีเรียกทีละ job)
+    """
+    job_sizes = [len(job.cart) for job in jobs]
+    job_idx = np.repeat(np.arange(len(jobs)), job_sizes)
 
     # Cart → DataFrame
-    df_calc = pd.DataFrame([item.model_dump() for item in req.cart])
+    df_calc = pd.DataFrame([item.model_dump() for job in jobs for item in job.cart])
+    df_calc["_job"] = job_idx
+    df_calc["_line"] = np.arange(len(df_calc))     # บรรทัดใน cart (หลัง merge แถวอาจซ้ำ ถ้า sku ซ้ำใน Items_Test)
 
     # Ensure correct types
     df_calc["qty"] = pd.to_numeric(df_calc["qty"], errors="coerce").fillna(0)
@@ -79,8 +92,13 @@ async def calculate_pricing(req: PricingRequest = Body(...)):
     df_calc["category"] = df_calc.get("category") or df_calc["sku"].apply(lambda x: str(x)[0].upper())
 
     # Attach customer data
-    for k, v in req.customerData.items():
-        df_calc[k] = v
+    if len(jobs) == 1:
+        for k, v in jobs[0].customerData.items():
+            df_calc[k] = v
+    else:
+        for k in jobs[0].customerData:
+            values = pd.Series([job.customerData[k] for job in jobs])
+            df_calc[k] = values.to_numpy()[job_idx]
 
     # Merge item data
     merge_cols = [
@@ -106,83 +124,138 @@ async def calculate_pricing(req: PricingRequest = Body(...)):
     df_calc["Quantity"] = df_calc.apply(_compute_real_qty, axis=1)
 
     # DeliveryType
-    df_calc["DeliveryType"] = "1" if req.deliveryType.upper() == "PICKUP" else "0"
+    pickup = np.array(["1" if job.deliveryType.upper() == "PICKUP" else "0" for job in jobs], dtype=object)
+    df_calc["DeliveryType"] = pickup[df_calc["_job"].to_numpy()]
 
     # Relevant sales (E score)
     df_calc["_RelevantSales"] = df_calc.apply(_get_relevant_sales, axis=1)
 
+    return df_calc
 
-    # -------------------------------------------------------------
-    # DEFAULT MODE: ถ้าไม่มีรหัสลูกค้า → ใช้ Tier = R2 (ราคาขายหน้าร้าน)
-    # -------------------------------------------------------------
-    customer_code = str(req.customerData.get("code") or "").strip()
 
-    if not customer_code:
-        print("\n>>> DEFAULT PRICE MODE: NO CUSTOMER CODE → USE R2\n")
+def _attach_tiers(df_calc: pd.DataFrame, codes: List[str], model: pricing_model.PricingModel | None = None) -> pd.DataFrame:
+    """
+    เติม Score/Tier ของลูกค้าให้ทุกแถว (codes[i] = รหัสลูกค้าของ job i)
+    รหัสที่อยู่ในตาราง customer_tier → lookup, ไม่พบ → คำนวณ LevelPrice จาก customerData เหมือนเดิม
+    """
+    tiers = [get_customer_tier(code) for code in codes]
+    if len(codes) == 1:
+        return df_calc.assign(**tiers[0]) if tiers[0] is not None else LevelPrice(df_calc, model)
 
-        # Tier_Z = 0 means R2
-        df_calc["_Tier_Z"] = 0
+    job = df_calc["_job"].to_numpy()
+    known = np.array([t is not None for t in tiers])[job]
 
-        # ใช้ราคา R2 โดยตรง
-        df_calc["NewPrice"] = pd.to_numeric(df_calc["priceR2"], errors="coerce").fillna(0)
+    parts = []
+    if known.any():
+        df_known = df_calc[known]
+        job_known = job[known]
+        cols = {
+            col: pd.Series([t[col] if t is not None else None for t in tiers]).to_numpy()[job_known]
+            for col in next(t for t in tiers if t is not None)
+        }
+        parts.append(df_known.assign(**cols))
+    if not known.all():
+        parts.append(LevelPrice(df_calc[~known], model))
 
-        # คำนวณจำนวนเงิน
-        df_calc["LineTotal"] = df_calc["NewPrice"] * df_calc["Quantity"]
+    return pd.concat(parts).sort_index()
 
-        subtotal = float(df_calc["LineTotal"].sum())
-        vat = float(round(subtotal * 0.07, 2))
-        product_total = float(round(subtotal + vat, 2))
 
-        shipping_customer_pay = float(req.customerData.get("shippingCustomerPay", 0) or 0)
-        total_final = float(round(product_total + shipping_customer_pay, 2))
+def _column_or_none(df: pd.DataFrame, col: str) -> list:
+    # เทียบเท่า row.get(col) ตอนวน iterrows (ไม่มีคอลัมน์ → None)
+    return df[col].tolist() if col in df.columns else [None] * len(df)
 
-        results = [
-            {
-                "sku": row["sku"],
-                "name": row.get("name"),
-                "qty": row["Quantity"],
-                "NewPrice": row["NewPrice"],
-                "_LineTotal": row["LineTotal"],
-                "_Tier_Z": 0,  # R2
-            }
-            for _, row in df_calc.iterrows()
-        ]
-
-        return {
-            "items": results,
-            "totals": {
-                "subtotal": subtotal,
-                "vat": vat,
-                "product_total": product_total,
-                "shippingCustomerPay": shipping_customer_pay,
-                "total": total_final,
-                "profit": 0,
-            },
-            "customer_tier": "R2",
+
+def _default_prices(df_calc: pd.DataFrame, model_version: int) -> pd.DataFrame:
+    """ไม่มีรหัสลูกค้า → Tier = R2 (ราคาขายหน้าร้าน)"""
+    df_calc = df_calc.copy()
+
+    # Tier_Z = 0 means R2
+    df_calc["_Tier_Z"] = 0
+
+    # ใช้ราคา R2 โดยตรง
+    df_calc["NewPrice"] = pd.to_numeric(df_calc["priceR2"], errors="coerce").fillna(0)
+    df_calc["_ModelVersion"] = model_version
+    return df_calc
+
+
+def _default_response(df_calc: pd.DataFrame, customer_data: Dict[str, Any], model_version: int) -> dict:
+    df_calc = _default_prices(df_calc, model_version)
+
+    # คำนวณจำนวนเงิน
+    df_calc["LineTotal"] = df_calc["NewPrice"] * df_calc["Quantity"]
+
+    subtotal = float(df_calc["LineTotal"].sum())
+    vat = float(round(subtotal * 0.07, 2))
+    product_total = float(round(subtotal + vat, 2))
+
+    shipping_customer_pay = float(customer_data.get("shippingCustomerPay", 0) or 0)
+    total_final = float(round(product_total + shipping_customer_pay, 2))
+
+    results = [
+        {
+            "sku": sku,
+            "name": name,
+            "qty": qty,
+            "NewPrice": new_price,
+            "_LineTotal": line_total,
+            "_Tier_Z": 0,  # R2
+            "_ModelVersion": model_version,
         }
+        for sku, name, qty, new_price, line_total in zip(
+            df_calc["sku"].tolist(),
+            _column_or_none(df_calc, "name"),
+            df_calc["Quantity"].tolist(),
+            df_calc["NewPrice"].tolist(),
+            df_calc["LineTotal"].tolist(),
+        )
+    ]
+
+    return {
+        "items": results,
+        "totals": {
+            "subtotal": subtotal,
+            "vat": vat,
+            "product_total": product_total,
+            "shippingCustomerPay": shipping_customer_pay,
+            "total": total_final,
+            "profit": 0,
+        },
+        "customer_tier": "R2",
+    }
 
 
-    # -------------------------------------------------------------
-    # NORMAL FLOW (มี customer code → คำนวณด้วย LevelPrice, Price)
-    # -------------------------------------------------------------
+def _breakdown_fields(base, days, pct) -> dict:
+    # days เป็น NaN เมื่อไม่รู้จำนวนวันของเงื่อนไขเครดิต
+    return {
+        "_BasePrice": base,
+        "_PaymentTermDays": None if days is None or days != days else int(days),
+        "_PaymentTermMarkup": pct,
+    }
 
-    _safe_print_df(df_calc,
-                   ["sku", "name", "Quantity", "priceR1", "priceR2", "category"],
-                   "AFTER MERGE ITEM DATA")
 
-    # Run LevelPrice
-    df_lp = LevelPrice(df_calc)
-    _safe_print_df(df_lp, ["sku", "_Tier_Z", "_Score_Z"], "AFTER LEVEL PRICE")
+def _markup_breakdown(df_price: pd.DataFrame) -> List[dict]:
+    """ราคาก่อน markup เครดิต + วัน + สัดส่วน markup ต่อบรรทัด (ปิด markup ใน pricing_model → markup 0)"""
+    if "_PaymentTermMarkup" not in df_price.columns:
+        return [_breakdown_fields(p, None, 0.0) for p in df_price["NewPrice"].tolist()]
+    return [
+        _breakdown_fields(base, days, pct)
+        for base, days, pct in zip(
+            df_price["_BasePrice"].tolist(),
+            df_price["_PaymentTermDays"].tolist(),
+            df_price["_PaymentTermMarkup"].tolist(),
+        )
+    ]
 
-    # Run Price()
-    df_price = Price(df_lp)
-    _safe_print_df(df_price, ["sku", "NewPrice", "_LineTotal"], "AFTER PRICE CALC")
+
+def _priced_response(df_price: pd.DataFrame, customer_data: Dict[str, Any], breakdown: bool = False) -> dict:
+    """สรุปผลหลังผ่าน Price() ของ job เดียว"""
+    df_price = df_price.copy()
 
     # Prepare return values
     subtotal = float((df_price["NewPrice"] * df_price["Quantity"]).sum())
     vat = float(round(subtotal * 0.07, 2))
     product_total = float(round(subtotal + vat, 2))
-    shipping_customer_pay = float(req.customerData.get("shippingCustomerPay", 0) or 0)
+    shipping_customer_pay = float(customer_data.get("shippingCustomerPay", 0) or 0)
     total_final = float(round(product_total + shipping_customer_pay, 2))
 
     # Profit
@@ -192,26 +265,463 @@ async def calculate_pricing(req: PricingRequest = Body(...)):
     else:
         profit = 0
 
-    results = []
-    for _, row in df_price.iterrows():
-        results.append({
-            "sku": row["sku"],
-            "name": row.get("name"),
-            "qty": row["Quantity"],
-            "NewPrice": row["NewPrice"],
-            "_LineTotal": row["NewPrice"] * row["Quantity"],
-            "_Tier_Z": row["_Tier_Z"],
-        })
+    results = [
+        {
+            "sku": sku,
+            "name": name,
+            "qty": qty,
+            "NewPrice": new_price,
+            "_LineTotal": new_price * qty,
+            "_Tier_Z": tier,
+            "_ModelVersion": model_version,
+        }
+        for sku, name, qty, new_price, tier, model_version in zip(
+            df_price["sku"].tolist(),
+            _column_or_none(df_price, "name"),
+            df_price["Quantity"].tolist(),
+            df_price["NewPrice"].tolist(),
+            df_price["_Tier_Z"].tolist(),
+            df_price["_ModelVersion"].tolist(),
+        )
+    ]
+
+    totals = {
+        "subtotal": subtotal,
+        "vat": vat,
+        "product_total": product_total,
+        "shippingCustomerPay": shipping_customer_pay,
+        "total": total_final,
+        "profit": profit,
+    }
+
+    if breakdown:
+        for line, extra in zip(results, _markup_breakdown(df_price)):
+            line.update(extra)
+        # ส่วนที่บวกเพิ่มจากเครดิตทั้งตะกร้า (ก่อน VAT)
+        totals["payment_term_markup"] = float(round(
+            sum((line["NewPrice"] - line["_BasePrice"]) * line["qty"] for line in results), 2
+        ))
 
     return {
         "items": results,
-        "totals": {
-            "subtotal": subtotal,
-            "vat": vat,
-            "product_total": product_total,
-            "shippingCustomerPay": shipping_customer_pay,
-            "total": total_final,
-            "profit": profit,
-        },
+        "totals": totals,
         "customer_tier": results[0]["_Tier_Z"] if results else "N/A",
     }
+
+
+def _price_cart(job: PricingRequest, customer_code: str, df_items: pd.DataFrame,
+                model: pricing_model.PricingModel) -> pd.DataFrame:
+    df_calc = _build_cart_frame([job], df_items)
+    _debug_df(df_calc,
+                   ["sku", "name", "Quantity", "priceR1", "priceR2", "category"],
+                   "AFTER MERGE ITEM DATA")
+
+    # Tier ลูกค้า: lookup จากตารางที่คำนวณไว้แล้ว
+    # (ไม่พบรหัสในตาราง Customer → คำนวณ LevelPrice จาก customerData เหมือนเดิม)
+    df_lp = _attach_tiers(df_calc, [customer_code], model)
+    _debug_df(df_lp, ["sku", "_Tier_Z", "_Score_Z"], "AFTER LEVEL PRICE")
+
+    # Run Price()
+    df_price = Price(df_lp, model)
+    _debug_df(df_price, ["sku", "NewPrice", "_LineTotal"], "AFTER PRICE CALC")
+    return df_price
+
+
+# คอลัมน์ที่ _priced_response ใช้ → เก็บใน quote_cache ต่อบรรทัด
+CACHED_COLS = [
+    "sku", "name", "Quantity", "NewPrice", "_Tier_Z", "_ModelVersion", "cost",
+    "_BasePrice", "_PaymentTermDays", "_PaymentTermMarkup",
+]
+
+
+def _quote_generation(model: pricing_model.PricingModel) -> tuple:
+    # ข้อมูลที่ผลราคาทุกบรรทัดขึ้นอยู่ด้วย — เปลี่ยนเมื่อไหร่ผลเก่าใช้ไม่ได้ทั้งหมด
+    # (อ่านก่อนโหลด Items_Test → ถ้า catalog เปลี่ยนระหว่างนี้ ผลที่เก็บจะอยู่ใน generation เก่า ถูกล้างทิ้ง)
+    return (catalog.catalog_version(), model.version, stats_version(), datetime.now().year)
+
+
+def _line_rows(df: pd.DataFrame, cols: List[str], n_lines: int) -> List[tuple]:
+    """แยกแถว (หลัง merge Items_Test แถวอาจซ้ำ) กลับเป็นบรรทัดของ cart ตามคอลัมน์ _line
+    แถวเป็น MappingProxyType (อ่านอย่างเดียว) — แชร์ระหว่าง request ผ่าน quote_cache / cart_sessions"""
+    lines = [[] for _ in range(n_lines)]
+    values = zip(*(df[c].tolist() for c in cols))
+    for line, row in zip(df["_line"].tolist(), values):
+        lines[line].append(MappingProxyType(dict(zip(cols, row))))
+    return [tuple(rows) for rows in lines]
+
+
+def _priced_lines(job: PricingRequest, customer_code: str,
+                  model: pricing_model.PricingModel, generation: tuple) -> List[tuple]:
+    """rows ของแต่ละบรรทัดใน job.cart — คำนวณเฉพาะบรรทัดที่ไม่มีใน quote_cache"""
+    customer = quote_cache.customer_key(job.customerData, get_customer_tier(customer_code))
+    pickup = job.deliveryType.upper() == "PICKUP"
+    keys = [(customer, pickup, item.sku, item.name, item.qty, item.price) for item in job.cart]
+
+    lines = quote_cache.get_many(generation, keys)
+    missing = [i for i, rows in enumerate(lines) if rows is None]
+    if missing:
+        df_price = _price_cart(job.model_copy(update={"cart": [job.cart[i] for i in missing]}),
+                               customer_code, load_items_sqlite(), model)
+        fresh = _line_rows(df_price, [c for c in CACHED_COLS if c in df_price.columns], len(missing))
+        for j, i in enumerate(missing):
+            lines[i] = fresh[j]
+        quote_cache.put_many(generation, [(keys[i], lines[i]) for i in missing])
+    return lines
+
+
+def _price_cart_cached(job: PricingRequest, customer_code: str,
+                       model: pricing_model.PricingModel) -> pd.DataFrame:
+    """เหมือน _price_cart แต่คำนวณเฉพาะบรรทัดที่ไม่มีใน quote_cache"""
+    lines = _priced_lines(job, customer_code, model, _quote_generation(model))
+
+    # (ชุดคอลัมน์เท่ากันทุกบรรทัดใน generation เดียวกัน — ขึ้นกับ Items_Test และ pricing model เท่านั้น)
+    rows = [row for line_rows in lines for row in line_rows]
+    return pd.DataFrame({col: [row[col] for row in rows] for col in rows[0]})
+
+
+def _customer_code(job: PricingRequest) -> str:
+    return str(job.customerData.get("code") or "").strip()
+
+
+EMPTY_CART_RESPONSE = {"items": [], "subtotal": 0, "customer_tier": "N/A"}
+
+
+# -------------------------------
+#  MAIN ENDPOINT
+# -------------------------------
+@router.post("/calculate")
+async def calculate_pricing(req: PricingRequest = Body(...)):
+
+    # No items
+    if not req.cart:
+        return dict(EMPTY_CART_RESPONSE)
+
+    # Load Items DB
+    df_items = load_items_sqlite()
+    if df_items.empty:
+        raise HTTPException(500, "ไม่สามารถโหลด Items_Test")
+
+    # โมเดลราคาตัวเดียวทั้ง request (สลับ version ระหว่างทางไม่กระทบ) → เลข version ติดทุกบรรทัด
+    model = pricing_model.current()
+
+    # -------------------------------------------------------------
+    # DEFAULT MODE: ถ้าไม่มีรหัสลูกค้า → ใช้ Tier = R2 (ราคาขายหน้าร้าน)
+    # -------------------------------------------------------------
+    customer_code = _customer_code(req)
+
+    if not customer_code:
+        log.debug("default price mode: no customer code → R2")
+        return _default_response(_build_cart_frame([req], df_items), req.customerData, model.version)
+
+
+    # -------------------------------------------------------------
+    # NORMAL FLOW (มี customer code → คำนวณด้วย LevelPrice, Price)
+    # บรรทัดที่เคยคำนวณแล้ว (ลูกค้า / sku / qty / ขนส่ง เดิม) ใช้ผลจาก quote_cache
+    # -------------------------------------------------------------
+    if quote_cache.enabled():
+        df_price = _price_cart_cached(req, customer_code, model)
+    else:
+        df_price = _price_cart(req, customer_code, df_items, model)
+
+    return _priced_response(df_price, req.customerData, req.markupBreakdown)
+
+
+# -------------------------------
+#  BATCH ENDPOINT (NDJSON)
+# -------------------------------
+# ใช้กับงาน re-quote ทีละมาก ๆ: แต่ละบรรทัดของผลลัพธ์ = {"index": i, "result": <ผลแบบเดียวกับ /calculate>}
+# หรือ {"index": i, "error": "..."} ถ้า job นั้นคำนวณไม่ได้ (job อื่นยังได้ผลตามปกติ)
+BATCH_CHUNK_SIZE = 500     # จำนวน job ต่อรอบ vectorize (คุมหน่วยความจำ + เริ่มส่งผลได้เร็ว)
+
+
+class PricingBatchRequest(BaseModel):
+    jobs: List[PricingRequest]
+
+
+def _price_jobs(jobs: List[PricingRequest], df_items: pd.DataFrame,
+                model: pricing_model.PricingModel | None = None) -> List[dict]:
+    """คำนวณหลาย job พร้อมกัน คืนผลเรียงตามลำดับ jobs"""
+    model = model or pricing_model.current()
+    results: List[dict | None] = [None] * len(jobs)
+
+    # job ที่ customerData มี key ต่างกันจะได้คอลัมน์ต่างกัน → แยกกลุ่มตามชุด key
+    groups: Dict[tuple, List[int]] = {}
+    for i, job in enumerate(jobs):
+        if not job.cart:
+            results[i] = dict(EMPTY_CART_RESPONSE)
+            continue
+        groups.setdefault(tuple(job.customerData), []).append(i)
+
+    for idx in groups.values():
+        group = [jobs[i] for i in idx]
+        df_calc = _build_cart_frame(group, df_items)
+        codes = [_customer_code(job) for job in group]
+
+        priced = [j for j, code in enumerate(codes) if code]
+        df_price = None
+        if priced:
+            df_lp = _attach_tiers(
+                df_calc[df_calc["_job"].isin(priced)],
+                codes,
+                model,
+            )
+            df_price = Price(df_lp, model)
+
+        frames = dict(tuple(df_calc.groupby("_job", sort=False)))
+        priced_frames = dict(tuple(df_price.groupby("_job", sort=False))) if df_price is not None else {}
+        for j, job in enumerate(group):
+            if codes[j]:
+                results[idx[j]] = _priced_response(priced_frames[j], job.customerData, job.markupBreakdown)
+            else:
+                results[idx[j]] = _default_response(frames[j], job.customerData, model.version)
+
+    return results
+
+
+def _ndjson_line(index: int, result: dict) -> str:
+    # serialize แบบเดียวกับ JSONResponse ของ FastAPI (NaN/inf → error เหมือน /calculate ที่ตอบ 500)
+    try:
+        body = {"index": index, "result": jsonable_encoder(result)}
+        return json.dumps(body, ensure_ascii=False, allow_nan=False, separators=(",", ":")) + "\n"
+    except ValueError as e:
+        return json.dumps({"index": index, "error": str(e)}, ensure_ascii=False) + "\n"
+
+
+@router.post("/calculate-batch")
+def calculate_pricing_batch(req: PricingBatchRequest = Body(...)):
+    # Load Items DB (ครั้งเดียวทั้ง batch)
+    df_items = load_items_sqlite()
+    if df_items.empty:
+        raise HTTPException(500, "ไม่สามารถโหลด Items_Test")
+
+    # ทั้ง batch ใช้โมเดลราคา version เดียวกัน
+    model = pricing_model.current()
+
+    def _stream():
+        for start in range(0, len(req.jobs), BATCH_CHUNK_SIZE):
+            chunk = req.jobs[start:start + BATCH_CHUNK_SIZE]
+            try:
+                results = _price_jobs(chunk, df_items, model)
+            except Exception:
+                # ทั้ง chunk พัง → คำนวณทีละ job เพื่อหาว่า job ไหนมีปัญหา
+                log.warning("batch pricing chunk failed, retrying job by job", exc_info=True,
+                            extra={"chunk_start": start, "chunk_size": len(chunk)})
+                results = []
+                for job in chunk:
+                    try:
+                        results.append(_price_jobs([job], df_items, model)[0])
+                    except Exception as job_err:
+                        results.append(job_err)
+
+            for offset, result in enumerate(results):
+                if isinstance(result, Exception):
+                    yield json.dumps({"index": start + offset, "error": str(result)}, ensure_ascii=False) + "\n"
+                else:
+                    yield _ndjson_line(start + offset, result)
+
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
+
+
+# -------------------------------
+#  CART SESSIONS (ตะกร้าที่ server จำไว้)
+# -------------------------------
+# POST /carts (ตะกร้าเริ่มต้น แบบเดียวกับ /calculate) → แก้ทีละบรรทัดด้วย cart_id / line_id
+# แต่ละครั้งคำนวณเฉพาะบรรทัดที่แก้ (LevelPrice / Price ไม่รันทั้งตะกร้าใหม่) + รวม totals จากยอดต่อบรรทัดที่เก็บไว้
+# ผลลัพธ์: items ของบรรทัดที่แก้ + totals ทั้งตะกร้า ("repriced": true → items คือทั้งตะกร้า
+# เพราะต้องคำนวณใหม่ทั้งหมด เช่น เปลี่ยนวิธีรับสินค้า หรือราคา / pricing model ถูก reload)
+class CartQtyRequest(BaseModel):
+    qty: float
+
+
+class CartDeliveryRequest(BaseModel):
+    deliveryType: str
+
+
+def _session_lines(session: cart_sessions.CartSession, items: List[CartItem],
+                   model: pricing_model.PricingModel, generation: tuple) -> List[tuple]:
+    if not items:
+        return []
+    job = PricingRequest(customerData=session.customer_data, deliveryType=session.delivery_type, cart=items)
+    if session.customer_code:
+        return _priced_lines(job, session.customer_code, model, generation)
+    df_calc = _default_prices(_build_cart_frame([job], load_items_sqlite()), model.version)
+    cols = ["sku", "name", "Quantity", "NewPrice", "_Tier_Z", "_ModelVersion"]
+    return _line_rows(df_calc, [c for c in cols if c in df_calc.columns], len(items))
+
+
+def _session_items(session: cart_sessions.CartSession, line_ids) -> List[dict]:
+    # รูปแบบเดียวกับ items ของ /calculate + line_id
+    breakdown = session.breakdown and bool(session.customer_code)
+    items = []
+    for line_id in line_ids:
+        for row in session.lines[line_id][1]:
+            item = {
+                "line_id": line_id,
+                "sku": row["sku"],
+                "name": row.get("name"),
+                "qty": row["Quantity"],
+                "NewPrice": row["NewPrice"],
+                "_LineTotal": row["NewPrice"] * row["Quantity"],
+                "_Tier_Z": row["_Tier_Z"],
+                "_ModelVersion": row["_ModelVersion"],
+            }
+            if breakdown:
+                item.update(_breakdown_fields(
+                    row.get("_BasePrice", row["NewPrice"]),
+                    row.get("_PaymentTermDays"),
+                    row.get("_PaymentTermMarkup", 0.0),
+                ))
+            items.append(item)
+    return items
+
+
+def _cart_response(session: cart_sessions.CartSession, line_ids, repriced: bool) -> dict:
+    return {
+        "cart_id": session.id,
+        "deliveryType": session.delivery_type,
+        "lines": len(session.lines),
+        "repriced": repriced,
+        "items": _session_items(session, list(session.lines) if repriced else line_ids),
+        "totals": session.totals(),
+        "customer_tier": session.customer_tier(),
+    }
+
+
+def _refresh_session(session: cart_sessions.CartSession, model: pricing_model.PricingModel) -> tuple:
+    """(generation ปัจจุบัน, คำนวณใหม่ทั้งตะกร้าหรือไม่) — ราคา / model เปลี่ยนตั้งแต่ครั้งก่อน → คำนวณใหม่ทุกบรรทัด"""
+    generation = _quote_generation(model)
+    if generation == session.generation:
+        return generation, False
+    session.reload_lines(generation, _session_lines(session, session.items(), model, generation))
+    return generation, True
+
+
+def _get_session(cart_id: str) -> cart_sessions.CartSession:
+    session = cart_sessions.get(cart_id)
+    if session is None:
+        raise HTTPException(404, "ไม่พบตะกร้า (หมดอายุหรือถูกลบแล้ว)")
+    return session
+
+
+def _check_line(session: cart_sessions.CartSession, line_id: int):
+    if line_id not in session.lines:
+        raise HTTPException(404, f"ไม่พบบรรทัด {line_id} ในตะกร้า")
+
+
+def _check_size(n_lines: int):
+    if n_lines > cart_sessions.MAX_LINES:
+        raise HTTPException(422, f"ตะกร้ามีได้ไม่เกิน {cart_sessions.MAX_LINES} บรรทัด")
+
+
+@router.post("/carts")
+def create_cart(req: PricingRequest = Body(...)):
+    _check_size(len(req.cart))
+    if load_items_sqlite().empty:
+        raise HTTPException(500, "ไม่สามารถโหลด Items_Test")
+
+    session = cart_sessions.CartSession(req.customerData, _customer_code(req), req.deliveryType, req.markupBreakdown)
+    model = pricing_model.current()
+    generation = _quote_generation(model)
+    session.reload_lines(generation, [])
+    for item, rows in zip(req.cart, _session_lines(session, req.cart, model, generation)):
+        session.put_line(session.next_line, item, rows)
+        session.next_line += 1
+    cart_sessions.add(session)
+    return _cart_response(session, None, repriced=True)
+
+
+@router.get("/carts/{cart_id}")
+def get_cart(cart_id: str):
+    session = _get_session(cart_id)
+    with session.lock:
+        _refresh_session(session, pricing_model.current())
+        return _cart_response(session, None, repriced=True)
+
+
+@router.delete("/carts/{cart_id}")
+def delete_cart(cart_id: str):
+    if not cart_sessions.remove(cart_id):
+        raise HTTPException(404, "ไม่พบตะกร้า (หมดอายุหรือถูกลบแล้ว)")
+    return {"cart_id": cart_id, "deleted": True}
+
+
+@router.post("/carts/{cart_id}/lines")
+def add_cart_line(cart_id: str, item: CartItem = Body(...)):
+    session = _get_session(cart_id)
+    with session.lock:
+        _check_size(len(session.lines) + 1)
+        model = pricing_model.current()
+        generation, repriced = _refresh_session(session, model)
+        line_id = session.next_line
+        session.next_line += 1
+        session.put_line(line_id, item, _session_lines(session, [item], model, generation)[0])
+        return _cart_response(session, [line_id], repriced)
+
+
+@router.patch("/carts/{cart_id}/lines/{line_id}")
+def update_cart_line(cart_id: str, line_id: int, req: CartQtyRequest = Body(...)):
+    session = _get_session(cart_id)
+    with session.lock:
+        _check_line(session, line_id)
+        model = pricing_model.current()
+        generation, repriced = _refresh_session(session, model)
+        item = session.lines[line_id][0].model_copy(update={"qty": req.qty})
+        session.put_line(line_id, item, _session_lines(session, [item], model, generation)[0])
+        return _cart_response(session, [line_id], repriced)
+
+
+@router.delete("/carts/{cart_id}/lines/{line_id}")
+def remove_cart_line(cart_id: str, line_id: int):
+    session = _get_session(cart_id)
+    with session.lock:
+        _check_line(session, line_id)
+        session.drop_line(line_id)
+        _, repriced = _refresh_session(session, pricing_model.current())
+        return _cart_response(session, [], repriced)
+
+
+@router.put("/carts/{cart_id}/delivery")
+def change_cart_delivery(cart_id: str, req: CartDeliveryRequest = Body(...)):
+    # วิธีรับสินค้ามีผลกับคะแนนทุกบรรทัด → คำนวณใหม่ทั้งตะกร้า (บรรทัดที่เคยคำนวณด้วยวิธีนี้แล้วได้จาก quote_cache)
+    session = _get_session(cart_id)
+    with session.lock:
+        session.delivery_type = req.deliveryType
+        session.generation = None
+        _refresh_session(session, pricing_model.current())
+        return _cart_response(session, None, repriced=True)
+
+
+# -------------------------------
+#  PRICING MODEL (pricing_model.json)
+# -------------------------------
+@router.get("/model")
+def pricing_model_status():
+    # version ที่ใช้อยู่ + ปัญหาของไฟล์ล่าสุด (ถ้ามี — ไฟล์ที่ไม่ผ่าน validate จะไม่ถูกใช้)
+    return pricing_model.status()
+
+
+@router.post("/model/reload")
+def reload_pricing_model():
+    # เรียกหลังแก้ pricing_model.json → ใช้ทันที (ปกติเห็นเองจาก mtime ตอนคำนวณครั้งถัดไป)
+    try:
+        return pricing_model.reload()
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.get("/quote-cache")
+def quote_cache_status():
+    # hit / miss ของผลราคาต่อบรรทัด (/calculate) + จำนวน entry ที่เก็บอยู่
+    return quote_cache.stats()
+
+
+@router.get("/cart-sessions")
+def cart_sessions_status():
+    # จำนวนตะกร้าที่จำไว้ + ที่หมดอายุ / ถูกทิ้งเพราะเกินจำนวน
+    return cart_sessions.stats()
+
+
+@router.get("/payment-terms")
+def payment_terms_status():
+    # ตาราง term → (วัน, markup) ที่ใช้อยู่ (สร้างใหม่เมื่อ DB หรือ model version เปลี่ยน)
+    return payment_terms.status()
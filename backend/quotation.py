@@ -4,25 +4,18 @@
 # ============================================
 
 from __future__ import annotations
-from pathlib import Path
 from typing import List, Optional, Dict, Any
 from datetime import datetime
+import base64
 import json
-import sqlite3
-from db_sqlite import get_conn
+from db_sqlite import read_conn, write_conn
+import excel_outbox
 
-from fastapi import APIRouter, HTTPException, Body
-from openpyxl import load_workbook
+from fastapi import APIRouter, HTTPException, Body, Query, Response
 
 router = APIRouter(prefix="/quotation", tags=["quotation"])
 
 
-# Excel template directory
-DATA_DIR = Path(__file__).parent / "data"
-DATA_DIR.mkdir(parents=True, exist_ok=True)
-EXCEL_FILE = DATA_DIR / "QuoteTemplate.xlsx"
-
-
 # -----------------------------------------------------
 # Helpers
 # -----------------------------------------------------
@@ -30,87 +23,83 @@ def _now_iso():
     return datetime.now().isoformat(timespec="seconds")
 
 
-def _generate_quote_no(branch_code: str) -> str:
-    """
-    Format:  BSQO-2502/0001
-    """
-    now = datetime.now()
-    yy = str(now.year)[-2:]
-    mm = f"{now.month:02d}"
-
-    prefix = f"{branch_code[-2:].upper()}QO-{yy}{mm}"
-
-    conn = get_conn()
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT QuoteNo FROM Quote_Header
-        WHERE QuoteNo LIKE ?
-    """, (f"{prefix}%",))
-
-    count = len(cur.fetchall()) + 1
-    seq = f"{count:04d}"
-
-    return f"{prefix}/{seq}"
-
-
-def _safe_get_header_row(ws):
-    first_row = next(ws.iter_rows(min_row=1, max_row=1))
-    return [c.value for c in first_row]
-
-
-def _append_header_to_excel(header: dict):
-    if not EXCEL_FILE.exists():
-        return
+# -----------------------------------------------------
+# Quote number sequence
+# -----------------------------------------------------
+# เลขล่าสุดของแต่ละ prefix (สาขา + YYMM) → ออกเลขใหม่ได้ O(1) ภายใน transaction เดียวกับ INSERT header
+SEQUENCE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS Quote_Sequence (
+        Prefix  TEXT PRIMARY KEY,
+        LastSeq INTEGER NOT NULL
+    )
+"""
 
-    wb = load_workbook(EXCEL_FILE)
-    if "Quote_Header" not in wb.sheetnames:
-        return
+# prefix / เลขลำดับ ที่แยกจาก QuoteNo รูปแบบ "BSQO-2502/0001"
+_SEQ_PREFIX_SQL = "substr(QuoteNo, 1, instr(QuoteNo, '/') - 1)"
+_SEQ_NUMBER_SQL = "CAST(substr(QuoteNo, instr(QuoteNo, '/') + 1) AS INTEGER)"
 
-    ws = wb["Quote_Header"]
-    headers = _safe_get_header_row(ws)
-    row = [""] * len(headers)
+_sequence_ready = False
 
-    def set_col(col, val):
-        if col in headers:
-            row[headers.index(col)] = val
 
-    # Map header values
-    for key, val in header.items():
-        set_col(key, val)
+def _quote_prefix(branch_code: str) -> str:
+    now = datetime.now()
+    yy = str(now.year)[-2:]
+    mm = f"{now.month:02d}"
 
-    ws.append(row)
-    wb.save(EXCEL_FILE)
+    return f"{branch_code[-2:].upper()}QO-{yy}{mm}"
 
 
-def _append_lines_to_excel(quote_no: str, lines: list):
-    if not EXCEL_FILE.exists():
-        return
+def _ensure_sequence_table(conn):
+    global _sequence_ready
+    if not _sequence_ready:
+        conn.execute(SEQUENCE_TABLE_SQL)
+        _sequence_ready = True
 
-    wb = load_workbook(EXCEL_FILE)
-    if "Quote_Line" not in wb.sheetnames:
-        return
 
-    ws = wb["Quote_Line"]
-    headers = _safe_get_header_row(ws)
+def _next_quote_no(conn, branch_code: str) -> str:
+    """
+    Format:  BSQO-2502/0001
+    ต้องเรียกภายใน write_conn() เดียวกับที่ INSERT Quote_Header
+    (rollback → เลขที่จองไว้ถูกคืนด้วย, UPDATE ถือ write lock ของ SQLite → ไม่ได้เลขซ้ำแม้หลาย process)
+    """
+    _ensure_sequence_table(conn)
+    prefix = _quote_prefix(branch_code)
 
-    def to_row(line: dict):
-        row = [""] * len(headers)
+    # prefix ใหม่ (เดือนใหม่ / สาขาใหม่ / ยังไม่เคย backfill) → เริ่มต่อจากเลขสูงสุดที่มีอยู่แล้ว
+    # (ช่วง "prefix/" ถึง "prefix0" = ทุก QuoteNo ที่ขึ้นต้นด้วย "prefix/" และใช้ index ของ QuoteNo ได้)
+    known = conn.execute("SELECT 1 FROM Quote_Sequence WHERE Prefix = ?", (prefix,)).fetchone()
+    if not known:
+        conn.execute(f"""
+            INSERT OR IGNORE INTO Quote_Sequence (Prefix, LastSeq)
+            SELECT ?, COALESCE(MAX({_SEQ_NUMBER_SQL}), 0)
+            FROM Quote_Header
+            WHERE QuoteNo >= ? AND QuoteNo < ?
+        """, (prefix, f"{prefix}/", f"{prefix}0"))
 
-        def set_col(col, val):
-            if col in headers:
-                row[headers.index(col)] = val
+    conn.execute("UPDATE Quote_Sequence SET LastSeq = LastSeq + 1 WHERE Prefix = ?", (prefix,))
+    seq = conn.execute("SELECT LastSeq FROM Quote_Sequence WHERE Prefix = ?", (prefix,)).fetchone()[0]
 
-        set_col("QuoteID", quote_no)
-        for key, val in line.items():
-            set_col(key, val)
+    return f"{prefix}/{seq:04d}"
 
-        return row
 
-    for ln in lines:
-        ws.append(to_row(ln))
+def backfill_quote_sequences() -> dict:
+    """
+    ตั้ง LastSeq ของทุก prefix จาก QuoteNo ที่มีอยู่ใน Quote_Header (ไม่ลดค่าที่สูงกว่าอยู่แล้ว)
+    ใช้หลัง import ข้อมูลเก่า / แก้ข้อมูลด้วยมือ — เรียกซ้ำได้
+    """
+    with write_conn() as conn:
+        _ensure_sequence_table(conn)
+        conn.execute(f"""
+            INSERT INTO Quote_Sequence (Prefix, LastSeq)
+            SELECT {_SEQ_PREFIX_SQL} AS p, MAX({_SEQ_NUMBER_SQL})
+            FROM Quote_Header
+            WHERE instr(QuoteNo, '/') > 1
+            GROUP BY p
+            ON CONFLICT (Prefix) DO UPDATE SET LastSeq = MAX(LastSeq, excluded.LastSeq)
+        """)
+        rows = conn.execute("SELECT Prefix, LastSeq FROM Quote_Sequence ORDER BY Prefix").fetchall()
 
-    wb.save(EXCEL_FILE)
+    return {r["Prefix"]: r["LastSeq"] for r in rows}
 
 
 # -----------------------------------------------------
@@ -158,9 +147,6 @@ def _build_line_from_payload(item: dict) -> dict:
 # -----------------------------------------------------
 @router.post("", summary="สร้างใบเสนอราคาใหม่")
 def create_quotation(payload: dict = Body(...)):
-    conn = get_conn()
-    cur = conn.cursor()
-
     employee = payload.get("employee") or {}
     customer = payload.get("customer") or {}
     branch = employee.get("branchId", "")
@@ -181,12 +167,11 @@ def create_quotation(payload: dict = Body(...)):
         cust_code = raw_code or "N/A"
         cust_name = raw_name or "ผู้ไม่ประสงค์ออกนาม"
 
-    quote_no = _generate_quote_no(branch)
     now = _now_iso()
 
     # 🔥 เรียงตามคอลัมน์จริงของ DB
     header = {
-        "QuoteNo": quote_no,
+        "QuoteNo": None,                        # ออกเลขใน transaction เดียวกับ INSERT ด้านล่าง
         "Status": payload.get("status", "draft"),
         "CustomerCode": cust_code, 
         "SalesID": employee.get("id", ""),
@@ -212,26 +197,32 @@ def create_quotation(payload: dict = Body(...)):
         
     }
 
-    # 🔥 INSERT ด้วยลำดับคอลัมน์ที่ถูกต้อง 100%
-    cur.execute("""
-        INSERT INTO Quote_Header (
-            QuoteNo, Status, CustomerCode, SalesID, SalesName,
-            CreateDate, ExpireDate, ApproveDate, BranchCode,
-            PaymentTerm, CreditTerm, ShippingMethod, ShippingCost,
-            DiscountAmount, SubtotalAmount, TotalAmount,
-            NeedsTax, BillTaxName, Remark, LastUpdate,
-            CustomerName, Tel , ShippingCustomerPay
-        ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-    """, tuple(header.values()))
+    with write_conn() as conn:
+        cur = conn.cursor()
+
+        quote_no = _next_quote_no(conn, branch)
+        header["QuoteNo"] = quote_no
+
+        # 🔥 INSERT ด้วยลำดับคอลัมน์ที่ถูกต้อง 100%
+        cur.execute("""
+            INSERT INTO Quote_Header (
+                QuoteNo, Status, CustomerCode, SalesID, SalesName,
+                CreateDate, ExpireDate, ApproveDate, BranchCode,
+                PaymentTerm, CreditTerm, ShippingMethod, ShippingCost,
+                DiscountAmount, SubtotalAmount, TotalAmount,
+                NeedsTax, BillTaxName, Remark, LastUpdate,
+                CustomerName, Tel , ShippingCustomerPay
+            ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+        """, tuple(header.values()))
 
 
-    cart = payload.get("cart", [])
-    if not cart:
-        raise HTTPException(400, "ต้องมีสินค้าอย่างน้อย 1 รายการ")
+        cart = payload.get("cart", [])
+        if not cart:
+            raise HTTPException(400, "ต้องมีสินค้าอย่างน้อย 1 รายการ")
 
-    lines_to_excel = []
+        lines_to_excel = []
 
-    for item in cart:
+        for item in cart:
             line = _build_line_from_payload(item)
 
             cur.execute("""
@@ -250,12 +241,11 @@ def create_quotation(payload: dict = Body(...)):
 
             lines_to_excel.append(line)
 
+        # สำเนาลง Excel: เข้าคิวใน transaction เดียวกัน แล้วให้ writer thread เขียนไฟล์ทีหลัง
+        excel_outbox.enqueue_header(conn, header)
+        excel_outbox.enqueue_lines(conn, quote_no, lines_to_excel)
 
-    conn.commit()
-    conn.close()
-
-    _append_header_to_excel(header)
-    _append_lines_to_excel(quote_no, lines_to_excel)
+    excel_outbox.notify()
 
     return {"quoteNo": quote_no, "status": "created"}
 
@@ -265,185 +255,300 @@ def create_quotation(payload: dict = Body(...)):
 # -----------------------------------------------------
 @router.put("/{quote_no:path}", summary="อัปเดตใบเสนอราคา")
 def update_quotation(quote_no: str, payload: dict = Body(...)):
-    conn = get_conn()
-    cur = conn.cursor()
+    with write_conn() as conn:
+        cur = conn.cursor()
+
+        cur.execute("SELECT * FROM Quote_Header WHERE QuoteNo=?", (quote_no,))
+        original = cur.fetchone()
+        if not original:
+            raise HTTPException(404, f"ไม่พบใบเสนอราคา {quote_no}")
+
+        employee = payload.get("employee") or {}
+        customer = payload.get("customer") or {}
+        now = _now_iso()
+
+        # -------------------------------
+        #  กำหนด default ผู้ไม่ประสงค์ออกนาม ตอนอัปเดต
+        # -------------------------------
+        raw_code = (customer.get("code") or "").strip()
+        raw_name = (customer.get("name") or "").strip()
+        raw_phone = (customer.get("phone") or "").strip()
+
+        if not raw_code and not raw_name:
+            cust_code = "N/A"
+            cust_name = "ผู้ไม่ประสงค์ออกนาม"
+        else:
+            cust_code = raw_code or "N/A"
+            cust_name = raw_name or "ผู้ไม่ประสงค์ออกนาม"
+
+        # 🔥 จัดลำดับ header ตาม DB
+        header = {
+            "Status": payload.get("status", "draft"),
+            "CustomerCode": cust_code,
+            "SalesID": employee.get("id", ""),
+            "SalesName": employee.get("name", ""),
+            "ExpireDate": payload.get("expireDate", ""),
+            "ApproveDate": now,
+            "BranchCode": employee.get("branchId", ""),
+            "PaymentTerm": payload.get("paymentTerm", ""),
+            "CreditTerm": payload.get("creditTerm", ""),
+            "ShippingMethod": payload.get("deliveryType", ""),
+            "ShippingCost": payload.get("totals", {}).get("shippingRaw", 0),
+            "DiscountAmount": payload.get("discount", 0),
+            "SubtotalAmount": payload.get("totals", {}).get("exVat", 0),
+            "TotalAmount": payload.get("totals", {}).get("grandTotal", 0),
+            "NeedsTax": "Y" if payload.get("needTaxInvoice") else "N",
+            "BillTaxName": payload.get("billTaxName", ""),
+            "Remark": payload.get("note", ""),
+            "LastUpdate": now,
+            "CustomerName": cust_name, 
+            "Tel": customer.get("phone", ""),
+            "ShippingCustomerPay": payload.get("totals", {}).get("shippingCustomerPay", 0),
+
+        }
+
+        # 🔥 UPDATE ตามลำดับที่ถูกต้อง 100%
+        cur.execute("""
+            UPDATE Quote_Header SET
+                Status=?, CustomerCode=?, SalesID=?, SalesName=?,
+                ExpireDate=?, ApproveDate=?, BranchCode=?,
+                PaymentTerm=?, CreditTerm=?, ShippingMethod=?, ShippingCost=?,
+                DiscountAmount=?, SubtotalAmount=?, TotalAmount=?,
+                NeedsTax=?, BillTaxName=?, Remark=?, LastUpdate=?,
+                CustomerName=?, Tel=? , ShippingCustomerPay=?
+            WHERE QuoteNo=?
+        """, (
+            header["Status"],
+            header["CustomerCode"],
+            header["SalesID"],
+            header["SalesName"],
+            header["ExpireDate"],
+            header["ApproveDate"],
+            header["BranchCode"],
+            header["PaymentTerm"],
+            header["CreditTerm"],
+            header["ShippingMethod"],
+            header["ShippingCost"],
+            header["DiscountAmount"],
+            header["SubtotalAmount"],
+            header["TotalAmount"],
+            header["NeedsTax"],
+            header["BillTaxName"],
+            header["Remark"],
+            header["LastUpdate"],
+            header["CustomerName"],
+            header["Tel"],
+            header["ShippingCustomerPay"],   # ⭐ FIX สำคัญมาก!
+            quote_no                         # ⭐ ตัวสุดท้าย
+        ))
 
-    cur.execute("SELECT * FROM Quote_Header WHERE QuoteNo=?", (quote_no,))
-    original = cur.fetchone()
-    if not original:
-        raise HTTPException(404, f"ไม่พบใบเสนอราคา {quote_no}")
 
-    employee = payload.get("employee") or {}
-    customer = payload.get("customer") or {}
-    now = _now_iso()
-
-    # -------------------------------
-    #  กำหนด default ผู้ไม่ประสงค์ออกนาม ตอนอัปเดต
-    # -------------------------------
-    raw_code = (customer.get("code") or "").strip()
-    raw_name = (customer.get("name") or "").strip()
-    raw_phone = (customer.get("phone") or "").strip()
+        cur.execute("DELETE FROM Quote_Line WHERE QuoteID=?", (quote_no,))
 
-    if not raw_code and not raw_name:
-        cust_code = "N/A"
-        cust_name = "ผู้ไม่ประสงค์ออกนาม"
-    else:
-        cust_code = raw_code or "N/A"
-        cust_name = raw_name or "ผู้ไม่ประสงค์ออกนาม"
+        cart = payload.get("cart", [])
+        if not cart:
+            raise HTTPException(400, "ต้องมีสินค้าอย่างน้อย 1 รายการ")
 
-    # 🔥 จัดลำดับ header ตาม DB
-    header = {
-        "Status": payload.get("status", "draft"),
-        "CustomerCode": cust_code,
-        "SalesID": employee.get("id", ""),
-        "SalesName": employee.get("name", ""),
-        "ExpireDate": payload.get("expireDate", ""),
-        "ApproveDate": now,
-        "BranchCode": employee.get("branchId", ""),
-        "PaymentTerm": payload.get("paymentTerm", ""),
-        "CreditTerm": payload.get("creditTerm", ""),
-        "ShippingMethod": payload.get("deliveryType", ""),
-        "ShippingCost": payload.get("totals", {}).get("shippingRaw", 0),
-        "DiscountAmount": payload.get("discount", 0),
-        "SubtotalAmount": payload.get("totals", {}).get("exVat", 0),
-        "TotalAmount": payload.get("totals", {}).get("grandTotal", 0),
-        "NeedsTax": "Y" if payload.get("needTaxInvoice") else "N",
-        "BillTaxName": payload.get("billTaxName", ""),
-        "Remark": payload.get("note", ""),
-        "LastUpdate": now,
-        "CustomerName": cust_name, 
-        "Tel": customer.get("phone", ""),
-        "ShippingCustomerPay": payload.get("totals", {}).get("shippingCustomerPay", 0),
-
-    }
+        lines_to_excel = []
+        for item in cart:
+            line = _build_line_from_payload(item)
 
-    # 🔥 UPDATE ตามลำดับที่ถูกต้อง 100%
-    cur.execute("""
-        UPDATE Quote_Header SET
-            Status=?, CustomerCode=?, SalesID=?, SalesName=?,
-            ExpireDate=?, ApproveDate=?, BranchCode=?,
-            PaymentTerm=?, CreditTerm=?, ShippingMethod=?, ShippingCost=?,
-            DiscountAmount=?, SubtotalAmount=?, TotalAmount=?,
-            NeedsTax=?, BillTaxName=?, Remark=?, LastUpdate=?,
-            CustomerName=?, Tel=? , ShippingCustomerPay=?
-        WHERE QuoteNo=?
-    """, (
-        header["Status"],
-        header["CustomerCode"],
-        header["SalesID"],
-        header["SalesName"],
-        header["ExpireDate"],
-        header["ApproveDate"],
-        header["BranchCode"],
-        header["PaymentTerm"],
-        header["CreditTerm"],
-        header["ShippingMethod"],
-        header["ShippingCost"],
-        header["DiscountAmount"],
-        header["SubtotalAmount"],
-        header["TotalAmount"],
-        header["NeedsTax"],
-        header["BillTaxName"],
-        header["Remark"],
-        header["LastUpdate"],
-        header["CustomerName"],
-        header["Tel"],
-        header["ShippingCustomerPay"],   # ⭐ FIX สำคัญมาก!
-        quote_no                         # ⭐ ตัวสุดท้าย
-    ))
-
-
-    cur.execute("DELETE FROM Quote_Line WHERE QuoteID=?", (quote_no,))
-
-    cart = payload.get("cart", [])
-    if not cart:
-        raise HTTPException(400, "ต้องมีสินค้าอย่างน้อย 1 รายการ")
-
-    lines_to_excel = []
-    for item in cart:
-        line = _build_line_from_payload(item)
+            cur.execute("""
+                INSERT INTO Quote_Line (
+                    QuoteID, ItemCode, ItemName, Category,
+                    Unit, Quantity, UnitPrice, TotalPrice,
+                    IsGlassCut, CutInfoJson, Remark
+                ) VALUES (?,?,?,?,?,?,?,?,?,?,?)
+            """, (
+                quote_no,
+                line["ItemCode"], line["ItemName"], line["Category"],
+                line["Unit"], line["Quantity"], line["UnitPrice"],
+                line["TotalPrice"], line["IsGlassCut"],
+                line["CutInfoJson"], line["Remark"]
+            ))
 
-        cur.execute("""
-            INSERT INTO Quote_Line (
-                QuoteID, ItemCode, ItemName, Category,
-                Unit, Quantity, UnitPrice, TotalPrice,
-                IsGlassCut, CutInfoJson, Remark
-            ) VALUES (?,?,?,?,?,?,?,?,?,?,?)
-        """, (
-            quote_no,
-            line["ItemCode"], line["ItemName"], line["Category"],
-            line["Unit"], line["Quantity"], line["UnitPrice"],
-            line["TotalPrice"], line["IsGlassCut"],
-            line["CutInfoJson"], line["Remark"]
-        ))
+            lines_to_excel.append(line)
 
-        lines_to_excel.append(line)
+        updated_header = dict(original)
+        updated_header.update(header)
+        updated_header["QuoteNo"] = quote_no
+        updated_header["CreateDate"] = original["CreateDate"]
 
+        excel_outbox.enqueue_header(conn, updated_header)
+        excel_outbox.enqueue_lines(conn, quote_no, lines_to_excel)
 
-    conn.commit()
-    conn.close()
+    excel_outbox.notify()
 
-    updated_header = dict(original)
-    updated_header.update(header)
-    updated_header["QuoteNo"] = quote_no
-    updated_header["CreateDate"] = original["CreateDate"]
+    return {"quoteNo": quote_no, "status": "updated"}
 
-    _append_header_to_excel(updated_header)
-    _append_lines_to_excel(quote_no, lines_to_excel)
 
-    return {"quoteNo": quote_no, "status": "updated"}
+# -----------------------------------------------------
+# LIST helpers
+# -----------------------------------------------------
+LIST_MAX_LIMIT = 500
+LINES_IN_CHUNK = 500    # จำนวน QuoteNo ต่อ 1 query (กันชน limit ตัวแปรของ SQLite)
+
+# เวลาที่ใช้เรียงหน้า list: ใบที่ไม่มี LastUpdate (ข้อมูลเก่า / import) ใช้ CreateDate แทน
+# (ถ้าเรียงด้วย LastUpdate ตรง ๆ แถว NULL ไม่มีทางผ่านเงื่อนไข cursor "< (?, ?)" → หายจากทุกหน้าที่มี cursor)
+LIST_ORDER_SQL = "COALESCE(LastUpdate, CreateDate, '')"
+
+# index สำหรับหน้า list (filter + เรียงตาม LIST_ORDER_SQL — expression ต้องเขียนเหมือนใน query ทุกตัวอักษร)
+# และการดึง line ตาม QuoteID
+QUOTE_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_quote_header_quoteno ON Quote_Header (QuoteNo)',
+    f'CREATE INDEX IF NOT EXISTS idx_quote_header_listorder ON Quote_Header ({LIST_ORDER_SQL}, QuoteNo)',
+    f'CREATE INDEX IF NOT EXISTS idx_quote_header_status_order ON Quote_Header (Status, {LIST_ORDER_SQL}, QuoteNo)',
+    f'CREATE INDEX IF NOT EXISTS idx_quote_header_branch_order ON Quote_Header (BranchCode, {LIST_ORDER_SQL}, QuoteNo)',
+    f'CREATE INDEX IF NOT EXISTS idx_quote_header_sales_order ON Quote_Header (SalesID, {LIST_ORDER_SQL}, QuoteNo)',
+    'CREATE INDEX IF NOT EXISTS idx_quote_line_quoteid ON Quote_Line (QuoteID)',
+]
+
+# index แบบเดิม (เรียง LastUpdate ตรง ๆ) — ไม่ถูกใช้แล้ว
+OLD_QUOTE_INDEXES = [
+    "idx_quote_header_lastupdate",
+    "idx_quote_header_status",
+    "idx_quote_header_branch",
+    "idx_quote_header_sales",
+]
+
+
+def ensure_indexes():
+    with write_conn() as conn:
+        for name in OLD_QUOTE_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        for sql in QUOTE_INDEXES:
+            conn.execute(sql)
+        _ensure_sequence_table(conn)
+
+
+def _list_order_value(h: dict):
+    # ค่าเดียวกับ LIST_ORDER_SQL ของแถวนี้ (COALESCE: แทนเฉพาะ NULL ไม่แทน "")
+    for value in (h["LastUpdate"], h["CreateDate"]):
+        if value is not None:
+            return value
+    return ""
+
+
+def _encode_cursor(last_update, quote_no) -> str:
+    raw = json.dumps([last_update, quote_no], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> list:
+    try:
+        value = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if isinstance(value, list) and len(value) == 2:
+            return value
+    except (ValueError, UnicodeError):
+        pass
+    raise HTTPException(400, "cursor ไม่ถูกต้อง")
+
+
+def _fetch_dicts(cur) -> list:
+    # เท่ากับ normalize_keys(dict(r)) ทุกแถว แต่ strip ชื่อคอลัมน์ครั้งเดียวต่อ query
+    keys = [d[0].strip() for d in cur.description]
+    return [dict(zip(keys, r)) for r in cur.fetchall()]
+
+
+def _load_lines(cur, quote_nos: list) -> dict:
+    """Quote_Line ของหลายใบในครั้งเดียว (แบ่งเป็นก้อนละ LINES_IN_CHUNK) → {QuoteNo: [line, ...]}"""
+    lines_by_quote = {}
+    for i in range(0, len(quote_nos), LINES_IN_CHUNK):
+        chunk = quote_nos[i:i + LINES_IN_CHUNK]
+        marks = ",".join("?" * len(chunk))
+        cur.execute(
+            f"SELECT * FROM Quote_Line WHERE QuoteID IN ({marks}) ORDER BY QuoteID, rowid",
+            chunk,
+        )
+        for ln in _fetch_dicts(cur):
+            lines_by_quote.setdefault(ln["QuoteID"], []).append(ln)
+    return lines_by_quote
+
+
+def _quote_list_item(h: dict) -> dict:
+    quote_no = h["QuoteNo"]
+    return {
+        "quoteNo": quote_no,
+        "id": quote_no,
+        "customer": {
+            "id": h["CustomerCode"],
+            "code": h["CustomerCode"],
+            "name": h["CustomerName"],
+            "phone": h.get("Tel", "")
+        },
+        "employee": {
+            "id": h["SalesID"],
+            "name": h["SalesName"]
+        },
+        "createdAt": h["CreateDate"],
+        "updatedAt": h["LastUpdate"],
+        "totals": {
+            "grandTotal": h["TotalAmount"],
+            "exVat": h["SubtotalAmount"],
+            "shippingRaw": h["ShippingCost"],
+        },
+    }
 
 
 # -----------------------------------------------------
 # LIST / HISTORY
 # -----------------------------------------------------
 @router.get("", summary="โหลดรายการใบเสนอราคาแบบทั้งหมด")
-def list_quotations(status: str = None):
-    conn = get_conn()
-    cur = conn.cursor()
-
+def list_quotations(
+    response: Response,
+    status: Optional[str] = None,
+    branch: Optional[str] = Query(None, description="กรองตาม BranchCode"),
+    sales: Optional[str] = Query(None, description="กรองตาม SalesID"),
+    limit: Optional[int] = Query(None, ge=1, le=LIST_MAX_LIMIT, description="ไม่ส่ง = ทั้งหมด (แบบเดิม)"),
+    cursor: Optional[str] = Query(None, description="ค่า X-Next-Cursor จากหน้าก่อน"),
+    summary: bool = Query(False, description="true = ไม่โหลดรายการสินค้า (cart)"),
+):
+    """
+    เรียงตาม LastUpdate ล่าสุดก่อน (ไม่มี LastUpdate → ใช้ CreateDate, QuoteNo เป็นตัวตัดสินเมื่อเวลาเท่ากัน)
+    ส่ง limit มา → ถ้ายังมีหน้าถัดไปจะได้ header X-Next-Cursor ไว้ส่งกลับมาเป็น cursor
+    """
+    where, params = [], []
     if status:
-        cur.execute("""
-            SELECT * FROM Quote_Header
-            WHERE Status = ?
-            ORDER BY LastUpdate DESC
-        """, (status,))
-    else:
-        cur.execute("""
-            SELECT * FROM Quote_Header
-            ORDER BY LastUpdate DESC
-        """)
+        where.append("Status = ?")
+        params.append(status)
+    if branch:
+        where.append("BranchCode = ?")
+        params.append(branch)
+    if sales:
+        where.append("SalesID = ?")
+        params.append(sales)
+    if cursor:
+        # "<= ?" ซ้ำกับ row value เพื่อให้ SQLite ใช้ช่วงของ expression index ได้ (row value อย่างเดียวได้แค่ scan)
+        order_value, quote_no = _decode_cursor(cursor)
+        where.append(f"{LIST_ORDER_SQL} <= ? AND ({LIST_ORDER_SQL}, QuoteNo) < (?, ?)")
+        params.extend([order_value, order_value, quote_no])
+
+    sql = "SELECT * FROM Quote_Header"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {LIST_ORDER_SQL} DESC, QuoteNo DESC"
+    if limit:
+        # ขอเกินมา 1 แถว เพื่อรู้ว่ามีหน้าถัดไปไหม
+        sql += " LIMIT ?"
+        params.append(limit + 1)
+
+    with read_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        headers = _fetch_dicts(cur)
+
+        if limit and len(headers) > limit:
+            headers = headers[:limit]
+            last = headers[-1]
+            response.headers["X-Next-Cursor"] = _encode_cursor(_list_order_value(last), last["QuoteNo"])
+
+        lines_by_quote = {} if summary else _load_lines(cur, [h["QuoteNo"] for h in headers])
 
-    headers = [normalize_keys(dict(r)) for r in cur.fetchall()]
     result = []
-
     for h in headers:
-        quote_no = h["QuoteNo"]
-
-        cur.execute("SELECT * FROM Quote_Line WHERE QuoteID=?", (quote_no,))
-        lines = [normalize_keys(dict(r)) for r in cur.fetchall()]
-
-        result.append({
-            "quoteNo": quote_no,
-            "id": quote_no,
-            "customer": {
-                "id": h["CustomerCode"],
-                "code": h["CustomerCode"],
-                "name": h["CustomerName"],
-                "phone": h.get("Tel", "")
-            },
-            "employee": {
-                "id": h["SalesID"],
-                "name": h["SalesName"]
-            },
-            "createdAt": h["CreateDate"],
-            "updatedAt": h["LastUpdate"],
-            "totals": {
-                "grandTotal": h["TotalAmount"],
-                "exVat": h["SubtotalAmount"],
-                "shippingRaw": h["ShippingCost"],
-            },
-            "cart": [
+        item = _quote_list_item(h)
+        if not summary:
+            item["cart"] = [
                 {
                     "sku": ln["ItemCode"],
                     "name": ln["ItemName"],
@@ -453,33 +558,38 @@ def list_quotations(status: str = None):
                     "category": ln["Category"],
                     "unit": ln["Unit"]
                 }
-                for ln in lines
+                for ln in lines_by_quote.get(h["QuoteNo"], [])
             ]
-        })
+        result.append(item)
 
-    conn.close()
     return result
 
 
+# -----------------------------------------------------
+# EXCEL MIRROR STATUS (ต้องประกาศก่อน /{quote_no:path})
+# -----------------------------------------------------
+@router.get("/excel-outbox/status", summary="สถานะการสำเนาใบเสนอราคาลง Excel")
+def excel_outbox_status():
+    return excel_outbox.status()
+
+
 # -----------------------------------------------------
 # GET SINGLE QUOTATION
 # -----------------------------------------------------
 @router.get("/{quote_no:path}", summary="โหลดใบเสนอราคาแบบเต็ม")
 def get_quotation(quote_no: str):
-    conn = get_conn()
-    cur = conn.cursor()
-
-    cur.execute("SELECT * FROM Quote_Header WHERE QuoteNo=?", (quote_no,))
-    header = cur.fetchone()
-    if not header:
-        raise HTTPException(404, f"ไม่พบใบเสนอราคา {quote_no}")
+    with read_conn() as conn:
+        cur = conn.cursor()
 
-    header = normalize_keys(dict(header))
+        cur.execute("SELECT * FROM Quote_Header WHERE QuoteNo=?", (quote_no,))
+        header = cur.fetchone()
+        if not header:
+            raise HTTPException(404, f"ไม่พบใบเสนอราคา {quote_no}")
 
-    cur.execute("SELECT * FROM Quote_Line WHERE QuoteID=?", (quote_no,))
-    lines = [normalize_keys(dict(r)) for r in cur.fetchall()]
+        header = normalize_keys(dict(header))
 
-    conn.close()
+        cur.execute("SELECT * FROM Quote_Line WHERE QuoteID=?", (quote_no,))
+        lines = [normalize_keys(dict(r)) for r in cur.fetchall()]
 
     return {
         "header": header,
@@ -492,23 +602,25 @@ def get_quotation(quote_no: str):
 # -----------------------------------------------------
 @router.delete("/{quote_no:path}", summary="ยกเลิกใบเสนอราคา")
 def cancel_quotation(quote_no: str):
-    conn = get_conn()
-    cur = conn.cursor()
+    with write_conn() as conn:
+        cur = conn.cursor()
 
-    # ตรวจสอบว่ามีใบนี้ไหม
-    cur.execute("SELECT * FROM Quote_Header WHERE QuoteNo=?", (quote_no,))
-    if not cur.fetchone():
-        raise HTTPException(404, "ไม่พบใบเสนอราคา")
+        # ตรวจสอบว่ามีใบนี้ไหม
+        cur.execute("SELECT * FROM Quote_Header WHERE QuoteNo=?", (quote_no,))
+        if not cur.fetchone():
+            raise HTTPException(404, "ไม่พบใบเสนอราคา")
 
-    # เปลี่ยนสถานะเป็น cancelled
-    cur.execute("""
-        UPDATE Quote_Header 
-        SET Status = 'cancelled', LastUpdate = ?
-        WHERE QuoteNo = ?
-    """, (_now_iso(), quote_no))
-
-    conn.commit()
-    conn.close()
+        # เปลี่ยนสถานะเป็น cancelled
+        cur.execute("""
+            UPDATE Quote_Header 
+            SET Status = 'cancelled', LastUpdate = ?
+            WHERE QuoteNo = ?
+        """, (_now_iso(), quote_no))
 
     return {"cancelled": quote_no}
 
+
+if __name__ == "__main__":
+    # python quotation.py → backfill Quote_Sequence จากข้อมูลเดิม
+    for prefix, last_seq in backfill_quote_sequences().items():
+        print(f"{prefix}: {last_seq}")
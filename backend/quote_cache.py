@@ -0,0 +1,97 @@
+# quote_cache.py — cache ผลราคาต่อบรรทัดของ /api/pricing/calculate
+#
+# FE ส่งทั้งตะกร้ามาใหม่ทุกครั้งที่แก้ → บรรทัดที่ไม่เปลี่ยนไม่ต้องผ่าน merge / LevelPrice / Price ซ้ำ
+# key ต่อบรรทัด = (ลูกค้า, รับเอง/ส่ง, sku, ชื่อ, qty ที่กรอก, ราคาใน cart)
+#   - ลูกค้า = digest ของ customerData + แถวจากตาราง customer_tier (tier / เครดิต) ถ้ามี
+#   - qty ที่กรอก + catalog version กำหนด qty จริง (อลูมิเนียม × น้ำหนัก) ได้ตายตัว → หา key ได้โดยไม่ต้อง merge ก่อน
+# generation = (catalog version, pricing model version, mean_sd.json, ปี) ที่ผู้เรียกส่งมา
+#   เปลี่ยนเมื่อไหร่ล้างทั้ง cache (แถว Items_Test / โมเดล / mean_sd.json เปลี่ยน → ไม่มีบรรทัดเก่าหลุดออกไป)
+#   ข้อมูลลูกค้าเปลี่ยน → customer_key เปลี่ยนเอง ไม่ต้องล้าง; เขียน DB ส่วนอื่น (ใบเสนอราคา / outbox) ไม่ล้าง
+# LRU (MAX_ENTRIES) + อายุ (TTL_SECONDS) — ตั้ง QUOTE_CACHE_MAX_ENTRIES=0 เพื่อปิด
+# rows = tuple ของแถวแบบอ่านอย่างเดียว (MappingProxyType จาก pricing_router._line_rows) → แชร์ระหว่าง request ได้
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+MAX_ENTRIES = int(os.getenv("QUOTE_CACHE_MAX_ENTRIES", "20000"))
+TTL_SECONDS = float(os.getenv("QUOTE_CACHE_TTL", "600"))
+
+_lock = threading.Lock()
+_entries: "OrderedDict[tuple, tuple]" = OrderedDict()     # key → (เวลาที่เก็บ, rows ของบรรทัดนั้น)
+_generation = None
+_stats = {"hits": 0, "misses": 0, "expired": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+
+
+def enabled() -> bool:
+    return MAX_ENTRIES > 0
+
+
+def customer_key(customer_data: dict, tier: dict | None) -> str:
+    raw = json.dumps([customer_data, tier], sort_keys=True, default=str)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _switch(generation):
+    # เรียกตอนถือ _lock
+    global _generation
+    if generation != _generation:
+        if _entries:
+            _stats["invalidations"] += 1
+        _entries.clear()
+        _generation = generation
+
+
+def get_many(generation, keys: list) -> list:
+    """rows ของแต่ละ key ตามลำดับ (ไม่มี / หมดอายุ → None)"""
+    now = time.monotonic()
+    found = []
+    with _lock:
+        _switch(generation)
+        for key in keys:
+            entry = _entries.get(key)
+            if entry is not None and now - entry[0] > TTL_SECONDS:
+                del _entries[key]
+                _stats["expired"] += 1
+                entry = None
+            if entry is None:
+                _stats["misses"] += 1
+                found.append(None)
+            else:
+                _entries.move_to_end(key)
+                _stats["hits"] += 1
+                found.append(entry[1])
+    return found
+
+
+def put_many(generation, items: list):
+    """items = [(key, rows)] — ถ้าระหว่างคำนวณ generation เปลี่ยนไปแล้ว ผลนี้เก่า → ไม่เก็บ"""
+    now = time.monotonic()
+    with _lock:
+        if generation != _generation:
+            return
+        for key, rows in items:
+            _entries[key] = (now, rows)
+            _entries.move_to_end(key)
+            _stats["stores"] += 1
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+            _stats["evictions"] += 1
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            "enabled": enabled(),
+            "entries": len(_entries),
+            "max_entries": MAX_ENTRIES,
+            "ttl_seconds": TTL_SECONDS,
+            **_stats,
+        }
@@ -0,0 +1,211 @@
+# response_cache.py — JSON encoder เร็ว + cache bytes ของ GET ที่ข้อมูลเปลี่ยนไม่บ่อย (catalog / mapping / ลูกค้า)
+#
+# FastJSONResponse : ใช้ orjson ถ้ามี (ไม่มี → json.dumps แบบเดียวกับ JSONResponse)
+#   ⚠️ orjson เขียน NaN / Inf เป็น null (JSONResponse → error) → ใช้เฉพาะ GET ของ cached_route
+#   (ข้อมูล catalog / mapping / ลูกค้า) route อื่น เช่น pricing ต้องพังแบบเดิมแทนที่จะตอบราคา null
+# cached_route(fn) : route_class ของ APIRouter — GET ที่ตอบ 200 จะถูกเก็บเป็น bytes (ตอบด้วย FastJSONResponse)
+#   key = (path, query ที่เรียงแล้ว, fn()) → fn คืน version ของข้อมูล (เช่น version ของ catalog)
+#   - ETag (weak) + If-None-Match → 304 ไม่ต้องส่ง body
+#   - gzip / br (ถ้ามี brotli) คำนวณครั้งเดียวต่อ entry ตาม Accept-Encoding
+#   - header ที่ endpoint ตั้งเอง (เช่น X-Total-Count) เก็บไปด้วย
+#   - endpoint ไม่อยากให้ cache → ตั้ง Cache-Control: no-store เอง
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.routing import APIRoute
+
+try:
+    import orjson
+except ImportError:      # orjson ไม่บังคับ
+    orjson = None
+
+try:
+    import brotli
+except ImportError:      # ไม่มี brotli → มีแค่ gzip
+    brotli = None
+
+MAX_ENTRIES = 1024
+MAX_BYTES = 64 * 1024 * 1024     # รวม body ทุก encoding
+MIN_COMPRESS_BYTES = 1024        # body เล็กกว่านี้ไม่บีบ
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass     # ชนิดที่ orjson ไม่รู้จัก → ใช้ json แบบเดิม
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class _Entry:
+    __slots__ = ("etag", "headers", "bodies", "size", "cached")
+
+    def __init__(self, body: bytes, headers: list):
+        self.etag = 'W/"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        self.headers = headers
+        self.bodies = {"identity": body}
+        self.size = len(body)
+        self.cached = False
+
+    def body(self, encoding: str) -> bytes:
+        try:
+            return self.bodies[encoding]
+        except KeyError:
+            pass
+        raw = self.bodies["identity"]
+        data = brotli.compress(raw, quality=5) if encoding == "br" else gzip.compress(raw, compresslevel=6)
+        with _lock:
+            self.bodies[encoding] = data
+            self.size += len(data)
+            if self.cached:
+                _stats["bytes"] += len(data)
+        return data
+
+
+_lock = threading.Lock()
+_entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "not_modified": 0, "stores": 0, "evictions": 0, "bytes": 0}
+
+
+def _stats_add(name: str, n: int = 1):
+    with _lock:
+        _stats[name] += n
+
+
+def _get(key) -> "_Entry | None":
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+        return entry
+
+
+def _put(key, entry: _Entry):
+    with _lock:
+        old = _entries.pop(key, None)
+        if old is not None:
+            old.cached = False
+            _stats["bytes"] -= old.size
+        entry.cached = True
+        _entries[key] = entry
+        _stats["bytes"] += entry.size
+        _stats["stores"] += 1
+        while _entries and (len(_entries) > MAX_ENTRIES or _stats["bytes"] > MAX_BYTES):
+            _, dropped = _entries.popitem(last=False)
+            dropped.cached = False
+            _stats["bytes"] -= dropped.size
+            _stats["evictions"] += 1
+
+
+def clear():
+    with _lock:
+        for entry in _entries.values():
+            entry.cached = False
+        _entries.clear()
+        _stats["bytes"] = 0
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            "entries": len(_entries),
+            "encoder": "orjson" if orjson is not None else "json",
+            "brotli": brotli is not None,
+            **_stats,
+        }
+
+
+def _pick_encoding(request: Request, size: int) -> str:
+    if size < MIN_COMPRESS_BYTES:
+        return "identity"
+    accept = request.headers.get("accept-encoding", "")
+    offered = {part.split(";")[0].strip().lower() for part in accept.split(",")}
+    if brotli is not None and "br" in offered:
+        return "br"
+    if "gzip" in offered:
+        return "gzip"
+    return "identity"
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    weak = etag[2:]
+    return any(tag.strip().removeprefix("W/") == weak for tag in header.split(","))
+
+
+def _serve(request: Request, entry: _Entry) -> Response:
+    headers = dict(entry.headers)
+    headers["ETag"] = entry.etag
+    headers["Cache-Control"] = "no-cache"      # browser เก็บได้แต่ต้องถามก่อนใช้ (ได้ 304 ถ้าไม่เปลี่ยน)
+    headers["Vary"] = "Accept-Encoding"
+
+    if _etag_matches(request, entry.etag):
+        _stats_add("not_modified")
+        return Response(status_code=304, headers=headers)
+
+    encoding = _pick_encoding(request, len(entry.bodies["identity"]))
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(entry.body(encoding), headers=headers, media_type="application/json")
+
+
+_SKIP_HEADERS = {"content-length", "content-type", "content-encoding", "etag", "vary", "cache-control"}
+
+
+def cached_route(version: Callable[[], Hashable]) -> type:
+    """route_class ที่ cache GET ตาม version() ของข้อมูล (เรียกใน threadpool เพราะอาจต้องโหลด DB)"""
+
+    class CachedRoute(APIRoute):
+        def get_route_handler(self):
+            if "GET" not in self.methods:
+                return super().get_route_handler()
+            if isinstance(self.response_class, DefaultPlaceholder):
+                # endpoint ไม่ได้เลือก response_class เอง → orjson (body ถูก cache ไว้ encode ครั้งเดียวต่อ version)
+                self.response_class = FastJSONResponse
+            handler = super().get_route_handler()
+
+            async def cached_handler(request: Request) -> Response:
+                data_version = await run_in_threadpool(version)
+                key = (request.url.path, tuple(sorted(request.query_params.multi_items())), data_version)
+
+                entry = _get(key)
+                if entry is not None:
+                    _stats_add("hits")
+                    return _serve(request, entry)
+
+                _stats_add("misses")
+                response = await handler(request)
+                body = getattr(response, "body", None)
+                if (
+                    response.status_code != 200
+                    or not isinstance(body, bytes)
+                    or "no-store" in response.headers.get("cache-control", "")
+                ):
+                    return response
+
+                headers = [(k, v) for k, v in response.headers.items() if k.lower() not in _SKIP_HEADERS]
+                entry = _Entry(body, headers)
+                _put(key, entry)
+                return _serve(request, entry)
+
+            return cached_handler
+
+    return CachedRoute
@@ -1,9 +1,12 @@
 # backend/shipping.py
+import logging
+
 from fastapi import APIRouter
 from pydantic import BaseModel
 
 # ✅ ประกาศ router (ไม่ใช่ FastAPI เดี่ยว)
 router = APIRouter(prefix="/api/shipping", tags=["shipping"])
+log = logging.getLogger(__name__)
 
 # === ตารางค่าประเภทรถ ===
 VEHICLE_CONFIG = {
@@ -44,21 +47,22 @@ def calculate_shipping(data: ShippingRequest):
     company_pay = min(shipping_cost, cap)
     customer_pay = max(0, shipping_cost - company_pay)
     
-    print("\n=== SHIPPING DEBUG ===")
-    print(f"Vehicle Type : {data.vehicle_type}")
-    print(f"Distance (km): {data.distance_km}")
-    print(f"Unload Hours : {data.unload_hours}")
-    print(f"Staff Count  : {data.staff_count}")
-    print(f"Profit Input : {data.profit}")
-    print("--- Calculation ---")
-    print(f"Travel Hours : {travel_hours}")
-    print(f"Fuel Cost    : {fuel_cost}")
-    print(f"Fix Cost     : {fix_cost_total}")
-    print(f"Labor Cost   : {labor_cost}")
-    print(f"Shipping Cost: {shipping_cost}")
-    print(f"Cap (5%)     : {cap}")
-    print(f"Company Pay  : {company_pay}")
-    print(f"Customer Pay : {customer_pay}")
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("shipping calculated", extra={
+            "vehicle_type": data.vehicle_type,
+            "distance_km": data.distance_km,
+            "unload_hours": data.unload_hours,
+            "staff_count": data.staff_count,
+            "profit": data.profit,
+            "travel_hours": travel_hours,
+            "fuel_cost": fuel_cost,
+            "fix_cost": fix_cost_total,
+            "labor_cost": labor_cost,
+            "shipping_cost": shipping_cost,
+            "cap": cap,
+            "company_pay": company_pay,
+            "customer_pay": customer_pay,
+        })
 
     return {
         "vehicle_type": data.vehicle_type.upper(),
@@ -0,0 +1,253 @@
+# sku_family.py — engine กลางของ router สินค้าแยกตาม family (Aluminium / Gypsum / Sealant / C-Line / Accessories / Glass)
+#
+# แต่ละ router ประกาศแค่ FamilySpec: prefix, ตำแหน่ง field ใน SKU (fixed-width), ตาราง mapping
+# และรูปแบบ JSON ของ /items — engine ทำที่เหลือ:
+#   - parse SKU ครั้งเดียวต่อ catalog snapshot → คอลัมน์ของแต่ละ field (list ตามลำดับแถว)
+#   - index: field → {code → bitmap ของแถว} ใช้กรองแทน df[df[col] == x] ทีละ request
+#   - item dict ของ /items สร้างไว้ครั้งเดียว (ชื่อจาก mapping ใส่ไว้แล้ว)
+#   - mapping มาจาก lookup_tables (cache กลาง) → ตาราง mapping เปลี่ยน = version ใหม่ = สร้าง index ใหม่
+#   - index เก็บใน catalog.derived() → กติกาห้ามแก้ in-place ตามหัวไฟล์ catalog.py
+from dataclasses import dataclass
+from typing import Callable, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+from fastapi import Response
+
+from item_paging import ItemPage, RowOrder
+from lookup_tables import LookupSnapshot, get_lookups
+import catalog
+
+
+@dataclass(frozen=True)
+class SkuField:
+    key: str                            # ชื่อ field / query param เช่น "subGroup"
+    start: int                          # ตำแหน่งใน SKU (slice start:end)
+    end: int
+    table: Optional[str] = None         # ตาราง mapping Code → Name
+    facet: Optional[str] = None         # key ใน /master เช่น "subGroups"
+    pad: Optional[int] = None           # zfill ค่าที่ส่งมากรอง (None = เทียบตรง ๆ)
+    optional: bool = False              # SKU สั้นกว่า end → "" (ไม่ถือว่า parse ไม่ได้)
+    cast: Optional[Callable] = None     # เช่น int สำหรับ width/height ของกระจก
+    scope: Optional[str] = None         # mapping ที่ key เป็น (ค่าของ field scope, Code) เช่น Glass_SubGroup (Type, Code)
+
+
+@dataclass(frozen=True)
+class FamilySpec:
+    name: str
+    prefix: str
+    fields: tuple
+    item: tuple                         # (json key, source) ตามลำดับ key ของ /items
+    min_len: int = 0                    # SKU สั้นกว่านี้ → ทุก field เป็น None
+    sku_style: str = "upper"            # upper: upper+strip และต้องขึ้นต้นด้วย prefix / strip / raw
+    mapping_style: str = "text"         # text: str(Code).strip() → str(Name).strip() / zfill: Code zfill ตามความกว้าง field
+    label_fallback_code: bool = False   # /items: ไม่มีชื่อใน mapping → ใช้ code (False = "")
+    sort_by_sku: bool = False
+
+    def field(self, key: str) -> SkuField:
+        return next(f for f in self.fields if f.key == key)
+
+    def normalize(self, sku) -> str:
+        if self.sku_style == "raw":
+            return sku
+        s = str(sku).strip()
+        return s.upper() if self.sku_style == "upper" else s
+
+    def parse(self, sku) -> Optional[dict]:
+        """แยก field จาก SKU (None = SKU ไม่ตรงรูปแบบ)"""
+        s = self.normalize(sku)
+        if self.sku_style == "upper" and not s.startswith(self.prefix):
+            return None
+        if len(s) < self.min_len:
+            return None
+
+        out = {}
+        for f in self.fields:
+            if f.optional and len(s) < f.end:
+                out[f.key] = ""
+                continue
+            v = s[f.start:f.end]
+            out[f.key] = f.cast(v) if f.cast else v
+        return out
+
+
+# ----------------------------------------
+#  item sources (ค่าที่สองของ FamilySpec.item)
+# ----------------------------------------
+#   "sku"            SKU หลัง normalize
+#   "field:<key>"    code ที่ parse ได้ (None ถ้า parse ไม่ได้)
+#   "label:<key>"    ชื่อจาก mapping (ไม่มี → "" หรือ code ตาม label_fallback_code)
+#   "col:<column>"   ค่าดิบจาก Items_Test (NaN → None, ไม่มีคอลัมน์ → "")
+#   "text:<column>"  str(ค่า).strip()
+#   "onhand"         Inventory เป็น int (ว่าง/ไม่ใช่ตัวเลข → 0)
+
+
+def load_mapping(spec: FamilySpec, f: SkuField, lookups: LookupSnapshot) -> Mapping:
+    if spec.mapping_style == "zfill":
+        scope_width = None
+        if f.scope:
+            scope = spec.field(f.scope)
+            scope_width = scope.end - scope.start
+        return lookups.zfill_map(f.table, f.end - f.start, scope_width)
+    return lookups.text_map(f.table)
+
+
+def _column(df: pd.DataFrame, name: str) -> list:
+    if name not in df.columns:
+        return [""] * len(df)
+    col = df[name].astype(object)
+    return col.where(col.notna(), None).tolist()
+
+
+def _bitmap(positions: list) -> int:
+    bits = bytearray((max(positions) >> 3) + 1)
+    for i in positions:
+        bits[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bits, "little")
+
+
+def _positions(bits: int, size: int) -> list:
+    """ตำแหน่งของ bit ที่เป็น 1 เรียงน้อย → มาก"""
+    raw = np.frombuffer(bits.to_bytes((size + 7) // 8, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(raw, bitorder="little")).tolist()
+
+
+class FamilyIndex:
+    def __init__(self, spec: FamilySpec, df: pd.DataFrame, lookups: LookupSnapshot):
+        self.spec = spec
+        if spec.sort_by_sku:
+            df = df.sort_values("No.", kind="stable")
+        df = df.reset_index(drop=True)
+
+        self.size = len(df)
+        self.mappings = {f.key: load_mapping(spec, f, lookups) for f in spec.fields if f.table}
+
+        raw = df["No."].astype(str).tolist() if self.size else []
+        self.skus = [spec.normalize(s) for s in raw]
+        parsed = [spec.parse(s) for s in raw]
+        self.columns = {
+            f.key: [p[f.key] if p is not None else None for p in parsed] for f in spec.fields
+        }
+        self.labels = {key: self._labels(key) for key in self.mappings}
+
+        # inverted index แบบ bitmap: field → {code → int ที่ bit i = แถว i มีค่านี้}
+        # กรองหลาย field = AND ของ bitmap, ค่าที่เหลือใน dropdown = code ที่ bitmap AND แล้วไม่เป็น 0
+        self.bitmaps = {}
+        for f in spec.fields:
+            groups = {}
+            for i, v in enumerate(self.columns[f.key]):
+                if v is not None:
+                    groups.setdefault(v, []).append(i)
+            self.bitmaps[f.key] = {v: _bitmap(ix) for v, ix in sorted(groups.items())}
+        self.all_rows = (1 << self.size) - 1
+
+        self.items = self._build_items(df)
+        self.order = RowOrder(self.items, [k for k, _ in spec.item])
+
+    # ----------------------------------------
+    #  build
+    # ----------------------------------------
+    def _labels(self, key: str) -> list:
+        f = self.spec.field(key)
+        mapping = self.mappings[key]
+        codes = self.columns[key]
+        if f.scope:
+            codes = list(zip(self.columns[f.scope], codes))
+        if self.spec.label_fallback_code:
+            return [mapping.get(c, own) for c, own in zip(codes, self.columns[key])]
+        return [mapping.get(c, "") for c in codes]
+
+    def _source(self, df: pd.DataFrame, source: str) -> list:
+        if source == "sku":
+            return self.skus
+        if source == "onhand":
+            if "Inventory" not in df.columns:
+                return [0] * self.size
+            return pd.to_numeric(df["Inventory"], errors="coerce").fillna(0).astype(int).tolist()
+
+        kind, _, name = source.partition(":")
+        if kind == "field":
+            return self.columns[name]
+        if kind == "label":
+            return self.labels[name]
+        if kind == "col":
+            return _column(df, name)
+        if kind == "text":
+            return [str(v).strip() for v in _column(df, name)]
+        raise ValueError(f"unknown item source: {source}")
+
+    def _build_items(self, df: pd.DataFrame) -> list:
+        keys = [k for k, _ in self.spec.item]
+        values = [self._source(df, src) for _, src in self.spec.item]
+        return [dict(zip(keys, row)) for row in zip(*values)]
+
+    # ----------------------------------------
+    #  query
+    # ----------------------------------------
+    def select(self, filters: dict) -> int:
+        """bitmap ของแถวที่ตรงทุก filter — ค่าว่าง/None = ไม่กรอง"""
+        rows = self.all_rows
+        for f in self.spec.fields:
+            value = filters.get(f.key)
+            if not value:
+                continue
+            value = str(value).zfill(f.pad) if f.pad else str(value)
+            rows &= self.bitmaps[f.key].get(value, 0)
+            if not rows:
+                break
+        return rows
+
+    def items_for(self, filters: dict, page: Optional[ItemPage] = None, response: Optional[Response] = None) -> list:
+        """item dict ที่ตรง filter — page (limit/cursor/sort/fields) ส่งมาเมื่อ client ขอแบ่งหน้า"""
+        rows = self.select(filters)
+        if page is not None and page.requested:
+            selected = None if rows == self.all_rows else _positions(rows, self.size)
+            return page.apply(self.order, selected, response)
+        if rows == self.all_rows:
+            return list(self.items)
+        items = self.items
+        return [items[i] for i in _positions(rows, self.size)]
+
+    def master(self, filters: dict, counts: bool = False) -> dict:
+        """
+        code ที่เหลือของแต่ละ field หลังกรอง + ชื่อจาก mapping (ไม่มี → ใช้ code)
+        counts=True → ใส่ "count" = จำนวนสินค้าที่ตรง filter และมี code นั้น
+        """
+        rows = self.select(filters)
+        out = {}
+        for f in self.spec.fields:
+            if not f.facet:
+                continue
+            mapping = self.mappings.get(f.key, {})
+            facet = []
+            for code, bits in self.bitmaps[f.key].items():    # เรียง code ไว้แล้ว
+                hit = bits & rows
+                if not hit:
+                    continue
+                entry = {"code": code, "name": mapping.get(code, code)}
+                if counts:
+                    entry["count"] = hit.bit_count()
+                facet.append(entry)
+            out[f.facet] = facet
+        return out
+
+
+def get_family(spec: FamilySpec) -> FamilyIndex:
+    # ชื่อ mapping ฝังอยู่ใน item dict → key ต้องรวม version ของ lookup ด้วย
+    lookups = get_lookups()
+    return catalog.derived(
+        f"family:{spec.name}:{lookups.version}",
+        lambda snap: FamilyIndex(spec, snap.family(spec.prefix), lookups),
+    )
+
+
+def data_version() -> tuple:
+    """version ของข้อมูลที่ family router ใช้ (key ของ response cache)"""
+    return catalog.catalog_version(), get_lookups().version
+
+
+def options_response(spec: FamilySpec) -> Response:
+    """mapping ทั้งตาราง (ตามลำดับในตาราง) ไม่สนสินค้าที่มีจริง — JSON ทำไว้ล่วงหน้าต่อ version"""
+    facets = tuple((f.facet, f.table) for f in spec.fields if f.facet and f.table)
+    return Response(get_lookups().options_payload(facets), media_type="application/json")
@@ -0,0 +1,138 @@
+# startup_profile.py — จับเวลาช่วง start ของ process + warm-up cache หลังเปิด port
+#
+# - mark(name)   : จุดเช็คตอน import (เวลาตั้งแต่จุดก่อนหน้า) เช่น import router ทั้งหมด
+# - timed(fn)    : ครอบ startup hook → เวลาของ hook แต่ละตัว
+# - start_warmup(tasks) : โหลด cache ที่ request แรกต้องใช้ (lookup, tier ลูกค้า, catalog, index ค้นลูกค้า)
+#   STARTUP_WARMUP=background (default) → thread เบื้องหลัง, uvicorn เปิด port ได้ทันที
+#                  sync → ทำใน startup hook แบบเดิม (port เปิดหลังโหลดเสร็จ, error = start ไม่ขึ้น)
+#                  off  → ไม่ warm (โหลดตอน request แรก)
+#   request ที่มาก่อน warm-up เสร็จไม่พัง: cache ทุกตัวโหลดเองตอนใช้ (มี lock กันโหลดซ้อน → รอตัวที่กำลังโหลด)
+# - report()     : GET /api/startup
+#
+#   python startup_profile.py --top 25    # -X importtime ของ `import main` (module ที่ import ช้าสุด)
+import argparse
+import functools
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+WARMUP_MODE = os.getenv("STARTUP_WARMUP", "background").lower()
+
+log = logging.getLogger(__name__)
+
+_T0 = time.perf_counter()      # import module นี้ = บรรทัดแรกของ main.py
+_lock = threading.Lock()
+_last_mark = _T0
+_phases = []                   # [{"name", "start_ms", "ms"}] ตามลำดับที่จบ
+_state = {"ready_ms": None, "warmup": "pending", "warmup_ms": None, "errors": {}}
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+
+def _record(name: str, start: float, end: float):
+    with _lock:
+        _phases.append({"name": name, "start_ms": _ms(start - _T0), "ms": _ms(end - start)})
+
+
+def mark(name: str):
+    """บันทึกเวลาตั้งแต่ mark ก่อนหน้า (หรือตั้งแต่ import module นี้)"""
+    global _last_mark
+    now = time.perf_counter()
+    _record(name, _last_mark, now)
+    _last_mark = now
+
+
+def timed(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _record(f"startup:{fn.__name__}", t0, time.perf_counter())
+    return wrapper
+
+
+def mark_ready():
+    """startup hook ตัวสุดท้าย — หลังจากนี้ uvicorn เปิด port"""
+    _state["ready_ms"] = _ms(time.perf_counter() - _T0)
+    log.info("startup complete", extra={"ready_ms": _state["ready_ms"], "warmup": WARMUP_MODE})
+
+
+def _run_warmup(tasks, raise_errors: bool):
+    _state["warmup"] = "running"
+    t0 = time.perf_counter()
+    for name, fn in tasks:
+        t = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            if raise_errors:
+                raise
+            _state["errors"][name] = f"{type(e).__name__}: {e}"
+            log.exception("warm-up failed", extra={"task": name})
+        finally:
+            _record(f"warmup:{name}", t, time.perf_counter())
+    _state["warmup_ms"] = _ms(time.perf_counter() - t0)
+    _state["warmup"] = "done"
+    log.info("warm-up complete", extra={"warmup_ms": _state["warmup_ms"], "errors": len(_state["errors"])})
+
+
+def start_warmup(tasks):
+    """tasks = [(name, fn), ...] ทำตามลำดับ ตาม STARTUP_WARMUP"""
+    if WARMUP_MODE == "off":
+        _state["warmup"] = "off"
+    elif WARMUP_MODE == "sync":
+        _run_warmup(tasks, raise_errors=True)
+    else:
+        threading.Thread(target=_run_warmup, args=(tasks, False), name="startup-warmup", daemon=True).start()
+
+
+def report() -> dict:
+    with _lock:
+        phases = list(_phases)
+    return {"warmup_mode": WARMUP_MODE, **_state, "errors": dict(_state["errors"]), "phases": phases}
+
+
+# ============================
+# CLI: python -X importtime แล้วสรุป module ที่ใช้เวลา import มากสุด
+# ============================
+def import_profile(module: str = "main", depth: int = 2) -> list:
+    """[(cumulative_us, self_us, depth, name)] ของ module ที่ `import module` ดึงเข้ามา ลึกไม่เกิน depth
+    (depth 1 = import ตรงจาก module นั้น; package ที่หลาย module ใช้ นับที่ตัวแรกที่ import)"""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=Path(__file__).parent, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        level = (len(name) - len(name.lstrip()) - 1) // 2    # เยื้องทีละ 2 ช่องต่อชั้น
+        if level <= depth:
+            rows.append((int(cumulative_us), int(self_us), level, name.strip()))
+    return sorted(rows, reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python startup_profile.py")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--depth", type=int, default=2)
+    args = parser.parse_args()
+
+    rows = import_profile(args.module, args.depth)
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for cumulative, self_us, level, name in rows[:args.top]:
+        print(f"{cumulative / 1000:>10.1f}ms {self_us / 1000:>8.1f}ms  {'  ' * level}{name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+# conftest.py — ให้ test import module ของ backend ได้ตรง ๆ (แบบ uvicorn main:app ใน backend/)
+# และใช้ DB / Excel สำเนาใน temp dir (db_sqlite ตั้ง WAL / pricing / ใบเสนอราคาอาจเขียนไฟล์ — ห้ามแตะ data/ ของจริง)
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SOURCE_DB = Path(os.getenv("DB_FILE") or BACKEND_DIR / "data" / "Quetung.db")
+SOURCE_EXCEL = Path(os.getenv("EXCEL_FILE") or BACKEND_DIR / "data" / "QuoteTemplate.xlsx")
+
+_tmp = Path(tempfile.mkdtemp(prefix="quetung-test-"))
+shutil.copyfile(SOURCE_DB, _tmp / "Quetung.db")
+shutil.copyfile(SOURCE_EXCEL, _tmp / "QuoteTemplate.xlsx")
+os.environ["DB_FILE"] = str(_tmp / "Quetung.db")
+os.environ["EXCEL_FILE"] = str(_tmp / "QuoteTemplate.xlsx")
+
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_tmp, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def client():
+    """TestClient ของทั้งแอป (ไม่รัน startup → ไม่มี worker outbox / warmup)"""
+    import main
+    return TestClient(main.app, raise_server_exceptions=False)
@@ -0,0 +1,205 @@
+# test_cart_sessions.py — ตะกร้าที่ server จำไว้ (/api/pricing/carts)
+#
+# - หลังเพิ่ม / แก้ qty / ลบ / เปลี่ยนวิธีรับสินค้า: items + totals ต้องเท่ากับ /calculate ของตะกร้าเดียวกันทุกบิต
+#   (totals รวมด้วย numpy จากยอดต่อบรรทัด — ลำดับการบวกต้องตรงกับ Series.sum())
+# - หมดอายุตาม TTL_SECONDS, เกิน MAX_SESSIONS ทิ้งตัวที่ไม่ได้ใช้นานสุด, เกิน MAX_LINES ตอบ 422
+import os
+import random
+import sqlite3
+
+import pytest
+
+import cart_sessions
+
+
+@pytest.fixture(scope="module")
+def skus():
+    conn = sqlite3.connect(f"file:{os.environ['DB_FILE']}?mode=ro", uri=True)
+    try:
+        return [r[0] for r in conn.execute('SELECT "No." FROM "Items_Test" ORDER BY rowid')]
+    finally:
+        conn.close()
+
+
+@pytest.fixture(scope="module")
+def customer(client):
+    conn = sqlite3.connect(f"file:{os.environ['DB_FILE']}?mode=ro", uri=True)
+    try:
+        code = conn.execute('SELECT "Customer" FROM "Customer" WHERE "Accum6m" > 0 ORDER BY rowid LIMIT 1').fetchone()[0]
+    finally:
+        conn.close()
+    data = client.get("/api/customer/search", params={"code": code}).json()
+    return {"code": data["id"], **data, "shippingCustomerPay": 35}
+
+
+@pytest.fixture(autouse=True)
+def empty_store():
+    with cart_sessions._lock:
+        cart_sessions._sessions.clear()
+    yield
+    with cart_sessions._lock:
+        cart_sessions._sessions.clear()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cart_sessions, "time", fake)
+    return fake
+
+
+def _line(rnd, skus):
+    return {"sku": rnd.choice(skus), "qty": rnd.choice([1, 2, 3.5, 7, 12.25, 40]),
+            "name": "x", "price": rnd.choice([None, 18.75])}
+
+
+class CartDriver:
+    """ยิง /carts และจำตะกร้าฝั่ง client ไว้เทียบกับ /calculate"""
+
+    def __init__(self, client, customer_data, delivery, breakdown, lines):
+        self.client = client
+        self.customer_data = customer_data
+        self.delivery = delivery
+        self.breakdown = breakdown
+        r = client.post("/api/pricing/carts", json={
+            "customerData": customer_data, "deliveryType": delivery, "cart": lines, "markupBreakdown": breakdown,
+        })
+        assert r.status_code == 200, r.text
+        self.cart_id = r.json()["cart_id"]
+        self.lines = dict(zip(sorted({i["line_id"] for i in r.json()["items"]}), lines))
+
+    def add(self, line):
+        r = self.client.post(f"/api/pricing/carts/{self.cart_id}/lines", json=line)
+        assert r.status_code == 200, r.text
+        self.lines[max(item["line_id"] for item in r.json()["items"])] = line
+
+    def set_qty(self, line_id, qty):
+        r = self.client.patch(f"/api/pricing/carts/{self.cart_id}/lines/{line_id}", json={"qty": qty})
+        assert r.status_code == 200, r.text
+        self.lines[line_id] = dict(self.lines[line_id], qty=qty)
+
+    def remove(self, line_id):
+        r = self.client.delete(f"/api/pricing/carts/{self.cart_id}/lines/{line_id}")
+        assert r.status_code == 200, r.text
+        del self.lines[line_id]
+
+    def set_delivery(self, delivery):
+        r = self.client.put(f"/api/pricing/carts/{self.cart_id}/delivery", json={"deliveryType": delivery})
+        assert r.status_code == 200, r.text
+        self.delivery = delivery
+
+    def check(self):
+        r = self.client.get(f"/api/pricing/carts/{self.cart_id}")
+        assert r.status_code == 200, r.text
+        session = r.json()
+        assert session["lines"] == len(self.lines)
+        expected = self.client.post("/api/pricing/calculate", json={
+            "customerData": self.customer_data, "deliveryType": self.delivery,
+            "cart": list(self.lines.values()), "markupBreakdown": self.breakdown,
+        })
+        assert expected.status_code == 200, expected.text
+        expected = expected.json()
+
+        items = [{k: v for k, v in item.items() if k != "line_id"} for item in session["items"]]
+        assert items == expected["items"]
+        # == ของ float ที่ถอดจาก JSON = เท่ากันทุกบิต (repr ของ float แปลงกลับได้ค่าเดิมเสมอ)
+        assert session["totals"] == expected["totals"]
+        assert session["customer_tier"] == expected["customer_tier"]
+
+
+@pytest.mark.parametrize("breakdown", [False, True])
+def test_totals_bit_identical_to_calculate(client, skus, customer, breakdown):
+    rnd = random.Random(3 + breakdown)
+    # > 128 บรรทัด → numpy รวมแบบ pairwise หลายก้อน
+    cart = CartDriver(client, customer, "DELIVERY", breakdown, [_line(rnd, skus) for _ in range(150)])
+    cart.check()
+
+    for step in range(60):
+        op = rnd.random()
+        if op < 0.4 or len(cart.lines) < 5:
+            cart.add(_line(rnd, skus))
+        elif op < 0.75:
+            cart.set_qty(rnd.choice(list(cart.lines)), rnd.choice([0.5, 4, 9.75, 33]))
+        else:
+            cart.remove(rnd.choice(list(cart.lines)))
+        if step % 10 == 9:
+            cart.check()
+
+    cart.set_delivery("PICKUP")
+    cart.check()
+
+
+def test_default_price_cart_matches_calculate(client, skus):
+    # ไม่มีรหัสลูกค้า → ราคา R2
+    rnd = random.Random(9)
+    cart = CartDriver(client, {"code": "", "shippingCustomerPay": 20}, "PICKUP", False,
+                      [_line(rnd, skus) for _ in range(40)])
+    cart.check()
+    for line_id in list(cart.lines)[::3]:
+        cart.set_qty(line_id, 6)
+    cart.remove(list(cart.lines)[0])
+    cart.add(_line(rnd, skus))
+    cart.check()
+
+
+def test_session_expires_after_ttl(client, skus, customer, clock, monkeypatch):
+    monkeypatch.setattr(cart_sessions, "TTL_SECONDS", 60.0)
+    cart = CartDriver(client, customer, "PICKUP", False, [_line(random.Random(1), skus)])
+    url = f"/api/pricing/carts/{cart.cart_id}"
+
+    # ใช้อยู่เรื่อย ๆ → อายุนับใหม่ทุกครั้ง
+    for _ in range(3):
+        clock.now += 50
+        assert client.get(url).status_code == 200
+
+    expired = cart_sessions.stats()["expired"]
+    clock.now += 61
+    assert client.get(url).status_code == 404
+    assert client.post(f"{url}/lines", json=_line(random.Random(2), skus)).status_code == 404
+    assert cart_sessions.stats()["expired"] == expired + 1
+    assert cart_sessions.stats()["sessions"] == 0
+
+
+def test_max_sessions_evicts_least_recently_used(client, skus, customer, monkeypatch):
+    monkeypatch.setattr(cart_sessions, "MAX_SESSIONS", 3)
+    line = [_line(random.Random(4), skus)]
+    evicted = cart_sessions.stats()["evicted"]
+
+    first, second, third = (CartDriver(client, customer, "PICKUP", False, line).cart_id for _ in range(3))
+    assert client.get(f"/api/pricing/carts/{first}").status_code == 200     # first ถูกใช้ล่าสุด
+    fourth = CartDriver(client, customer, "PICKUP", False, line).cart_id
+
+    assert client.get(f"/api/pricing/carts/{second}").status_code == 404
+    for cart_id in (first, third, fourth):
+        assert client.get(f"/api/pricing/carts/{cart_id}").status_code == 200
+    stats = cart_sessions.stats()
+    assert stats["sessions"] == 3
+    assert stats["evicted"] == evicted + 1
+
+
+def test_max_lines_rejected(client, skus, customer, monkeypatch):
+    monkeypatch.setattr(cart_sessions, "MAX_LINES", 5)
+    rnd = random.Random(6)
+    body = {"customerData": customer, "deliveryType": "PICKUP", "markupBreakdown": False}
+
+    r = client.post("/api/pricing/carts", json={**body, "cart": [_line(rnd, skus) for _ in range(6)]})
+    assert r.status_code == 422
+    assert cart_sessions.stats()["sessions"] == 0
+
+    cart = CartDriver(client, customer, "PICKUP", False, [_line(rnd, skus) for _ in range(5)])
+    r = client.post(f"/api/pricing/carts/{cart.cart_id}/lines", json=_line(rnd, skus))
+    assert r.status_code == 422
+    # ตะกร้าเดิมไม่เปลี่ยน แก้ qty / ลบแล้วเพิ่มใหม่ได้ตามปกติ
+    cart.check()
+    cart.set_qty(list(cart.lines)[0], 8)
+    cart.remove(list(cart.lines)[-1])
+    cart.add(_line(rnd, skus))
+    cart.check()
@@ -0,0 +1,31 @@
+# test_family_routers.py — router ตระกูล SKU (sku_family.FamilySpec) ต้องตอบเหมือน router เดิมก่อนย้ายมาใช้ FamilyIndex
+#
+# fixtures/family_routers_legacy.json.gz = ผลของ router เดิม (commit ก่อน sku_family, ดู "generated_from")
+# รันบน DB ชุดเดียวกับ data/Quetung.db: ทุก GET endpoint (/master /options /items, glass /list) ของ
+# glass / aluminium / cline / accessories / sealant / gypsum × filter
+#   - ไม่กรอง / code ที่พบบ่อย 3 ตัวต่อ facet / code ที่ตัด 0 หน้า (zfill) / ตัวพิมพ์เล็ก / มีช่องว่าง / code ที่ไม่มี
+#   - 2–3 facet พร้อมกันจากสินค้าจริง
+# เทียบทั้งค่าและลำดับ key (ลำดับ key ของแถว /items เป็นส่วนหนึ่งของ response เดิม)
+import gzip
+import json
+from pathlib import Path
+
+import pytest
+
+FIXTURE = Path(__file__).resolve().parent / "fixtures" / "family_routers_legacy.json.gz"
+
+
+def _ordered(raw):
+    # dict → list ของ (key, value) เพื่อให้ == เทียบลำดับ key ด้วย
+    return json.loads(raw, object_pairs_hook=list)
+
+
+with gzip.open(FIXTURE, "rt", encoding="utf-8") as f:
+    LEGACY = json.load(f)["responses"]
+
+
+@pytest.mark.parametrize("url", list(LEGACY))
+def test_matches_legacy_router(client, url):
+    r = client.get(url)
+    assert r.status_code == 200, r.text
+    assert _ordered(r.content) == _ordered(json.dumps(LEGACY[url], ensure_ascii=False))
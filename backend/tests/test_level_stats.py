@@ -0,0 +1,77 @@
+# test_level_stats.py — LevelPrice.load_stats(): STATS กับ STATS_MTIME (stats_version) ต้องชี้ไฟล์เดียวกันเสมอ
+#
+# - ระหว่าง parse ไฟล์ใหม่ คนอื่นยังเห็น version เดิม (สลับคู่กันหลัง parse สำเร็จ)
+# - ไฟล์เสีย → ใช้ค่าชุดเดิม + version เดิมต่อ, ไฟล์ดีตัวถัดไปโหลดได้ตามปกติ
+import json
+import os
+
+import pytest
+
+import LevelPrice
+
+
+def _write(path, stats: dict, mtime_ns: int):
+    path.write_text(json.dumps([stats]))
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.fixture
+def stats_file(monkeypatch, tmp_path):
+    path = tmp_path / "mean_sd.json"
+    monkeypatch.setattr(LevelPrice, "JSON_PATH", path)
+    # ไม่ให้ค่าที่โหลดใน test นี้ค้างไปถึง test อื่น (ไฟล์จริงโหลดใหม่เพราะ mtime ไม่ตรง)
+    monkeypatch.setattr(LevelPrice, "STATS", LevelPrice.STATS)
+    monkeypatch.setattr(LevelPrice, "STATS_MTIME", LevelPrice.STATS_MTIME)
+    monkeypatch.setattr(LevelPrice, "_failed_mtime", None)
+    return path
+
+
+def test_version_switches_only_after_parse(stats_file, monkeypatch):
+    _write(stats_file, {"tenure_mean": 1.0}, 1_000_000_000)
+    assert LevelPrice.load_stats() == {"tenure_mean": 1.0}
+    assert LevelPrice.stats_version() == 1_000_000_000
+
+    _write(stats_file, {"tenure_mean": 2.0}, 2_000_000_000)
+    real_load = json.load
+    seen = []
+
+    def slow_load(f):
+        # ระหว่าง parse: ค่าที่คนอื่นอ่านได้ยังเป็นคู่เดิม
+        seen.append((LevelPrice.STATS, LevelPrice.STATS_MTIME))
+        return real_load(f)
+
+    monkeypatch.setattr(LevelPrice.json, "load", slow_load)
+    assert LevelPrice.load_stats() == {"tenure_mean": 2.0}
+    assert seen == [({"tenure_mean": 1.0}, 1_000_000_000)]
+    assert LevelPrice.stats_version() == 2_000_000_000
+
+
+def test_broken_file_keeps_previous_stats(stats_file, monkeypatch):
+    _write(stats_file, {"tenure_mean": 1.0}, 1_000_000_000)
+    LevelPrice.load_stats()
+
+    # เขียนค้างครึ่งไฟล์
+    stats_file.write_text('[{"tenure_mean": 3.')
+    os.utime(stats_file, ns=(3_000_000_000, 3_000_000_000))
+    assert LevelPrice.load_stats() == {"tenure_mean": 1.0}
+    assert LevelPrice.stats_version() == 1_000_000_000
+
+    # mtime เดิมที่อ่านพังแล้วไม่อ่านซ้ำทุก request
+    reads = []
+    real_open = open
+    with monkeypatch.context() as mp:
+        mp.setattr("builtins.open", lambda *a, **k: reads.append(a) or real_open(*a, **k))
+        LevelPrice.load_stats()
+    assert reads == []
+
+    _write(stats_file, {"tenure_mean": 4.0}, 4_000_000_000)
+    assert LevelPrice.load_stats() == {"tenure_mean": 4.0}
+    assert LevelPrice.stats_version() == 4_000_000_000
+
+
+def test_missing_file_is_empty_stats(stats_file):
+    _write(stats_file, {"tenure_mean": 1.0}, 1_000_000_000)
+    LevelPrice.load_stats()
+    stats_file.unlink()
+    assert LevelPrice.load_stats() == {}
+    assert LevelPrice.stats_version() is None
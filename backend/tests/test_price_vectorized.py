@@ -0,0 +1,239 @@
+# test_price_vectorized.py — Price() แบบ vectorized ต้องได้ผลเท่ากับแบบเดิม (df.apply ทีละแถว) ทุกบิต
+#
+# reference = price.py ก่อน vectorize (ตัด print "TIER USED" ออกเท่านั้น)
+# ข้อมูล = ทุกแถวของ Items_Test × ทุก tier × ทุกเงื่อนไขเครดิต (qty / ยอดซื้อ / วิธีรับสินค้า / ราคาใน cart
+# สลับกันไปตามแถว รวมค่าเสีย ๆ ที่ float() แปลงไม่ได้)
+import copy
+import itertools
+import math
+import os
+import re
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import price
+import pricing_model
+
+DB_FILE = Path(os.getenv("DB_FILE") or Path(__file__).resolve().parent.parent / "data" / "Quetung.db")
+
+
+# =====================================================
+# reference: Price() แบบเดิม (ทีละแถว)
+# =====================================================
+W_QTY = 0.3382
+W_E = 0.3971
+W_SHIP = 0.2647
+
+INTERP_COLS = {
+    "R2->R1": ("priceR1", "priceR2"),
+    "R1->W2": ("priceW2", "priceR1"),
+    "W2->W1": ("priceW1", "priceW2"),
+    "W1->P": ("priceP", "priceW1"),
+    "P->P": ("priceP", "priceP"),
+}
+DEFAULT_COLS = ("priceR2", "priceR1")
+
+TERM_MARKUP = {0: 0.000, 15: 0.003, 30: 0.006, 45: 0.009, 60: 0.012, 90: 0.015}
+
+
+def _legacy_score_qty01(qty, pkg_size):
+    try:
+        qty_f = float(qty)
+        pkg_size_f = float(pkg_size)
+        if pd.isna(pkg_size_f) or pkg_size_f == 0:
+            return 0.0
+        return min(qty_f / pkg_size_f, 1.0)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def _legacy_score_e01(e_val):
+    try:
+        e = float(e_val)
+        if pd.isna(e):
+            return 0.0
+        return min(np.log1p(e) / 13.0, 1.0)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def _legacy_score_ship01(ship_val):
+    try:
+        if str(ship_val).strip() == "1":
+            return 1.0
+    except Exception:
+        pass
+    return 0.0
+
+
+def _legacy_calc_score01(row, col_qty, col_e, col_ship, col_sdm):
+    qty01 = _legacy_score_qty01(row.get(col_qty), row.get(col_sdm))
+    e01 = _legacy_score_e01(row.get(col_e))
+    ship01 = _legacy_score_ship01(row.get(col_ship))
+    return qty01, e01, ship01, (qty01 * W_QTY + e01 * W_E + ship01 * W_SHIP)
+
+
+def _legacy_interp(df):
+    """Price() เดิมก่อนปัดราคา (NewPrice ยังไม่ ceil) + _Fallback = แถวที่ใช้ราคาจาก cart"""
+    col_qty = price._pick_col(df, price.CAND_QTY) or price.CAND_QTY[0]
+    col_e = price._pick_col(df, price.CAND_E) or price.CAND_E[0]
+    col_ship = price._pick_col(df, price.CAND_SHIPMENT) or price.CAND_SHIPMENT[0]
+    col_sdm = price._pick_col(df, price.CAND_SDM)
+
+    scores = df.apply(lambda r: _legacy_calc_score01(r, col_qty, col_e, col_ship, col_sdm),
+                      axis=1, result_type="expand")
+    scores.columns = ["_QtyScore", "_EScore", "_ShipScore", "_Score01"]
+    out = pd.concat([df.reset_index(drop=True), scores], axis=1)
+
+    def _interp_price(row):
+        score = row["_Score01"]
+        raw = str(row.get(price.COL_TIER, ""))
+        tier = (
+            raw.replace("→", "->").replace("–", "-").replace("—", "-")
+            .replace(" ", "").replace("\n", "").replace("\r", "").strip().upper()
+        )
+        col_low, col_high = INTERP_COLS.get(tier, DEFAULT_COLS)
+        try:
+            low_price = float(row.get(col_low))
+            high_price = float(row.get(col_high))
+            if pd.isna(low_price) or pd.isna(high_price):
+                return row.get("price"), True
+        except Exception:
+            return row.get("price"), True
+        new_price = low_price + (high_price - low_price) * (1 - score)
+        if pd.isna(new_price):
+            return row.get("price"), True
+        return new_price, False
+
+    result = out.apply(_interp_price, axis=1)
+    out["NewPrice"] = [p for p, _ in result]
+    out["_Fallback"] = [f for _, f in result]
+    return out
+
+
+def legacy_price(df):
+    out = _legacy_interp(df).drop(columns="_Fallback")
+    out["NewPrice"] = out["NewPrice"].apply(lambda x: math.ceil(float(x or 0) * 100) / 100)
+    return out
+
+
+def legacy_term_markup(term) -> float:
+    # _apply_payment_term_markup เดิม (ตอนนั้นยังไม่ได้ถูกเรียกใช้)
+    term = str(term or "").strip().lower()
+    nums = re.findall(r"\d+", term)
+    days = None
+    if nums:
+        days = max(int(n) for n in nums)
+    elif any(k in term for k in ["cash", "cod"]):
+        days = 0
+    return TERM_MARKUP.get(days, 0.0)
+
+
+# =====================================================
+# ข้อมูล
+# =====================================================
+TIERS = ["R2->R1", "R1->W2", "W2->W1", "W1->P", "P->P",
+         "r2 → r1", " W2—W1\n", "Unknown", 0, None]
+TERMS = ["0", "7", "15", "20", "30", "45", "60", "90", "NET 30 DAYS", "30.0", "CREDIT60", "cash", "COD", "", None]
+
+SCORE_COLS = ["_QtyScore", "_EScore", "_ShipScore", "_Score01", "NewPrice"]
+
+
+@pytest.fixture(scope="module")
+def catalog_rows() -> pd.DataFrame:
+    # อ่านตรงจากไฟล์แบบ read-only (ไม่ผ่าน pool) แล้วตั้งชื่อคอลัมน์แบบ items.py
+    conn = sqlite3.connect(f"file:{DB_FILE}?mode=ro", uri=True)
+    try:
+        df = pd.read_sql('SELECT * FROM "Items_Test"', conn)
+    finally:
+        conn.close()
+    df = df.rename(columns={"No.": "sku", "Description": "name", "Package Size": "pkg_size"})
+    for tier in ("R1", "R2", "W1", "W2"):
+        df[f"price{tier}"] = df[tier]
+    return df
+
+
+@pytest.fixture(scope="module")
+def cart(catalog_rows) -> pd.DataFrame:
+    """Items_Test ทุกแถว × ทุก (tier, เครดิต)"""
+    combos = list(itertools.product(TIERS, TERMS))
+    df = catalog_rows.loc[np.tile(catalog_rows.index, len(combos))].reset_index(drop=True)
+    n = len(df)
+    i = np.arange(n)
+    df["_Tier_Z"] = np.repeat(np.array([t for t, _ in combos], dtype=object), len(catalog_rows))
+    df["payment_terms"] = np.repeat(np.array([p for _, p in combos], dtype=object), len(catalog_rows))
+
+    # qty: ต่ำกว่า / เกิน pkg_size, 0, ติดลบ และข้อความที่แปลงไม่ได้
+    qty = (i % 23) * 7.5
+    df["Quantity"] = np.where(i % 97 == 0, -3.0, qty).astype(object)
+    df.loc[i % 101 == 0, "Quantity"] = "abc"
+    df.loc[i % 103 == 0, "Quantity"] = None
+    # pkg_size 0 / NaN บางแถว
+    df.loc[i % 89 == 0, "pkg_size"] = 0
+    df.loc[i % 83 == 0, "pkg_size"] = np.nan
+    # ยอดซื้อหมวด (E score) รวมค่าที่ log1p เกิน 13
+    sales = np.where(i % 5 == 0, 0.0, (i % 31) * 25_000.0)
+    df["_RelevantSales"] = np.where(i % 7 == 0, 1e7, sales).astype(object)
+    df.loc[i % 79 == 0, "_RelevantSales"] = None
+    df["DeliveryType"] = np.where(i % 3 == 0, "1", "0")
+    # ราคาใน cart (ใช้เมื่อ interpolate ไม่ได้ เช่น tier ที่ต้องใช้ priceP ซึ่ง Items_Test ไม่มี)
+    df["price"] = np.round(df["priceR2"].fillna(0).to_numpy() * 1.05, 2)
+    # ราคาเสีย / หายบางแถว
+    df.loc[i % 71 == 0, "priceR1"] = np.nan
+    df.loc[i % 67 == 0, "priceW2"] = np.nan
+    return df
+
+
+def _model(markup: bool) -> pricing_model.PricingModel:
+    config = copy.deepcopy(pricing_model.DEFAULT_CONFIG)
+    config["payment_terms"]["enabled"] = markup
+    return pricing_model.compile_config(config, "test")
+
+
+def _assert_same(actual: pd.Series, expected: pd.Series, name: str):
+    a = actual.to_numpy(dtype=np.float64)
+    e = expected.to_numpy(dtype=np.float64)
+    # bit-identical (NaN ตำแหน่งเดียวกัน)
+    diff = np.flatnonzero(~((a == e) | (np.isnan(a) & np.isnan(e))))
+    assert diff.size == 0, f"{name}: ต่าง {diff.size} แถว เช่นแถว {diff[:5].tolist()} ได้ {a[diff[:5]]} ควรเป็น {e[diff[:5]]}"
+
+
+# =====================================================
+# tests
+# =====================================================
+def test_cart_covers_every_item_tier_and_term(cart, catalog_rows):
+    assert len(cart) == len(catalog_rows) * len(TIERS) * len(TERMS)
+    pairs = cart.groupby(["sku", cart["_Tier_Z"].astype(str), cart["payment_terms"].astype(str)]).size()
+    assert len(pairs) == catalog_rows["sku"].nunique() * len(TIERS) * len(TERMS)
+
+
+def test_matches_legacy_rowwise(cart):
+    expected = legacy_price(cart)
+    actual = price.Price(cart, _model(markup=False))
+
+    assert len(actual) == len(expected)
+    for col in SCORE_COLS:
+        _assert_same(actual[col], expected[col], col)
+    pd.testing.assert_frame_equal(actual[cart.columns], expected[cart.columns])
+
+
+def test_payment_term_markup_matches_legacy_mapping(cart):
+    unrounded = _legacy_interp(cart)
+    model = _model(markup=True)
+    actual = price.Price(cart, model)
+
+    # แถวที่ใช้ราคาจาก cart ไม่บวก markup
+    fallback = unrounded["_Fallback"].to_numpy(dtype=bool)
+    markup = np.where(fallback, 0.0, cart["payment_terms"].map(legacy_term_markup).to_numpy(dtype=np.float64))
+    base = np.array([float(x or 0) for x in unrounded["NewPrice"]])
+    marked = np.where(markup != 0, np.round(base * (1 + markup), 6), base)
+    expected = pd.Series([math.ceil(x * 100) / 100 for x in marked])
+
+    assert fallback.any() and (markup != 0).any()
+    _assert_same(actual["_PaymentTermMarkup"], pd.Series(markup), "_PaymentTermMarkup")
+    _assert_same(actual["_BasePrice"], legacy_price(cart)["NewPrice"], "_BasePrice")
+    _assert_same(actual["NewPrice"], expected, "NewPrice")
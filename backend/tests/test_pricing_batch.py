@@ -0,0 +1,125 @@
+# test_pricing_batch.py — /calculate-batch ต้องตอบแต่ละ job เหมือนยิง /calculate ทีละ job
+#
+# - บรรทัด NDJSON {"index": i, "result": ...} = body ของ /calculate (serialize แบบเดียวกัน) ทุกตัวอักษร
+# - job ที่ /calculate ตอบ error → บรรทัดนั้นเป็น {"index": i, "error": ...} แต่ job อื่นใน chunk ยังได้ผล
+#   (ทั้ง chunk พัง → ถอยไปคำนวณทีละ job)
+import json
+import os
+import random
+import sqlite3
+
+import pytest
+
+import pricing_router
+
+FAIL_CODE = "__FAIL__"
+
+
+@pytest.fixture(scope="module")
+def jobs(client):
+    conn = sqlite3.connect(f"file:{os.environ['DB_FILE']}?mode=ro", uri=True)
+    try:
+        skus = [r[0] for r in conn.execute('SELECT "No." FROM "Items_Test" ORDER BY rowid')]
+        codes = [r[0] for r in conn.execute('SELECT "Customer" FROM "Customer" ORDER BY rowid LIMIT 12')]
+    finally:
+        conn.close()
+
+    rnd = random.Random(5)
+    customers = [client.get("/api/customer/search", params={"code": code}).json() for code in codes]
+    customers = [{"code": c["id"], **c} for c in customers]
+
+    def cart(n):
+        return [
+            {"sku": rnd.choice(skus + ["UNKNOWN-SKU"]), "qty": rnd.choice([1, 2.5, 10, 0]),
+             "name": "x", "price": rnd.choice([None, 12.5])}
+            for _ in range(n)
+        ]
+
+    out = []
+    for i, customer in enumerate(customers):
+        out.append({"customerData": dict(customer, shippingCustomerPay=rnd.choice([0, 50])),
+                    "deliveryType": rnd.choice(["PICKUP", "DELIVERY"]),
+                    "cart": cart(rnd.randint(1, 12)),
+                    "markupBreakdown": i % 3 == 0})
+    # ไม่มีรหัสลูกค้า (ราคา R2) / ลูกค้าที่ไม่มีในตาราง / ตะกร้าว่าง / job ที่คำนวณไม่ได้
+    out.append({"customerData": {"code": ""}, "deliveryType": "PICKUP", "cart": cart(5)})
+    out.append({"customerData": {"code": "ZZ-NEW", "gen_bus": "W", "accum_6m": "250000"},
+                "deliveryType": "DELIVERY", "cart": cart(4)})
+    out.append({"customerData": {"code": codes[0]}, "deliveryType": "PICKUP", "cart": []})
+    out.append({"customerData": dict(customers[1], code=FAIL_CODE), "deliveryType": "PICKUP", "cart": cart(3)})
+    rnd.shuffle(out)
+    return out
+
+
+@pytest.fixture
+def failing_job(monkeypatch):
+    """job ที่ customer code = FAIL_CODE ทำให้ทั้ง /calculate และ _price_jobs ที่มี job นั้นพัง"""
+    real_price_jobs = pricing_router._price_jobs
+    real_price_cart = pricing_router._price_cart
+    real_price_cart_cached = pricing_router._price_cart_cached
+
+    def _check(job):
+        if pricing_router._customer_code(job) == FAIL_CODE:
+            raise RuntimeError("pricing failed")
+
+    def price_jobs(jobs, *args, **kwargs):
+        for job in jobs:
+            _check(job)
+        return real_price_jobs(jobs, *args, **kwargs)
+
+    def price_cart(job, *args, **kwargs):
+        _check(job)
+        return real_price_cart(job, *args, **kwargs)
+
+    def price_cart_cached(job, *args, **kwargs):
+        _check(job)
+        return real_price_cart_cached(job, *args, **kwargs)
+
+    monkeypatch.setattr(pricing_router, "_price_jobs", price_jobs)
+    monkeypatch.setattr(pricing_router, "_price_cart", price_cart)
+    monkeypatch.setattr(pricing_router, "_price_cart_cached", price_cart_cached)
+
+
+def _single(client, jobs):
+    out = []
+    for job in jobs:
+        r = client.post("/api/pricing/calculate", json=job)
+        out.append((r.status_code, r.content.decode("utf-8")))
+    return out
+
+
+def _batch(client, jobs):
+    r = client.post("/api/pricing/calculate-batch", json={"jobs": jobs})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in r.text.splitlines()]
+
+
+def _assert_lines_match(single, lines):
+    assert [line["index"] for line in lines] == list(range(len(single)))
+    for (status, body), line in zip(single, lines):
+        if status != 200:
+            assert "error" in line and "result" not in line, line
+            continue
+        assert "error" not in line, line
+        got = json.dumps(line["result"], ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+        assert got == body
+
+
+def test_batch_matches_single_jobs(client, jobs, failing_job):
+    single = _single(client, jobs)
+    assert any(status != 200 for status, _ in single)
+    assert sum(status == 200 for status, _ in single) >= len(jobs) - 2
+
+    _assert_lines_match(single, _batch(client, jobs))
+
+
+def test_batch_retries_job_by_job_across_chunks(client, jobs, failing_job, monkeypatch):
+    # chunk เล็ก → job ที่พังอยู่กลาง chunk หนึ่ง, chunk อื่นไม่ต้อง retry
+    monkeypatch.setattr(pricing_router, "BATCH_CHUNK_SIZE", 4)
+    single = _single(client, jobs)
+    lines = _batch(client, jobs)
+
+    _assert_lines_match(single, lines)
+    failed = [line["index"] for line in lines if "error" in line]
+    assert [jobs[i]["customerData"]["code"] for i in failed].count(FAIL_CODE) == 1
@@ -0,0 +1,74 @@
+# test_quotation_list.py — GET /api/quotation แบบแบ่งหน้า (limit + X-Next-Cursor)
+#
+# เดินทุกหน้าแล้วต้องได้ครบทุกใบ ไม่ซ้ำ ลำดับเดียวกับแบบไม่แบ่งหน้า — รวมใบที่ LastUpdate เป็น NULL
+# (ใช้ CreateDate แทน) และใบที่เวลาเท่ากัน (ตัดสินด้วย QuoteNo)
+import pytest
+
+import quotation
+from db_sqlite import read_conn, write_conn
+
+BRANCH = "LIST-T1"
+
+
+@pytest.fixture(scope="module", autouse=True)
+def headers():
+    quotation.ensure_indexes()
+    rows = [
+        ("LT-0001", "2025-01-05T10:00:00", "2025-01-05T10:00:00"),
+        ("LT-0002", "2025-01-06T10:00:00", None),
+        ("LT-0003", "2025-01-04T10:00:00", "2025-01-07T09:00:00"),
+        ("LT-0004", "2025-01-07T09:00:00", "2025-01-07T09:00:00"),
+        ("LT-0005", "2025-01-03T10:00:00", None),
+        ("LT-0006", None, None),
+        ("LT-0007", "2025-01-06T10:00:00", ""),
+        ("LT-0008", "2025-01-02T10:00:00", None),
+    ]
+    with write_conn() as conn:
+        conn.executemany(
+            "INSERT INTO Quote_Header (QuoteNo, Status, BranchCode, CreateDate, LastUpdate) VALUES (?, 'draft', ?, ?, ?)",
+            [(q, BRANCH, created, updated) for q, created, updated in rows],
+        )
+    yield
+    with write_conn() as conn:
+        conn.execute("DELETE FROM Quote_Header WHERE BranchCode = ?", (BRANCH,))
+
+
+def _pages(client, limit, **params):
+    out, cursor = [], None
+    for _ in range(100):
+        query = {"limit": limit, "summary": "true", **params}
+        if cursor:
+            query["cursor"] = cursor
+        r = client.get("/api/quotation", params=query)
+        assert r.status_code == 200, r.text
+        out.extend(q["quoteNo"] for q in r.json())
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            return out
+    raise AssertionError("cursor ไม่จบ")
+
+
+def test_null_last_update_ordered_by_create_date(client):
+    r = client.get("/api/quotation", params={"branch": BRANCH, "summary": "true"})
+    assert [q["quoteNo"] for q in r.json()] == [
+        "LT-0004", "LT-0003", "LT-0002", "LT-0001", "LT-0005", "LT-0008", "LT-0007", "LT-0006",
+    ]
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 7])
+def test_pages_cover_every_quote_once(client, limit):
+    full = [q["quoteNo"] for q in client.get("/api/quotation", params={"summary": "true"}).json()]
+    assert _pages(client, limit) == full
+    branch_full = [q["quoteNo"] for q in client.get(
+        "/api/quotation", params={"branch": BRANCH, "summary": "true"}).json()]
+    assert _pages(client, limit, branch=BRANCH) == branch_full
+    assert len(branch_full) == 8
+
+
+def test_cursor_uses_list_order_index():
+    sql = (f"SELECT * FROM Quote_Header WHERE {quotation.LIST_ORDER_SQL} <= ? "
+           f"AND ({quotation.LIST_ORDER_SQL}, QuoteNo) < (?, ?) "
+           f"ORDER BY {quotation.LIST_ORDER_SQL} DESC, QuoteNo DESC LIMIT 5")
+    with read_conn() as conn:
+        plan = " ".join(r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, ["2025", "2025", "Z"]))
+    assert "idx_quote_header_listorder" in plan and "SEARCH" in plan
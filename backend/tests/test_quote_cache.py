@@ -0,0 +1,270 @@
+# test_quote_cache.py — /calculate ที่ใช้ quote_cache ต้องตอบเหมือนคำนวณใหม่ทั้งตะกร้า (QUOTE_CACHE_MAX_ENTRIES=0)
+#
+# - ยิงซ้ำ (hit ทุกบรรทัด) = ผลครั้งแรก = ผลตอนปิด cache
+# - catalog / pricing model / mean_sd.json / ปี เปลี่ยน → ล้าง cache แล้วได้ผลตามข้อมูลใหม่
+# - แก้ข้อมูลลูกค้า 2 ราย (ในตาราง Customer + customerData ที่ FE ส่ง) → ผลเท่ากับตอนปิด cache
+import copy
+import json
+import os
+import random
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import customer_tier
+import LevelPrice
+import pricing_model
+import pricing_router
+import quote_cache
+from db_sqlite import write_conn
+
+
+def _ro_conn():
+    return sqlite3.connect(f"file:{os.environ['DB_FILE']}?mode=ro", uri=True)
+
+
+@pytest.fixture(scope="module")
+def skus():
+    conn = _ro_conn()
+    try:
+        return [r[0] for r in conn.execute('SELECT "No." FROM "Items_Test" ORDER BY rowid')]
+    finally:
+        conn.close()
+
+
+@pytest.fixture(scope="module")
+def customer_codes():
+    conn = _ro_conn()
+    try:
+        return [r[0] for r in conn.execute('SELECT "Customer" FROM "Customer" ORDER BY rowid LIMIT 6')]
+    finally:
+        conn.close()
+
+
+def _jobs(client, customer_codes, skus) -> list:
+    rnd = random.Random(11)
+    jobs = []
+    for i, code in enumerate(customer_codes):
+        customer = client.get("/api/customer/search", params={"code": code}).json()
+        cart = [
+            {"sku": sku, "qty": rnd.choice([1, 3, 12.5]), "name": "x", "price": rnd.choice([None, 15.0])}
+            for sku in rnd.sample(skus, 8)
+        ]
+        jobs.append({
+            "customerData": {"code": customer["id"], **customer},
+            "deliveryType": "PICKUP" if i % 2 else "DELIVERY",
+            "cart": cart,
+            "markupBreakdown": i % 3 == 0,
+        })
+    return jobs
+
+
+@pytest.fixture
+def jobs(client, customer_codes, skus):
+    return _jobs(client, customer_codes, skus)
+
+
+@pytest.fixture(autouse=True)
+def cache_on(monkeypatch):
+    monkeypatch.setattr(quote_cache, "MAX_ENTRIES", 20000)
+    quote_cache.clear()
+    yield
+    quote_cache.clear()
+
+
+def _run(client, jobs) -> list:
+    out = []
+    for job in jobs:
+        r = client.post("/api/pricing/calculate", json=job)
+        assert r.status_code == 200, r.text
+        out.append(r.content)
+    return out
+
+
+def _run_uncached(client, jobs) -> list:
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(quote_cache, "MAX_ENTRIES", 0)
+        hits = quote_cache.stats()["hits"]
+        out = _run(client, jobs)
+        assert quote_cache.stats()["hits"] == hits
+        return out
+
+
+def _n_lines(jobs) -> int:
+    return sum(len(job["cart"]) for job in jobs)
+
+
+def _warm(client, jobs) -> list:
+    before = quote_cache.stats()
+    first = _run(client, jobs)
+    after = quote_cache.stats()
+    assert after["misses"] - before["misses"] == _n_lines(jobs)
+    return first
+
+
+def _assert_recomputed(client, jobs, warm) -> list:
+    """รอบนี้ต้องล้าง cache แล้วคำนวณใหม่ทุกบรรทัด และได้ผลเท่ากับตอนปิด cache"""
+    before = quote_cache.stats()
+    cached = _run(client, jobs)
+    after = quote_cache.stats()
+    assert after["invalidations"] == before["invalidations"] + 1
+    assert after["hits"] == before["hits"]
+    assert cached == _run_uncached(client, jobs)
+    assert cached != warm
+    return cached
+
+
+def test_hit_equals_fresh_computation(client, jobs):
+    first = _warm(client, jobs)
+
+    before = quote_cache.stats()
+    second = _run(client, jobs)
+    assert quote_cache.stats()["hits"] - before["hits"] == _n_lines(jobs)
+
+    assert second == first
+    assert first == _run_uncached(client, jobs)
+
+
+def test_partial_hit_equals_fresh_computation(client, jobs, skus):
+    _warm(client, jobs)
+    # แก้บางบรรทัด (qty / ราคาใน cart / เพิ่ม sku ใหม่) → บรรทัดที่เหลือมาจาก cache
+    edited = copy.deepcopy(jobs)
+    for job in edited:
+        job["cart"][0]["qty"] = 7
+        job["cart"][1]["price"] = 99.0
+        job["cart"].append({"sku": skus[-1], "qty": 2, "name": "x", "price": None})
+
+    before = quote_cache.stats()
+    cached = _run(client, edited)
+    assert quote_cache.stats()["hits"] > before["hits"]
+    assert cached == _run_uncached(client, edited)
+
+
+@pytest.fixture
+def restore_items(skus):
+    with write_conn() as conn:
+        saved = conn.execute('SELECT rowid, "R1", "R2", "W1", "W2" FROM "Items_Test"').fetchall()
+    yield
+    with write_conn() as conn:
+        conn.executemany('UPDATE "Items_Test" SET "R1" = ?, "R2" = ?, "W1" = ?, "W2" = ? WHERE rowid = ?',
+                         [(r[1], r[2], r[3], r[4], r[0]) for r in saved])
+
+
+def test_catalog_change_invalidates(client, jobs, restore_items):
+    warm = _warm(client, jobs)
+    changed = [item["sku"] for item in jobs[0]["cart"][:3]] + [item["sku"] for item in jobs[1]["cart"][:3]]
+    with write_conn() as conn:
+        conn.executemany(
+            'UPDATE "Items_Test" SET "R1" = "R1" * 1.25 + 1, "R2" = "R2" * 1.25 + 1, '
+            '"W1" = "W1" * 1.25 + 1, "W2" = "W2" * 1.25 + 1 WHERE "No." = ?',
+            [(sku,) for sku in changed],
+        )
+
+    _assert_recomputed(client, jobs, warm)
+
+
+def test_pricing_model_change_invalidates(client, jobs, monkeypatch):
+    warm = _warm(client, jobs)
+    current = pricing_model.current()
+    config = copy.deepcopy(pricing_model.DEFAULT_CONFIG)
+    config["version"] = current.version + 1
+    config["payment_terms"]["enabled"] = not current.config["payment_terms"]["enabled"]
+    model = pricing_model.compile_config(config, "test")
+    monkeypatch.setattr(pricing_model, "current", lambda: model)
+
+    _assert_recomputed(client, jobs, warm)
+
+
+def test_mean_sd_change_invalidates(client, jobs, monkeypatch, tmp_path):
+    warm = _warm(client, jobs)
+    with open(LevelPrice.JSON_PATH) as f:
+        stats = json.load(f)
+    # ค่าเฉลี่ยต่ำลงมาก → score ของทุกคนสูงขึ้น tier ขยับ
+    for key in ("accum_6m_ln_mean", "frequency_mean", "tenure_mean"):
+        stats[0][key] -= 3 * stats[0][key.replace("_mean", "_sd")]
+    path = tmp_path / "mean_sd.json"
+    path.write_text(json.dumps(stats))
+    monkeypatch.setattr(LevelPrice, "JSON_PATH", path)
+
+    _assert_recomputed(client, jobs, warm)
+
+
+def test_year_change_invalidates(client, jobs, monkeypatch):
+    warm = _warm(client, jobs)
+
+    class NextYear(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            now = datetime.now(tz)
+            return now.replace(year=now.year + 1, day=min(now.day, 28))
+
+    # อายุลูกค้า (tenure) ใน LevelPrice / ตาราง tier นับจากปีปัจจุบัน
+    monkeypatch.setattr(pricing_router, "datetime", NextYear)
+    monkeypatch.setattr(customer_tier, "datetime", NextYear)
+    monkeypatch.setattr(LevelPrice, "datetime", NextYear)
+
+    before = quote_cache.stats()
+    cached = _run(client, jobs)
+    after = quote_cache.stats()
+    assert after["invalidations"] == before["invalidations"] + 1
+    assert after["hits"] == before["hits"]
+    assert cached == _run_uncached(client, jobs)
+    assert len(cached) == len(warm)
+
+
+@pytest.fixture
+def restore_customers(customer_codes):
+    cols = '"Customer", "Gen Bus", "Accum6m", "Frequency", "Payment Terms Code"'
+    with write_conn() as conn:
+        saved = conn.execute(f'SELECT rowid, {cols} FROM "Customer"').fetchall()
+    yield
+    with write_conn() as conn:
+        conn.executemany(
+            'UPDATE "Customer" SET "Gen Bus" = ?, "Accum6m" = ?, "Frequency" = ?, "Payment Terms Code" = ? '
+            'WHERE rowid = ?',
+            [(r[2], r[3], r[4], r[5], r[0]) for r in saved],
+        )
+
+
+def test_customer_changes_match_uncached(client, customer_codes, skus, restore_customers):
+    jobs = _jobs(client, customer_codes, skus)
+    warm = _warm(client, jobs)
+
+    # ลูกค้า 2 ราย: ยอดซื้อ / ความถี่ / ประเภทธุรกิจ / เครดิต เปลี่ยนในตาราง Customer
+    changed = customer_codes[:2]
+    with write_conn() as conn:
+        conn.execute('UPDATE "Customer" SET "Accum6m" = 9000000, "Frequency" = 400, "Gen Bus" = \'W\', '
+                     '"Payment Terms Code" = \'60 DAYS\' WHERE "Customer" = ?', (changed[0],))
+        conn.execute('UPDATE "Customer" SET "Accum6m" = 0, "Frequency" = 0, "Gen Bus" = \'R\', '
+                     '"Payment Terms Code" = \'CASH\' WHERE "Customer" = ?', (changed[1],))
+
+    # FE ค้นลูกค้าใหม่ → customerData ใหม่ของ 2 รายนั้น ตะกร้าเดิม
+    fresh = _jobs(client, customer_codes, skus)
+    assert [job["cart"] for job in fresh] == [job["cart"] for job in jobs]
+
+    before = quote_cache.stats()
+    cached = _run(client, fresh)
+    after = quote_cache.stats()
+    # ลูกค้าที่ไม่เปลี่ยนยังใช้ผลจาก cache
+    assert after["hits"] - before["hits"] == _n_lines(fresh[2:])
+
+    assert cached == _run_uncached(client, fresh)
+    assert cached[:2] != warm[:2]
+    assert cached[2:] == warm[2:]
+
+
+def test_shared_rows_and_model_are_read_only(client, jobs):
+    _warm(client, jobs)
+    with quote_cache._lock:
+        _, rows = next(iter(quote_cache._entries.values()))
+    with pytest.raises(TypeError):
+        rows[0]["NewPrice"] = 0
+
+    model = pricing_model.current()
+    with pytest.raises(TypeError):
+        model.config["payment_terms"]["enabled"] = False
+    with pytest.raises(TypeError):
+        model.gen_bus_map["R"] = 0.0
+    with pytest.raises(ValueError):
+        model.markup_pct[0] = 0.0
@@ -0,0 +1,126 @@
+# test_quote_sequence.py — เลขใบเสนอราคา (Quote_Sequence) ไม่ซ้ำ ไม่ข้าม และต่อจากเลขเดิมที่มีอยู่
+#
+# แต่ละ test ใช้ branch code ของตัวเอง → prefix ไม่ชนกัน (prefix = 2 ตัวท้ายของสาขา + "QO-" + YYMM)
+import threading
+
+import pytest
+
+import excel_outbox
+import quotation
+from db_sqlite import read_conn, write_conn
+
+
+@pytest.fixture(autouse=True)
+def no_excel_writer(monkeypatch):
+    # ไม่ต้องปลุก writer thread (งานใน outbox ยังอยู่ใน DB สำเนาของ test)
+    monkeypatch.setattr(excel_outbox, "notify", lambda: None)
+
+
+def _payload(branch: str, cart=None) -> dict:
+    return {
+        "employee": {"id": "T001", "name": "test", "branchId": branch},
+        "customer": {"code": "C001", "name": "ลูกค้าทดสอบ"},
+        "cart": [{"sku": "A001", "qty": 1, "price": 10}] if cart is None else cart,
+    }
+
+
+def _insert_headers(quote_nos):
+    with write_conn() as conn:
+        conn.executemany(
+            "INSERT INTO Quote_Header (QuoteNo, Status, BranchCode, LastUpdate) VALUES (?, 'draft', 'legacy', '2020-01-01T00:00:00')",
+            [(q,) for q in quote_nos],
+        )
+
+
+def _sequence(prefix: str):
+    with read_conn() as conn:
+        row = conn.execute("SELECT LastSeq FROM Quote_Sequence WHERE Prefix = ?", (prefix,)).fetchone()
+    return row[0] if row else None
+
+
+def test_concurrent_threads_get_unique_consecutive_numbers():
+    branch = "S1"
+    prefix = quotation._quote_prefix(branch)
+    n_threads, per_thread = 8, 15
+    results, errors = [], []
+    start = threading.Barrier(n_threads)
+
+    def worker():
+        start.wait()
+        try:
+            for _ in range(per_thread):
+                results.append(quotation.create_quotation(_payload(branch))["quoteNo"])
+        except Exception as e:      # pragma: no cover - รายงานใน assert ด้านล่าง
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(n_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    assert sorted(results) == [f"{prefix}/{i:04d}" for i in range(1, n_threads * per_thread + 1)]
+    assert _sequence(prefix) == n_threads * per_thread
+
+    with read_conn() as conn:
+        headers = conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT QuoteNo) FROM Quote_Header WHERE QuoteNo >= ? AND QuoteNo < ?",
+            (f"{prefix}/", f"{prefix}0"),
+        ).fetchone()
+    assert tuple(headers) == (len(results), len(results))
+
+
+def test_failed_create_returns_the_number():
+    # INSERT header แล้วพังใน transaction เดียวกัน → rollback เลขที่จองไว้ด้วย
+    branch = "S2"
+    prefix = quotation._quote_prefix(branch)
+    first = quotation.create_quotation(_payload(branch))["quoteNo"]
+    with pytest.raises(quotation.HTTPException):
+        quotation.create_quotation(_payload(branch, cart=[]))
+    second = quotation.create_quotation(_payload(branch))["quoteNo"]
+
+    assert (first, second) == (f"{prefix}/0001", f"{prefix}/0002")
+
+
+def test_new_prefix_continues_from_legacy_quote_numbers():
+    branch = "S3"
+    prefix = quotation._quote_prefix(branch)
+    _insert_headers([
+        f"{prefix}/0007",
+        f"{prefix}/0041",
+        f"{prefix}/0009",
+        # ไม่อยู่ในช่วง "prefix/" .. "prefix0" → ไม่นับ
+        f"{prefix}0/0900",
+        f"{prefix}1/0800",
+        f"{prefix[:-1]}/0700",
+        "S3QO-0001/0999",
+    ])
+    assert _sequence(prefix) is None
+
+    assert quotation.create_quotation(_payload(branch))["quoteNo"] == f"{prefix}/0042"
+    assert quotation.create_quotation(_payload(branch))["quoteNo"] == f"{prefix}/0043"
+
+
+def test_backfill_is_idempotent_and_never_lowers():
+    _insert_headers(["B4QO-2401/0005", "B4QO-2401/0012", "B4QO-2312/0003", "NOSLASH-0001", "/0002"])
+
+    first = quotation.backfill_quote_sequences()
+    assert first["B4QO-2401"] == 12
+    assert first["B4QO-2312"] == 3
+    assert "NOSLASH-0001" not in first and "" not in first
+    assert quotation.backfill_quote_sequences() == first
+
+    # sequence เดินไปไกลกว่าข้อมูลใน Quote_Header แล้ว (เช่น เลขที่ออกไปแล้วถูกลบ) → backfill ไม่ดึงกลับ
+    with write_conn() as conn:
+        conn.execute("UPDATE Quote_Sequence SET LastSeq = 20 WHERE Prefix = 'B4QO-2401'")
+    again = quotation.backfill_quote_sequences()
+    assert again == {**first, "B4QO-2401": 20}
+    assert quotation.backfill_quote_sequences() == again
+
+    # เลขใหม่หลัง backfill ไม่ชนเลขเดิม
+    branch = "S5"
+    prefix = quotation._quote_prefix(branch)
+    _insert_headers([f"{prefix}/0030"])
+    quotation.backfill_quote_sequences()
+    assert quotation.create_quotation(_payload(branch))["quoteNo"] == f"{prefix}/0031"